@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""销售分析：只读日汇总表，不扫销售明细。
+
+sales_daily_rollup 每天 × 产品 × 客户一行（销售额、销售成本、数量），出库时在同一事务里增量累加
+（见 stock.create_sale；日期取销售单的 DATE(created_at)，与重建同一口径）；日单数取 stats_daily。
+分析页按所选区间和紧挨着的前一个等长区间各汇总一次，环比用 pandas/NumPy 整列计算。
+
+汇总与明细不一致（手工改库、旧数据）时按月重建：
+  python analytics.py                      # 全部历史
+  python analytics.py --start 2026-01-01   # 从某天起
+"""
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import archive
+import cache
+import db
+
+METRICS = ["revenue", "cost", "margin", "quantity"]
+
+_DAILY_SQL = (
+    "SELECT stat_date, SUM(quantity) AS quantity, SUM(revenue) AS revenue, SUM(cost) AS cost "
+    "FROM sales_daily_rollup WHERE stat_date BETWEEN %s AND %s GROUP BY stat_date"
+)
+_DAILY_ORDERS_SQL = (
+    "SELECT stat_date, order_count AS orders FROM stats_daily WHERE stat_date BETWEEN %s AND %s"
+)
+# 按产品汇总，本期/上期各一行（is_current = 1/0）
+_PRODUCT_SQL = (
+    "SELECT product_id, stat_date >= %s AS is_current, SUM(quantity) AS quantity, "
+    "SUM(revenue) AS revenue, SUM(cost) AS cost "
+    "FROM sales_daily_rollup WHERE stat_date BETWEEN %s AND %s GROUP BY product_id, is_current"
+)
+_TOP_CUSTOMER_SQL = (
+    "SELECT r.customer_id, c.name, c.phone, SUM(r.quantity) AS quantity, "
+    "SUM(r.revenue) AS revenue, SUM(r.cost) AS cost "
+    "FROM sales_daily_rollup r JOIN customer c ON c.id = r.customer_id "
+    "WHERE r.stat_date BETWEEN %s AND %s "
+    "GROUP BY r.customer_id, c.name, c.phone ORDER BY revenue DESC LIMIT %s"
+)
+# 明细取热表和归档表（archive.union），每段各自按日期过滤
+_REBUILD_ITEMS_SQL = (
+    "SELECT o.id AS order_id, o.created_at, o.customer_id, i.product_id, i.quantity, i.unit_price, "
+    "       i.cost_amount "
+    "FROM {sale_order} o JOIN {sale_order_item} i ON i.order_id = o.id "
+    "WHERE o.created_at >= %s AND o.created_at < %s"
+)
+_REBUILD_SQL = (
+    "INSERT INTO sales_daily_rollup "
+    "(stat_date, product_id, customer_id, order_count, quantity, revenue, cost) "
+    "SELECT DATE(x.created_at), x.product_id, x.customer_id, COUNT(DISTINCT x.order_id), SUM(x.quantity), "
+    "       ROUND(SUM(x.quantity * x.unit_price), 2), "
+    "       ROUND(SUM(COALESCE(x.cost_amount, x.quantity * p.cost_price)), 2) "
+    "FROM ({items}) x "
+    "JOIN product p ON p.id = x.product_id "
+    "GROUP BY DATE(x.created_at), x.product_id, x.customer_id"
+)
+
+
+def record_sale(tx, customer_id, lines, day):
+    """一张销售单写入后调用（同一事务）：lines 为 [(product_id, quantity, revenue, cost), ...]，
+    每个产品一行。day 为 counters.sale_day 取的销售单日期，与 rebuild 的 DATE(created_at) 同一口径。"""
+    tx.execute_many(
+        db.upsert_sql(
+            "sales_daily_rollup",
+            ["stat_date", "product_id", "customer_id", "order_count", "quantity", "revenue", "cost"],
+            ["stat_date", "product_id", "customer_id"],
+            {
+                "order_count": "order_count + NEW(order_count)",
+                "quantity": "quantity + NEW(quantity)",
+                "revenue": "revenue + NEW(revenue)",
+                "cost": "cost + NEW(cost)",
+            },
+        ),
+        [(day, pid, customer_id, 1, qty, revenue, cost) for pid, qty, revenue, cost in lines],
+    )
+
+
+def _months(start, end):
+    """把 [start, end) 切成按自然月的小段。"""
+    a = start
+    while a < end:
+        b = (a.replace(day=1) + timedelta(days=32)).replace(day=1)
+        yield a, min(b, end)
+        a = b
+
+
+def rebuild(start=None, end=None, verbose=False):
+    """按销售明细重建 [start, end] 的日汇总，每月一个事务，返回写入的汇总行数。
+
+    不给日期时取销售单（含归档）的最早/最晚日期。成本取出库明细的销售成本（见 valuation.py），
+    没有记销售成本的旧明细按产品当前进价计。期间的出库会等待行锁，建议在非营业时间运行。
+    """
+    if start is None or end is None:
+        bounds, _ = archive.union("SELECT MIN(created_at) AS first, MAX(created_at) AS last FROM {sale_order}")
+        row = db.execute_one(f"SELECT MIN(first) AS first, MAX(last) AS last FROM ({bounds}) t")
+        if not row or row["first"] is None:
+            return 0
+        start = start or pd.Timestamp(row["first"]).date()
+        end = end or pd.Timestamp(row["last"]).date()
+    total = 0
+    for a, b in _months(start, end + timedelta(days=1)):
+        items, args = archive.union(_REBUILD_ITEMS_SQL, (a, b))
+        with db.transaction() as tx:
+            tx.execute_update(
+                "DELETE FROM sales_daily_rollup WHERE stat_date >= %s AND stat_date < %s", (a, b)
+            )
+            n = tx.execute_update(_REBUILD_SQL.format(items=items), args)
+        total += n
+        if verbose:
+            print(f"{a:%Y-%m}：{n} 行")
+    cache.bump("analytics", "replenish", "replenish_history")
+    return total
+
+
+def _numeric(df, columns):
+    for col in columns:
+        df[col] = pd.to_numeric(df[col]).astype("float64")
+    return df
+
+
+def _with_margin(df):
+    df["margin"] = df["revenue"] - df["cost"]
+    df["margin_rate"] = df["margin"] / df["revenue"].where(df["revenue"] != 0)
+    return df
+
+
+def change_ratio(current, previous):
+    """环比：(本期 - 上期) / 上期，上期为 0 时为 NaN。参数可以是数或整列。"""
+    current = np.asarray(current, dtype="float64")
+    previous = np.asarray(previous, dtype="float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(previous != 0, (current - previous) / previous, np.nan)
+
+
+def _compare(df):
+    df = df.copy()
+    df["margin_current"] = df["revenue_current"] - df["cost_current"]
+    df["margin_rate"] = df["margin_current"] / df["revenue_current"].where(df["revenue_current"] != 0)
+    df["revenue_change"] = change_ratio(df["revenue_current"], df["revenue_previous"])
+    return df.sort_values("revenue_current", ascending=False)
+
+
+def load_period(start, end, top_customers=20):
+    """读取 [start, end] 与前一个等长区间的汇总，返回 dict：
+
+    - summary：各指标本期/上期/环比；
+    - daily：本期按天的销售额、成本、毛利、数量、单数（没有销售的天补 0）；
+    - products / categories：按产品 / 品类的本期、上期销售额与环比；
+    - customers：本期销售额前 top_customers 名客户。
+    """
+    days = (end - start).days + 1
+    prev_start = start - timedelta(days=days)
+    prev_end = start - timedelta(days=1)
+    data = db.fetch_many({
+        "daily": (_DAILY_SQL, (prev_start, end)),
+        "orders": (_DAILY_ORDERS_SQL, (prev_start, end)),
+        "products": (_PRODUCT_SQL, (start, prev_start, end)),
+        "customers": (_TOP_CUSTOMER_SQL, (start, end, int(top_customers))),
+        "catalog": ("SELECT id AS product_id, category, model FROM product", ()),
+    })
+
+    # 按天：补齐没有销售的日期，前后两段直接按日期切片求和
+    index = pd.date_range(prev_start, end, name="stat_date")
+    daily = pd.DataFrame(data["daily"], columns=["stat_date", "quantity", "revenue", "cost"])
+    orders = pd.DataFrame(data["orders"], columns=["stat_date", "orders"])
+    daily = daily.merge(orders, on="stat_date", how="outer")
+    daily["stat_date"] = pd.to_datetime(daily["stat_date"])
+    daily = _numeric(daily.set_index("stat_date"), ["quantity", "revenue", "cost", "orders"])
+    daily = _with_margin(daily.reindex(index).fillna(0.0))
+    current = daily.loc[pd.Timestamp(start):]
+    previous = daily.loc[:pd.Timestamp(prev_end)]
+    cols = METRICS + ["orders"]
+    summary = pd.DataFrame({"current": current[cols].sum(), "previous": previous[cols].sum()})
+    summary["change"] = change_ratio(summary["current"], summary["previous"])
+
+    # 按产品：本期/上期两行透视成两列
+    products = pd.DataFrame(
+        data["products"], columns=["product_id", "is_current", "quantity", "revenue", "cost"]
+    )
+    products = _numeric(products, ["quantity", "revenue", "cost"])
+    products["period"] = np.where(products["is_current"].astype(int) == 1, "current", "previous")
+    wide = products.pivot_table(
+        index="product_id", columns="period", values=["quantity", "revenue", "cost"],
+        aggfunc="sum", fill_value=0.0,
+    )
+    wide.columns = [f"{m}_{p}" for m, p in wide.columns]
+    value_cols = [f"{m}_{p}" for m in ("quantity", "revenue", "cost") for p in ("current", "previous")]
+    wide = wide.reindex(columns=value_cols, fill_value=0.0)
+    catalog = pd.DataFrame(data["catalog"], columns=["product_id", "category", "model"])
+    wide = wide.reset_index().merge(catalog, on="product_id", how="left")
+    wide["category"] = wide["category"].fillna("未分类")
+
+    categories = wide.groupby("category", as_index=False)[value_cols].sum()
+
+    customers = pd.DataFrame(
+        data["customers"], columns=["customer_id", "name", "phone", "quantity", "revenue", "cost"]
+    )
+    customers = _with_margin(_numeric(customers, ["quantity", "revenue", "cost"]))
+
+    return {
+        "start": start,
+        "end": end,
+        "previous_start": prev_start,
+        "previous_end": prev_end,
+        "summary": summary,
+        "daily": current,
+        "products": _compare(wide),
+        "categories": _compare(categories),
+        "customers": customers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按销售明细重建销售分析日汇总")
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="起始日期 YYYY-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="截止日期（含当天）")
+    opts = parser.parse_args()
+    n = rebuild(opts.start, opts.end, verbose=True)
+    print(f"销售分析日汇总已重建：{n} 行")
+
+
+if __name__ == "__main__":
+    main()
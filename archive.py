@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""冷数据归档：把早于保留期的整月数据从热表搬到 *_archive 表（见 sql/migrations/0011_archive_tables.sql）。
+
+- 销售单连同明细、发票、送货单一起搬，维修记录单独搬；id 不变；
+- 每批（ARCHIVE_BATCH_SIZE 张单）一个事务：先复制到归档表再从热表删除，中途停掉重跑即可接着搬；
+- 已完成的后台任务（job 表）同样按保留期清理。
+日常页面只查热表；导出、重建统计、估价重放等历史查询用 union / sources 同时查热表和归档表。
+
+  python archive.py                   # 保留最近 ARCHIVE_KEEP_MONTHS 个整月
+  python archive.py --keep-months 6 --dry-run
+"""
+import argparse
+from datetime import date
+
+import db
+from config import Config
+
+# 热表 -> 归档表
+ARCHIVE_TABLES = {
+    "sale_order": "sale_order_archive",
+    "sale_order_item": "sale_order_item_archive",
+    "invoice": "invoice_archive",
+    "delivery_note": "delivery_note_archive",
+    "maintenance": "maintenance_archive",
+}
+COLUMNS = {
+    "sale_order": ["id", "order_no", "customer_id", "total_amount", "status", "note", "created_at"],
+    "sale_order_item": ["id", "order_id", "product_id", "quantity", "unit_price", "cost_amount"],
+    "invoice": ["id", "invoice_no", "order_id", "amount", "created_at", "file_path"],
+    "delivery_note": ["id", "note_no", "order_id", "created_at", "file_path"],
+    "maintenance": ["id", "customer_id", "product_id", "content", "result", "maintained_at", "created_at"],
+}
+# 跟着销售单一起搬的子表（按 order_id）
+ORDER_CHILDREN = ["sale_order_item", "invoice", "delivery_note"]
+
+
+def sources():
+    """历史查询依次要查的两组表名：先归档表、后热表（归档的 id 都比热表小）。
+
+    SQL 里的表名写成 {sale_order}、{sale_order_item} 等占位，用 sql.format(**src) 代入。
+    """
+    return [dict(ARCHIVE_TABLES), {t: t for t in ARCHIVE_TABLES}]
+
+
+def union(template, args=()):
+    """把 template 按归档表、热表各代入一次，用 UNION ALL 拼成一条语句，返回 (sql, args)。
+
+    每一段各自带条件、走各自的索引（MySQL 不会把条件下推进 UNION 视图，所以不用视图）。
+    需要整体排序时在返回的 sql 后面接 ORDER BY。
+    """
+    parts = [template.format(**src) for src in sources()]
+    return " UNION ALL ".join(parts), list(args) * len(parts)
+
+
+def cutoff(keep_months=None, today=None):
+    """保留期的起点：keep_months 个整月之前的月初，早于它的数据可以归档。"""
+    keep = Config.ARCHIVE_KEEP_MONTHS if keep_months is None else keep_months
+    today = today or date.today()
+    months = today.year * 12 + today.month - 1 - keep
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def _copy(tx, table, where, args):
+    cols = ", ".join(COLUMNS[table])
+    tx.execute_update(
+        f"INSERT INTO {ARCHIVE_TABLES[table]} ({cols}) SELECT {cols} FROM {table} WHERE {where}", args
+    )
+
+
+def _lock_batch(tx, table, before, batch):
+    """挑出一批早于 before 的 id 并按主键加锁，返回加锁成功的 id。
+
+    先用普通读走 created_at 索引挑 id（不加锁），再按主键 FOR UPDATE：
+    直接 WHERE created_at < ... FOR UPDATE 会给扫过的范围加间隙锁，挡住出库新插入的单。
+    """
+    ids = [
+        r["id"] for r in tx.execute_all(
+            f"SELECT id FROM {table} WHERE created_at < %s ORDER BY created_at, id LIMIT %s",
+            (before, batch),
+        )
+    ]
+    if not ids:
+        return []
+    placeholders = ", ".join(["%s"] * len(ids))
+    # 挑完到加锁之间可能已被另一个归档进程搬走，以加锁读到的为准
+    return [
+        r["id"] for r in tx.execute_all(
+            f"SELECT id FROM {table} WHERE id IN ({placeholders}) AND created_at < %s FOR UPDATE",
+            ids + [before],
+        )
+    ]
+
+
+def _move_orders(before, batch):
+    """搬一批早于 before 的销售单，返回张数（0 表示搬完了）。"""
+    with db.transaction() as tx:
+        ids = _lock_batch(tx, "sale_order", before, batch)
+        if not ids:
+            return 0
+        placeholders = ", ".join(["%s"] * len(ids))
+        _copy(tx, "sale_order", f"id IN ({placeholders})", ids)
+        for child in ORDER_CHILDREN:
+            _copy(tx, child, f"order_id IN ({placeholders})", ids)
+        # 子表先删，外键才不会拦
+        for child in ORDER_CHILDREN:
+            tx.execute_update(f"DELETE FROM {child} WHERE order_id IN ({placeholders})", ids)
+        tx.execute_update(f"DELETE FROM sale_order WHERE id IN ({placeholders})", ids)
+    return len(ids)
+
+
+def _move_maintenance(before, batch):
+    with db.transaction() as tx:
+        ids = _lock_batch(tx, "maintenance", before, batch)
+        if not ids:
+            return 0
+        placeholders = ", ".join(["%s"] * len(ids))
+        _copy(tx, "maintenance", f"id IN ({placeholders})", ids)
+        tx.execute_update(f"DELETE FROM maintenance WHERE id IN ({placeholders})", ids)
+    return len(ids)
+
+
+def _purge_jobs(before, batch):
+    with db.transaction() as tx:
+        ids = [
+            r["id"] for r in tx.execute_all(
+                "SELECT id FROM job WHERE status = 'done' AND updated_at < %s ORDER BY id LIMIT %s",
+                (before, batch),
+            )
+        ]
+        if ids:
+            placeholders = ", ".join(["%s"] * len(ids))
+            tx.execute_update(f"DELETE FROM job WHERE id IN ({placeholders})", ids)
+    return len(ids)
+
+
+def pending(before):
+    """热表里早于 before、待归档的条数：{"sale_order", "maintenance", "job"}。"""
+    with db.use_primary():
+        return {
+            "sale_order": db.execute_one(
+                "SELECT COUNT(*) AS n FROM sale_order WHERE created_at < %s", (before,)
+            )["n"],
+            "maintenance": db.execute_one(
+                "SELECT COUNT(*) AS n FROM maintenance WHERE created_at < %s", (before,)
+            )["n"],
+            "job": db.execute_one(
+                "SELECT COUNT(*) AS n FROM job WHERE status = 'done' AND updated_at < %s", (before,)
+            )["n"],
+        }
+
+
+def run(keep_months=None, batch=None, verbose=False):
+    """归档到保留期起点为止，返回各类搬走的条数。可随时中断，重跑从剩下的接着搬。"""
+    before = cutoff(keep_months)
+    batch = int(batch or Config.ARCHIVE_BATCH_SIZE)
+    moved = {}
+    for name, step in (("sale_order", _move_orders), ("maintenance", _move_maintenance), ("job", _purge_jobs)):
+        total = 0
+        while True:
+            n = step(before, batch)
+            if not n:
+                break
+            total += n
+            if verbose:
+                print(f"{name}：已搬 {total}")
+        moved[name] = total
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把早于保留期的销售单、维修记录搬到归档表")
+    parser.add_argument("--keep-months", type=int, default=None, help="热表保留最近几个整月，默认 ARCHIVE_KEEP_MONTHS")
+    parser.add_argument("--batch", type=int, default=None, help="每批张数，默认 ARCHIVE_BATCH_SIZE")
+    parser.add_argument("--dry-run", action="store_true", help="只统计待归档条数")
+    opts = parser.parse_args()
+    before = cutoff(opts.keep_months)
+    if opts.dry_run:
+        print(f"{before} 之前待归档：{pending(before)}")
+        return
+    moved = run(opts.keep_months, opts.batch, verbose=True)
+    print(f"已归档 {before} 之前的数据：{moved}")
+
+
+if __name__ == "__main__":
+    main()
@@ -64,10 +64,11 @@ class AdminUser:
             ("lingtong", "gbhnjmkI23", "Lingtong"),
         ]
         for username, raw_password, display_name in defaults:
-            exists = db.execute_one(
-                "SELECT id FROM admin_user WHERE username = %s",
-                (username,),
-            )
+            with db.use_primary():
+                exists = db.execute_one(
+                    "SELECT id FROM admin_user WHERE username = %s",
+                    (username,),
+                )
             if exists:
                 continue
             password_hash = generate_password_hash(raw_password, method="pbkdf2:sha256")
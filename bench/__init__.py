@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""造数与查询基准测试。
+
+请连一个单独的库（例如 DB_NAME=mycrm_bench），不要对生产库运行：
+  DB_NAME=mycrm_bench python -m bench.seed --customers 100000 --products 50000 --items 5000000
+  DB_NAME=mycrm_bench python -m bench.run --concurrency 1,4,16 -o bench_result.json
+"""
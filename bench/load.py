@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""页面压测：用 Streamlit 的 AppTest 无界面地跑 streamlit_app.py，模拟多个营业员同时操作。
+
+每个会话一个进程、一个 AppTest（各自的 session_state），按权重随机做登录、看列表、入库、出库。
+AppTest 按单会话设计（每次重跑自建、自清 Runtime），同一进程里并发跑多个会相互干扰，所以一个会话
+一个进程；代价是每个会话各有一个连接池，不像真实服务那样所有会话共用一个。
+每种操作记录耗时（含 Streamlit 重跑脚本的开销），同时附上各进程 metrics 里的页面渲染耗时和
+最耗时的 SQL，结果写成 JSON，可与上一次的结果对比：
+
+  DB_NAME=mycrm_bench python -m bench.load --sessions 1,4,8 --duration 30 -o load.json
+  DB_NAME=mycrm_bench python -m bench.load --sessions 1,4,8 --duration 30 --baseline load.json -o load_new.json
+
+对比时任一操作的 p95 或整体吞吐变差超过 --tolerance，退出码为 1，可直接放进发布前的检查。
+进度和对比结论写到标准错误，不给 -o 时标准输出只有 JSON。
+写入用例（入库、出库）只允许在基准测试库上跑。
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+import db
+import metrics
+from auth import AdminUser
+from bench.run import TABLES, _git_commit
+from bench.seed import bench_db_name
+from config import Config
+
+APP_PATH = str(Path(__file__).resolve().parent.parent / "streamlit_app.py")
+
+
+class Session:
+    """一个模拟营业员：持有一个 AppTest，按顺序执行操作，记下每次重跑脚本的次数。"""
+
+    def __init__(self, username, password, timeout):
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.at = None
+        self.reruns = 0
+
+    def run(self, widget=None):
+        (widget or self.at).run()
+        self.reruns += 1
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].value)
+        if not self.at.title:
+            # 脚本没跑起来（编译失败、超时）时 exception 也可能为空
+            raise RuntimeError("页面没有渲染")
+
+    def button(self, label):
+        return next(b for b in self.at.button if b.label == label)
+
+    def goto(self, page):
+        self.at.sidebar.radio[0].set_value(page)
+        self.run()
+
+    def login(self):
+        self.at = AppTest.from_file(APP_PATH, default_timeout=self.timeout)
+        self.run()
+        self.at.text_input[0].input(self.username)
+        self.at.text_input[1].input(self.password)
+        self.run(self.button("登录").click())
+        if "user" not in self.at.session_state:
+            raise RuntimeError("登录失败")
+
+
+def _stock_in(s, rng):
+    s.goto("入库")
+    box = next(b for b in s.at.selectbox if b.label == "产品")
+    box.set_value(rng.choice(box.options))
+    next(n for n in s.at.number_input if n.label == "数量").set_value(rng.randint(1, 10))
+    next(n for n in s.at.number_input if n.label == "进价").set_value(50.0)
+    s.run(s.button("入库").click())
+
+
+def _sale(s, rng):
+    """加一行到购物车，按电话号码找一个客户，出库。库存不足时页面报错，不算失败。"""
+    s.goto("出库")
+    if not s.at.selectbox:
+        return
+    box = next(b for b in s.at.selectbox if b.label == "产品")
+    box.set_value(rng.choice(box.options))
+    s.run(s.button("加入销售单").click())
+    s.at.text_input(key="sale_customer_q").input(f"{rng.randint(0, 999):03d}")
+    s.run()
+    if not any(b.key == "sale_customer_id" for b in s.at.selectbox):
+        s.run(s.button("清空").click())
+        return
+    s.run(s.button("出库").click())
+
+
+def _view(page):
+    return lambda s, rng: s.goto(page)
+
+
+# 操作名 -> (权重, 函数, 是否写库)。权重大致按营业员一天里各操作的次数
+ACTIONS = {
+    "login": (1, lambda s, rng: s.login(), False),
+    "dashboard": (4, _view("首页"), False),
+    "products": (4, _view("产品&型号"), False),
+    "customers": (3, _view("客户"), False),
+    "inventory": (3, _view("库存查询"), False),
+    "replenish": (1, _view("补货提醒"), False),
+    "maintenance": (2, _view("维修记录"), False),
+    "documents": (1, _view("单据"), False),
+    "stock_in": (2, _stock_in, True),
+    "sale": (4, _sale, True),
+}
+
+
+def _stats(latencies):
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"mean_ms": None, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+    return {
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "p50_ms": round(metrics.percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(metrics.percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(metrics.percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def _session_worker(i, sessions, names, opts, barrier, results):
+    """一个会话进程：等所有进程都准备好后一起开始，跑满 duration 秒，把样本交回主进程。"""
+    rng = random.Random(opts.seed * 1000 + sessions * 100 + i)
+    s = Session(opts.username, opts.password, opts.timeout)
+    samples = {n: [] for n in names}
+    errors = {n: [] for n in names}
+    barrier.wait()
+    deadline = time.perf_counter() + opts.duration
+    name = "login"
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            ACTIONS[name][1](s, rng)
+        except Exception as e:
+            errors[name].append(f"{type(e).__name__}: {e}")
+            name = "login"  # 出错后重新开一个会话
+            continue
+        samples[name].append(time.perf_counter() - started)
+        if opts.think:
+            time.sleep(rng.uniform(0, opts.think))
+        name = rng.choices(names, weights=[ACTIONS[n][0] for n in names])[0]
+    results.put({
+        "samples": samples,
+        "errors": errors,
+        "reruns": s.reruns,
+        "metrics": metrics.raw_samples(),
+        "pool": db.pool_stats(),
+    })
+
+
+def _sum_pools(stats):
+    """各进程连接池的计数相加（max_size / open 等也按总数算）。"""
+    total = {}
+    for st in stats:
+        for k, v in st.items():
+            total[k] = total.get(k, 0) + v
+    return total
+
+
+def run_level(sessions, duration, names, opts):
+    """sessions 个会话进程同时跑 duration 秒，返回该并发度的汇总和各操作的分位数。"""
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(sessions + 1)
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=_session_worker, args=(i, sessions, names, opts, barrier, results), daemon=True)
+        for i in range(sessions)
+    ]
+    for p in procs:
+        p.start()
+    try:
+        # 进程启动要导入 Streamlit 等，不计入压测时间
+        barrier.wait(timeout=opts.timeout)
+        started = time.perf_counter()
+        parts = [results.get(timeout=duration + 2 * opts.timeout) for _ in procs]
+        wall = time.perf_counter() - started
+    except (threading.BrokenBarrierError, queue.Empty):
+        for p in procs:
+            p.terminate()
+        raise SystemExit(f"sessions={sessions}：有会话进程没有启动或没有按时结束")
+    for p in procs:
+        p.join()
+
+    samples = {n: [x for part in parts for x in part["samples"][n]] for n in names}
+    errors = {n: [x for part in parts for x in part["errors"][n]] for n in names}
+    actions = []
+    for n in names:
+        actions.append({
+            "action": n,
+            "ops": len(samples[n]),
+            "errors": len(errors[n]),
+            "error_samples": errors[n][:3],
+            **_stats(samples[n]),
+        })
+    ops = sum(a["ops"] for a in actions)
+    return {
+        "sessions": sessions,
+        "seconds": round(wall, 3),
+        "ops": ops,
+        "errors": sum(a["errors"] for a in actions),
+        "throughput": round(ops / wall, 2) if wall else 0.0,
+        "reruns_per_second": round(sum(part["reruns"] for part in parts) / wall, 2) if wall else 0.0,
+        **_stats([x for n in names for x in samples[n]]),
+        "actions": actions,
+        "pages": metrics.page_summary([x for part in parts for x in part["metrics"]["pages"]]),
+        "top_queries": metrics.query_summary([x for part in parts for x in part["metrics"]["queries"]])[:10],
+        "pool": _sum_pools(part["pool"] for part in parts),
+    }
+
+
+def compare(report, baseline, tolerance, min_delta_ms):
+    """和 baseline 报告逐项比对，返回变差超过 tolerance 的说明列表。
+
+    p95 相差不到 min_delta_ms 的不算（很快的页面几毫秒的抖动就能超过比例）；
+    两次的操作组合不同时只比各操作的 p95，不比吞吐。
+    """
+    same_mix = baseline["meta"].get("actions") == report["meta"]["actions"]
+    old = {r["sessions"]: r for r in baseline["results"]}
+    regressions = []
+    for r in report["results"]:
+        base = old.get(r["sessions"])
+        if base is None:
+            continue
+        if same_mix and base["throughput"] and r["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"sessions={r['sessions']} 吞吐 {base['throughput']}/s -> {r['throughput']}/s"
+            )
+        base_actions = {a["action"]: a for a in base["actions"]}
+        for a in r["actions"]:
+            b = base_actions.get(a["action"])
+            if not b or not b["p95_ms"] or a["p95_ms"] is None:
+                continue
+            if a["p95_ms"] > b["p95_ms"] * (1 + tolerance) and a["p95_ms"] - b["p95_ms"] >= min_delta_ms:
+                regressions.append(
+                    f"sessions={r['sessions']} {a['action']} p95 {b['p95_ms']}ms -> {a['p95_ms']}ms"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用 AppTest 模拟多个会话压测 Streamlit 页面")
+    parser.add_argument("--sessions", default="1,4,8", help="逗号分隔的并发会话数")
+    parser.add_argument("--duration", type=float, default=20.0, help="每个并发度跑多少秒")
+    parser.add_argument("--actions", default=",".join(ACTIONS), help="逗号分隔的操作名")
+    parser.add_argument("--no-writes", action="store_true", help="跳过入库、出库")
+    parser.add_argument("--think", type=float, default=0.0, help="两次操作之间随机停顿的最长秒数，0 = 不停")
+    parser.add_argument("--username", default="boss1")
+    parser.add_argument("--password", default="123456")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单次重跑脚本的超时秒数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", help="上一次的结果 JSON，用来对比")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="对比时允许变差的比例")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="对比时 p95 至少变差多少毫秒才算")
+    parser.add_argument("-o", "--output", help="结果 JSON 路径（默认打印到标准输出）")
+    opts = parser.parse_args()
+
+    levels = [int(x) for x in opts.sessions.split(",") if x.strip()]
+    names = [n.strip() for n in opts.actions.split(",") if n.strip()]
+    if opts.no_writes:
+        names = [n for n in names if not ACTIONS[n][2]]
+    if "login" not in names:
+        names.insert(0, "login")  # 每个会话都从登录开始
+    if any(ACTIONS[n][2] for n in names) and Config.BENCH_DB_MARKER not in bench_db_name():
+        raise SystemExit(f"当前库 {bench_db_name()} 不是基准测试库，写入用例已拒绝（可加 --no-writes）")
+    AdminUser.ensure_default_admins()
+
+    table_rows = {t: db.execute_one(f"SELECT COUNT(*) AS n FROM {t}")["n"] for t in TABLES}
+    results = []
+    for n in levels:
+        r = run_level(n, opts.duration, names, opts)
+        results.append(r)
+        print(
+            f"sessions={n:<3} ops={r['ops']:<6} {r['throughput']:>8}/s reruns={r['reruns_per_second']}/s "
+            f"p50={r['p50_ms']}ms p95={r['p95_ms']}ms p99={r['p99_ms']}ms errors={r['errors']}",
+            file=sys.stderr, flush=True,
+        )
+        for a in r["actions"]:
+            print(f"  {a['action']:<12} ops={a['ops']:<5} p50={a['p50_ms']}ms p95={a['p95_ms']}ms "
+                  f"errors={a['errors']}", file=sys.stderr, flush=True)
+
+    report = {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "db": {"backend": Config.DB_BACKEND, "host": Config.DB_HOST, "name": bench_db_name()},
+            "pool_size": Config.DB_POOL_SIZE,
+            "duration": opts.duration,
+            "sessions": levels,
+            "actions": names,
+            "think": opts.think,
+            "seed": opts.seed,
+            "table_rows": table_rows,
+        },
+        "results": results,
+    }
+    regressions = []
+    if opts.baseline:
+        with open(opts.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("actions") != names:
+            print(f"注意：{opts.baseline} 的操作组合不同，只比较各操作的 p95", file=sys.stderr)
+        regressions = compare(report, baseline, opts.tolerance, opts.min_delta_ms)
+        report["baseline"] = {"git_commit": baseline["meta"].get("git_commit"), "regressions": regressions}
+
+    text = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if opts.output:
+        with open(opts.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print("结果已写入", opts.output, file=sys.stderr)
+    else:
+        print(text)
+
+    if opts.baseline:
+        if regressions:
+            print(f"与 {opts.baseline} 相比变差超过 {opts.tolerance:.0%}：", file=sys.stderr)
+            for line in regressions:
+                print("  " + line, file=sys.stderr)
+            raise SystemExit(1)
+        print(f"与 {opts.baseline} 相比没有明显变差", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""本地模拟只读副本（SQLite 后端）：每隔 interval 秒把主库整库拷到各副本文件，副本延迟约为 interval 秒。
+
+  DB_BACKEND=sqlite python -m bench.replica data/replica1.sqlite3 data/replica2.sqlite3 --interval 1
+  DB_BACKEND=sqlite DB_REPLICAS=data/replica1.sqlite3,data/replica2.sqlite3 streamlit run streamlit_app.py
+
+interval 调到大于 DB_REPLICA_MAX_LAG 就能看到副本被摘掉、读改走主库。
+MySQL 请用真正的主从复制（两个 mysqld 实例，副本开 read_only），DB_REPLICAS 填副本的 host:port。
+"""
+import argparse
+import sqlite3
+import time
+
+from config import Config
+
+
+def copy_once(targets):
+    """用 SQLite 在线备份把主库拷到各副本；拷贝期间副本上的读会短暂等待。"""
+    src = sqlite3.connect(Config.SQLITE_PATH)
+    try:
+        for target in targets:
+            dst = sqlite3.connect(target)
+            try:
+                src.backup(dst)
+            finally:
+                dst.close()
+    finally:
+        src.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把 SQLite 主库定时拷贝到副本文件，模拟有延迟的只读副本")
+    parser.add_argument("targets", nargs="+", help="副本库文件路径")
+    parser.add_argument("--interval", type=float, default=1.0, help="拷贝间隔秒数")
+    parser.add_argument("--once", action="store_true", help="只拷一次")
+    opts = parser.parse_args()
+    if Config.DB_BACKEND != "sqlite":
+        raise SystemExit("只用于 SQLite 后端（DB_BACKEND=sqlite）")
+    while True:
+        started = time.monotonic()
+        copy_once(opts.targets)
+        print(f"已同步 {len(opts.targets)} 个副本（{time.monotonic() - started:.2f} 秒）")
+        if opts.once:
+            break
+        time.sleep(opts.interval)
+
+
+if __name__ == "__main__":
+    main()
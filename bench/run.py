@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""查询基准测试：按固定并发跑各页面的查询和写入路径，输出 JSON 便于不同版本对比。
+
+  DB_NAME=mycrm_bench python -m bench.run --concurrency 1,4,16 --duration 10 -o bench_result.json
+
+每个用例在每个并发度下跑 duration 秒，记录吞吐和延迟分位数。进度写到标准错误，
+不给 -o 时标准输出只有 JSON，可以直接用管道交给别的工具。
+页面查询直接取 streamlit_app 里的 SQL 常量，写入路径直接调 stock 模块。
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import counters
+import db
+import metrics
+import replenish
+import search
+import stock
+import streamlit_app as app
+from bench.seed import SURNAMES, bench_db_name
+from config import Config
+
+TABLES = ["product", "customer", "sale_order", "sale_order_item", "stock_in", "maintenance"]
+
+
+class Context:
+    """每轮开始前取一次各表最大 id 和样本型号，用例里随机取值。"""
+
+    def __init__(self):
+        row = db.execute_one(
+            "SELECT (SELECT MAX(id) FROM product) AS product, (SELECT MAX(id) FROM customer) AS customer, "
+            "(SELECT MAX(id) FROM sale_order) AS sale_order, (SELECT MAX(id) FROM stock_in) AS stock_in, "
+            "(SELECT MAX(id) FROM maintenance) AS maintenance"
+        )
+        self.max_id = {k: int(v or 0) for k, v in row.items()}
+        ids = [random.randint(1, max(1, self.max_id["product"])) for _ in range(200)]
+        placeholders = ", ".join(["%s"] * len(ids))
+        self.models = [
+            r["model"] for r in db.execute_all(f"SELECT model FROM product WHERE id IN ({placeholders})", ids)
+        ] or ["M"]
+        self.products = None
+
+    def rand_id(self, table):
+        return random.randint(1, max(1, self.max_id[table]))
+
+
+def _page(sql, key_col, columns, table, group_by=None):
+    """keyset 分页（与页面一样直接取成 DataFrame）：一半取第一页，一半从随机位置往后翻。"""
+    def run(ctx):
+        before = None if random.random() < 0.5 else ctx.rand_id(table)
+        db.fetch_keyset_frame(
+            sql, key_col, before=before, limit=Config.PAGE_SIZE, group_by=group_by, columns=columns
+        )
+    return run
+
+
+def _delta(sql, dtypes):
+    """列表增量刷新的一次轮询（水位取当前时间，见 streamlit_app.delta_query）。"""
+    def run(ctx):
+        since = datetime.now() - timedelta(seconds=Config.DELTA_OVERLAP_SECONDS)
+        db.fetch_frame(f"{sql} WHERE updated_at >= %s", (since,), dtypes=dtypes)
+    return run
+
+
+def _search(ctx):
+    model = random.choice(ctx.models)
+    start = random.randint(0, max(0, len(model) - 4))
+    search.search_products(model[start:start + 4])
+
+
+def _customer_search(ctx):
+    """一半按手机号中间 4 位查，一半按姓氏查。"""
+    if random.random() < 0.5:
+        search.search_customers(f"{random.randint(0, 9999):04d}")
+    else:
+        search.search_customers(random.choice(SURNAMES))
+
+
+def _replenish(ctx):
+    """整份目录算一遍补货点；产品列表只取一次（页面上是全进程共用、增量刷新的那份）。"""
+    if ctx.products is None:
+        ctx.products = db.fetch_frame(app.PRODUCT_LIST_SQL, dtypes=app.PRODUCT_LIST_DTYPES)
+    replenish.counts(ctx.products)
+
+
+def _sale(ctx):
+    product_id = ctx.rand_id("product")
+    try:
+        stock.create_sale(ctx.rand_id("customer"), [(product_id, 1, 100.0)])
+    except stock.InsufficientStock:
+        pass
+
+
+def _stock_in(ctx):
+    stock.stock_in(ctx.rand_id("product"), 5, 50.0, "bench")
+
+
+WORKLOADS = {
+    "dashboard": lambda ctx: counters.load_dashboard(),
+    "product_list": lambda ctx: db.fetch_frame(app.PRODUCT_LIST_SQL, dtypes=app.PRODUCT_LIST_DTYPES),
+    "product_delta": _delta(app.PRODUCT_LIST_SQL, app.PRODUCT_LIST_DTYPES),
+    "customer_page": _page(app.CUSTOMER_PAGE_SQL, "id", app.CUSTOMER_PAGE_COLUMNS, "customer"),
+    "stock_in_page": _page(app.STOCK_IN_LIST_SQL, "s.id", app.STOCK_IN_COLUMNS, "stock_in"),
+    "sale_order_page": _page(
+        app.SALE_ORDER_LIST_SQL, "o.id", app.SALE_ORDER_COLUMNS, "sale_order", group_by="o.id"
+    ),
+    "maintenance_page": _page(app.MAINTENANCE_LIST_SQL, "m.id", app.MAINTENANCE_COLUMNS, "maintenance"),
+    "product_search": _search,
+    "customer_search": _customer_search,
+    "replenish": _replenish,
+    "write_sale": _sale,
+    "write_stock_in": _stock_in,
+}
+
+
+def run_case(name, fn, ctx, concurrency, duration):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        local = []
+        local_errors = []
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                fn(ctx)
+            except Exception as e:
+                local_errors.append(f"{type(e).__name__}: {e}")
+                continue
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+            errors.extend(local_errors)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "workload": name,
+        "concurrency": concurrency,
+        "ops": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "seconds": round(wall, 3),
+        "throughput": round(len(latencies) / wall, 2) if wall else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+        "p50_ms": round(metrics.percentile(latencies, 50) * 1000, 3) if latencies else None,
+        "p95_ms": round(metrics.percentile(latencies, 95) * 1000, 3) if latencies else None,
+        "p99_ms": round(metrics.percentile(latencies, 99) * 1000, 3) if latencies else None,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="页面查询与写入路径基准测试")
+    parser.add_argument("--concurrency", default="1,4,16", help="逗号分隔的并发度")
+    parser.add_argument("--duration", type=float, default=5.0, help="每个用例每个并发度的秒数")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help="逗号分隔的用例名")
+    parser.add_argument("--no-writes", action="store_true", help="跳过写入用例")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("-o", "--output", help="结果 JSON 路径（默认打印到标准输出，进度始终写到标准错误）")
+    opts = parser.parse_args()
+
+    random.seed(opts.seed)
+    levels = [int(x) for x in opts.concurrency.split(",") if x.strip()]
+    names = [n.strip() for n in opts.workloads.split(",") if n.strip()]
+    if opts.no_writes:
+        names = [n for n in names if not n.startswith("write_")]
+    if any(n.startswith("write_") for n in names) and Config.BENCH_DB_MARKER not in bench_db_name():
+        raise SystemExit(f"当前库 {bench_db_name()} 不是基准测试库，写入用例已拒绝（可加 --no-writes）")
+    # 连接池至少要容得下最大并发，否则测到的是排队时间
+    Config.DB_POOL_SIZE = max(Config.DB_POOL_SIZE, max(levels))
+
+    ctx = Context()
+    table_rows = {t: db.execute_one(f"SELECT COUNT(*) AS n FROM {t}")["n"] for t in TABLES}
+    results = []
+    for name in names:
+        for c in levels:
+            r = run_case(name, WORKLOADS[name], ctx, c, opts.duration)
+            results.append(r)
+            print(
+                f"{name:<18} c={c:<3} ops={r['ops']:<7} {r['throughput']:>9}/s "
+                f"p50={r['p50_ms']}ms p95={r['p95_ms']}ms p99={r['p99_ms']}ms errors={r['errors']}",
+                file=sys.stderr, flush=True,
+            )
+
+    report = {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "db": {"backend": Config.DB_BACKEND, "host": Config.DB_HOST, "name": bench_db_name()},
+            "duration": opts.duration,
+            "concurrency": levels,
+            "table_rows": table_rows,
+        },
+        "results": results,
+        "pool": db.pool_stats(),
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if opts.output:
+        with open(opts.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print("结果已写入", opts.output, file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
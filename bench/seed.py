@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""按指定规模往 schema.sql 的表里批量造数（只用于基准测试库）。
+
+数据用 NumPy 整列生成，主键显式给出，按批 executemany 多行插入；
+加载期间关闭外键/唯一性检查。要求目标表为空（或加 --truncate 先清空）。
+SQLite 后端同样可用（只关外键检查，清空用 DELETE），库名检查改为看库文件名。
+
+  DB_NAME=mycrm_bench python -m bench.seed --customers 100000 --products 50000 --items 5000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+import analytics
+import counters
+import db
+from config import Config
+
+CATEGORIES = ["洗衣机", "烘干机", "洗烘套装", "冰箱", "空调", "热水器", "配件"]
+SURNAMES = list("王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗")
+GIVEN = list("伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂")
+CONTENTS = ["不脱水", "噪音大", "漏水", "不加热", "门锁故障", "显示 E3", "安装调试", "保养清洗"]
+
+# 清空顺序（先子表后父表）
+TABLES = [
+    "sales_daily_rollup", "maintenance", "delivery_note", "invoice", "sale_order_item", "sale_order",
+    "stock_in", "customer", "product",
+]
+
+
+def _datetimes(rng, n, days):
+    """最近 days 天内均匀分布的时间字符串，升序（与自增 id 的先后一致）。"""
+    now = np.datetime64("now", "s")
+    offsets = np.sort(rng.integers(0, days * 86400, size=n))[::-1]
+    return np.char.replace(np.datetime_as_string(now - offsets, unit="s"), "T", " ")
+
+
+def _insert(conn, sql, columns, batch_size, label):
+    n = len(columns[0])
+    started = time.monotonic()
+    with conn.cursor() as cur:
+        for start in range(0, n, batch_size):
+            end = min(n, start + batch_size)
+            conn.begin()
+            cur.executemany(sql, list(zip(*(c[start:end].tolist() for c in columns))))
+            conn.commit()
+    print(f"{label}: {n} 行，{time.monotonic() - started:.1f} 秒")
+
+
+def bench_db_name():
+    """当前连接的库名（SQLite 为库文件路径），用来检查是否为基准测试库。"""
+    return str(Config.SQLITE_PATH) if db.is_sqlite() else Config.DB_NAME
+
+
+def seed(customers, products, items, stock_ins, maintenance, days=730, lines_per_order=2.5,
+         batch_size=5000, random_seed=42, truncate=False):
+    if Config.BENCH_DB_MARKER not in bench_db_name():
+        raise SystemExit(
+            f"当前库 {bench_db_name()} 不是基准测试库（库名需包含 {Config.BENCH_DB_MARKER!r}），已拒绝造数"
+        )
+    rng = np.random.default_rng(random_seed)
+    orders = max(1, int(items / lines_per_order)) if items else 0
+
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            if db.is_sqlite():
+                cur.execute("PRAGMA foreign_keys = OFF")
+            else:
+                cur.execute("SET foreign_key_checks = 0")
+                cur.execute("SET unique_checks = 0")
+            if truncate:
+                for t in TABLES:
+                    cur.execute(f"DELETE FROM {t}" if db.is_sqlite() else f"TRUNCATE TABLE {t}")
+            for t in TABLES:
+                cur.execute(f"SELECT 1 FROM {t} LIMIT 1")
+                if cur.fetchone():
+                    raise SystemExit(f"表 {t} 不为空，请加 --truncate")
+
+        # 产品
+        p_ids = np.arange(1, products + 1)
+        price = np.round(rng.uniform(200, 9000, products), 0)
+        cost = np.round(price * rng.uniform(0.55, 0.9, products), 2)
+        p_qty = rng.integers(0, 500, products)
+        _insert(
+            conn,
+            "INSERT INTO product (id, category, model, price, cost_price, quantity, stock_value) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            [
+                p_ids,
+                np.array(CATEGORIES)[rng.integers(0, len(CATEGORIES), products)],
+                np.char.add("M", np.char.zfill(p_ids.astype(str), 7)),
+                price,
+                cost,
+                p_qty,
+                np.round(p_qty * cost, 2),
+            ],
+            batch_size, "product",
+        )
+
+        # 客户
+        c_ids = np.arange(1, customers + 1)
+        names = np.char.add(
+            np.array(SURNAMES)[rng.integers(0, len(SURNAMES), customers)],
+            np.char.add(
+                np.array(GIVEN)[rng.integers(0, len(GIVEN), customers)],
+                np.array(GIVEN)[rng.integers(0, len(GIVEN), customers)],
+            ),
+        )
+        phones = np.char.add("13", np.char.zfill(rng.integers(0, 10**9, customers).astype(str), 9))
+        _insert(
+            conn,
+            "INSERT INTO customer (id, name, phone, phone_digits, address, created_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            [
+                c_ids,
+                names,
+                phones,
+                phones,
+                np.char.add("测试路 ", rng.integers(1, 999, customers).astype(str)),
+                _datetimes(rng, customers, days),
+            ],
+            batch_size, "customer",
+        )
+
+        # 销售单 + 明细：每单至少 1 行，其余明细随机分到各单
+        if orders and products and customers:
+            o_ids = np.arange(1, orders + 1)
+            item_order = np.sort(np.concatenate([o_ids, rng.integers(1, orders + 1, items - orders)]))
+            item_product = rng.integers(1, products + 1, len(item_order))
+            item_qty = rng.integers(1, 4, len(item_order))
+            item_price = price[item_product - 1]
+            totals = np.round(np.bincount(item_order, weights=item_qty * item_price, minlength=orders + 1)[1:], 2)
+            _insert(
+                conn,
+                "INSERT INTO sale_order (id, order_no, customer_id, total_amount, created_at) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                [
+                    o_ids,
+                    np.char.add("SB", np.char.zfill(o_ids.astype(str), 10)),
+                    rng.integers(1, customers + 1, orders),
+                    totals,
+                    _datetimes(rng, orders, days),
+                ],
+                batch_size, "sale_order",
+            )
+            _insert(
+                conn,
+                "INSERT INTO sale_order_item (order_id, product_id, quantity, unit_price, cost_amount) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                [item_order, item_product, item_qty, item_price, np.round(item_qty * cost[item_product - 1], 2)],
+                batch_size, "sale_order_item",
+            )
+
+        if stock_ins and products:
+            s_product = rng.integers(1, products + 1, stock_ins)
+            _insert(
+                conn,
+                "INSERT INTO stock_in (product_id, quantity, cost_price, created_at) VALUES (%s, %s, %s, %s)",
+                [s_product, rng.integers(1, 50, stock_ins), cost[s_product - 1], _datetimes(rng, stock_ins, days)],
+                batch_size, "stock_in",
+            )
+
+        if maintenance and customers:
+            m_product = rng.integers(0, products + 1, maintenance)
+            _insert(
+                conn,
+                "INSERT INTO maintenance (customer_id, product_id, content, result, created_at) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                [
+                    rng.integers(1, customers + 1, maintenance),
+                    np.array([v or None for v in m_product.tolist()], dtype=object),
+                    np.array(CONTENTS)[rng.integers(0, len(CONTENTS), maintenance)],
+                    np.full(maintenance, "已处理"),
+                    _datetimes(rng, maintenance, days),
+                ],
+                batch_size, "maintenance",
+            )
+
+        with conn.cursor() as cur:
+            if db.is_sqlite():
+                cur.execute("PRAGMA foreign_keys = ON")
+            else:
+                cur.execute("SET unique_checks = 1")
+                cur.execute("SET foreign_key_checks = 1")
+    finally:
+        conn.close()
+
+    counters.reconcile()
+    print("统计计数已重建")
+    analytics.rebuild()
+    print("销售分析日汇总已重建")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基准测试造数")
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--products", type=int, default=50_000)
+    parser.add_argument("--items", type=int, default=5_000_000, help="sale_order_item 行数")
+    parser.add_argument("--stock-in", type=int, default=200_000)
+    parser.add_argument("--maintenance", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=730, help="数据分布在最近多少天")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--truncate", action="store_true", help="先清空业务表")
+    opts = parser.parse_args()
+    seed(
+        opts.customers, opts.products, opts.items, opts.stock_in, opts.maintenance,
+        days=opts.days, batch_size=opts.batch_size, random_seed=opts.seed, truncate=opts.truncate,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""进程内共享的只读缓存（统计数、补货历史等）和共享列表状态。
+
+- 按命名空间（如 "product"、"analytics"）维护版本号，写入方提交事务后调用 bump()，
+  旧版本的缓存立即失效，读方永远看不到过期的数据；
+- 条目带 TTL，总数超过上限时按最近最少使用淘汰；
+- 进程内所有 Streamlit 会话共用一份，stats() 返回命中/未命中计数；
+- 增量刷新的整表列表（产品列表，见 streamlit_app.delta_query）放在 frame_state 里，
+  同样全进程一份，"product" 的版本号变了就马上去库里取增量。
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from config import Config
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # (namespace, version, key) -> (expires_at, value)
+_versions = {}
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+_frames = {}  # key -> 列表状态 dict，见 frame_state
+_frames_lock = threading.Lock()
+
+
+def version(namespace):
+    with _lock:
+        return _versions.get(namespace, 0)
+
+
+def bump(*namespaces):
+    """数据已变更：提升命名空间版本并丢弃旧条目。须在写事务提交之后调用。"""
+    with _lock:
+        for ns in namespaces:
+            _versions[ns] = _versions.get(ns, 0) + 1
+            _stats["invalidations"] += 1
+            for k in [k for k in _entries if k[0] == ns]:
+                del _entries[k]
+
+
+def get_or_load(namespace, key, loader, ttl=None):
+    """命中则直接返回；否则调用 loader() 加载并缓存。
+
+    版本号在加载前读取：加载期间若有写入 bump 了版本，这次结果只会落在旧版本下，
+    不会被后续读方拿到。
+    """
+    now = time.monotonic()
+    with _lock:
+        ver = _versions.get(namespace, 0)
+        k = (namespace, ver, key)
+        hit = _entries.get(k)
+        if hit is not None and hit[0] > now:
+            _entries.move_to_end(k)
+            _stats["hits"] += 1
+            return hit[1]
+        _stats["misses"] += 1
+
+    value = loader()
+
+    ttl = Config.CACHE_TTL if ttl is None else ttl
+    with _lock:
+        if _versions.get(namespace, 0) != ver:
+            return value
+        _entries[k] = (time.monotonic() + ttl, value)
+        _entries.move_to_end(k)
+        while len(_entries) > Config.CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+    return value
+
+
+@contextmanager
+def frame_state(key):
+    """进程内所有会话共用的一份列表状态（dict，首次为空），持锁期间读写。"""
+    with _frames_lock:
+        yield _frames.setdefault(key, {})
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def stats():
+    with _lock:
+        data = dict(_stats)
+        data["entries"] = len(_entries)
+        total = data["hits"] + data["misses"]
+        data["hit_rate"] = round(data["hits"] / total, 4) if total else 0.0
+        return data
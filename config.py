@@ -31,3 +31,70 @@ class Config:
     DB_USER = os.getenv("DB_USER", "root")
     DB_PASSWORD = os.getenv("DB_PASSWORD", "")
     DB_NAME = os.getenv("DB_NAME", "mycrm")
+    DB_CONNECT_TIMEOUT = float(os.getenv("DB_CONNECT_TIMEOUT", "5"))  # 建连接超时秒数
+    # 单次读结果的超时秒数（含连接池的 ping）；比最慢的查询（导出、重建统计）长
+    DB_READ_TIMEOUT = float(os.getenv("DB_READ_TIMEOUT", "120"))
+    # 连接池（db.py）
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))  # 最大连接数（含借出中的）
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # 借连接最长等待秒数
+    DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))  # 空闲超过则关闭
+    DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "3600"))  # 连接最长寿命
+    DB_POOL_PING_INTERVAL = float(os.getenv("DB_POOL_PING_INTERVAL", "30"))  # 空闲超过则借出前先 ping
+    # 只读副本（读写分离，见 db.py）：逗号分隔，MySQL 为 host[:port]（账号、库名同主库），
+    # SQLite 后端为副本库文件路径（本地测试用，见 bench/replica.py）；留空则全部读写走主库
+    DB_REPLICAS = [r.strip() for r in os.getenv("DB_REPLICAS", "").split(",") if r.strip()]
+    DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))  # 延迟超过该秒数的副本不读
+    DB_REPLICA_LAG_CHECK = float(os.getenv("DB_REPLICA_LAG_CHECK", "2"))  # 后台线程测延迟的间隔秒数
+    DB_REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))  # 连不上后暂停使用的秒数
+    DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "3"))  # 写后在副本延迟之外再多读主库的秒数
+    # db.fetch_many 并发读取的线程数（全进程共用），0 表示与 DB_POOL_SIZE 一样；满了在调用方线程上执行
+    DB_FETCH_WORKERS = int(os.getenv("DB_FETCH_WORKERS", "0"))
+    # 列表分页
+    PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+    # 参考列表缓存（cache.py）
+    CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+    # 产品全量列表按 updated_at 水位增量刷新（streamlit_app.delta_query），全进程共用一份（cache.frame_state）
+    DELTA_RESYNC_SECONDS = float(os.getenv("DELTA_RESYNC_SECONDS", "600"))  # 超过则全量重取
+    DELTA_OVERLAP_SECONDS = float(os.getenv("DELTA_OVERLAP_SECONDS", "5"))  # 增量按水位往回多取的秒数
+    # 全进程共用的列表最多每隔这么多秒查一次增量；本进程写入（cache.bump）后马上查
+    DELTA_POLL_SECONDS = float(os.getenv("DELTA_POLL_SECONDS", "1"))
+    # 产品搜索（search.py）
+    SEARCH_LIMIT = int(os.getenv("SEARCH_LIMIT", "50"))
+    SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "200"))  # 按相关度先取多少个全文命中再排序
+    SEARCH_NGRAM_SIZE = int(os.getenv("SEARCH_NGRAM_SIZE", "2"))  # 与 MySQL ngram_token_size 一致
+    CUSTOMER_SEARCH_LIMIT = int(os.getenv("CUSTOMER_SEARCH_LIMIT", "20"))  # 选客户时最多列出的条数
+    # 批量导入（importer.py）
+    IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+    # 数据导出（exporter.py）
+    EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "5000"))
+    # 单号分配（numbering.py）：每个进程一次预留多少个号；设为 1 则全局严格递增
+    NUMBER_BLOCK_SIZE = int(os.getenv("NUMBER_BLOCK_SIZE", "50"))
+    # 后台任务（jobs.py / worker.py）与单据文件（documents.py）
+    DOCUMENT_DIR = os.getenv("DOCUMENT_DIR", str(BASE_DIR / "data" / "documents"))
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))  # worker 子进程数
+    JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))  # 没有任务时的轮询间隔
+    JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))  # 领取后超过则视为 worker 已退出
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+    JOB_RETRY_SECONDS = float(os.getenv("JOB_RETRY_SECONDS", "30"))  # 首次重试间隔，之后逐次翻倍
+    # 补货提醒（replenish.py）：按最近 REPLENISH_WINDOW_DAYS 天的日销量算补货点
+    REPLENISH_WINDOW_DAYS = int(os.getenv("REPLENISH_WINDOW_DAYS", "28"))
+    REPLENISH_LEAD_DAYS = int(os.getenv("REPLENISH_LEAD_DAYS", "7"))  # 型号没填到货周期时的默认值
+    REPLENISH_SAFETY_Z = float(os.getenv("REPLENISH_SAFETY_Z", "1.65"))  # 安全库存系数，1.65 约等于 95% 不缺货
+    REPLENISH_ORDER_DAYS = int(os.getenv("REPLENISH_ORDER_DAYS", "14"))  # 建议补货量按补到补货点再多卖几天
+    # 冷数据归档（archive.py）：保留最近几个整月在热表里，每批搬多少张单
+    ARCHIVE_KEEP_MONTHS = int(os.getenv("ARCHIVE_KEEP_MONTHS", "12"))
+    ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+    # 查询耗时统计（metrics.py）
+    METRICS_BUFFER_SIZE = int(os.getenv("METRICS_BUFFER_SIZE", "5000"))  # 环形缓冲区保留的样本数
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))  # 慢查询日志阈值（毫秒），0 = 关闭
+    # 可查看“性能监控”等管理页面的账号（逗号分隔）；留空则所有登录账号都可以
+    ADMIN_USERNAMES = [u.strip() for u in os.getenv("ADMIN_USERNAMES", "").split(",") if u.strip()]
+    # 基准测试（bench/）：只允许对库名包含该关键字的库造数，防止误写生产库
+    BENCH_DB_MARKER = os.getenv("BENCH_DB_MARKER", "bench")
+    # 数据库后端：mysql（默认）或 sqlite（单机门店，见 db_sqlite.py）
+    DB_BACKEND = os.getenv("DB_BACKEND", "mysql").lower()
+    SQLITE_PATH = os.getenv("SQLITE_PATH", str(BASE_DIR / "data" / "mycrm.sqlite3"))
+    SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "5"))  # 秒
+    SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))
+    SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))
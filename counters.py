@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""概览页计数：stats_counter / stats_daily 由写入路径在同一事务里增量维护。
+
+“哪一天”一律按数据库时钟：增量按销售单的 DATE(created_at)（见 sale_day），概览取 CURDATE()，
+重建按 DATE(created_at) 分组，应用服务器与数据库时区不同、或跨零点时三者仍一致。
+
+计数若与实际数据不一致（手工改库、旧数据迁移等），运行 python counters.py 全量重建。
+重建按热表和归档表一起统计（archive.py），归档不改变计数。
+"""
+import archive
+import db
+
+
+def incr(tx, name, delta=1):
+    tx.execute_update(
+        db.upsert_sql("stats_counter", ["name", "value"], ["name"], {"value": "value + NEW(value)"}),
+        (name, delta),
+    )
+
+
+def sale_day(tx, order_id):
+    """销售单的日期（数据库时钟下的 DATE(created_at)），增量计数都记在这一天。"""
+    rows = tx.execute_all("SELECT DATE(created_at) AS day FROM sale_order WHERE id = %s", (order_id,))
+    return rows[0]["day"]
+
+
+def record_sale(tx, amount, day, orders=1):
+    """一张销售单写入后调用：累加总单数和 day（见 sale_day）的单数/营业额。"""
+    incr(tx, "order_count", orders)
+    tx.execute_update(
+        db.upsert_sql(
+            "stats_daily", ["stat_date", "order_count", "revenue"], ["stat_date"],
+            {"order_count": "order_count + NEW(order_count)", "revenue": "revenue + NEW(revenue)"},
+        ),
+        (day, orders, amount),
+    )
+
+
+def load_dashboard():
+    """一次查询取回概览页全部指标，缺失的指标按 0 处理。"""
+    rows = db.execute_all(
+        "SELECT name, value FROM stats_counter "
+        "UNION ALL SELECT 'today_order_count', order_count FROM stats_daily WHERE stat_date = CURDATE() "
+        "UNION ALL SELECT 'today_revenue', revenue FROM stats_daily WHERE stat_date = CURDATE()"
+    )
+    data = {
+        "product_count": 0,
+        "customer_count": 0,
+        "order_count": 0,
+        "today_order_count": 0,
+        "today_revenue": 0,
+    }
+    for r in rows:
+        data[r["name"]] = r["value"]
+    for k in ("product_count", "customer_count", "order_count", "today_order_count"):
+        data[k] = int(data[k])
+    return data
+
+
+def reconcile():
+    """按实际数据全量重建计数表（单事务，期间写入会等待行锁）。"""
+    orders, _ = archive.union("SELECT COUNT(*) AS n FROM {sale_order}")
+    daily, _ = archive.union(
+        "SELECT DATE(created_at) AS stat_date, COUNT(*) AS n, COALESCE(SUM(total_amount), 0) AS revenue "
+        "FROM {sale_order} GROUP BY DATE(created_at)"
+    )
+    with db.transaction() as tx:
+        tx.execute_update("DELETE FROM stats_counter")
+        tx.execute_update(
+            "INSERT INTO stats_counter (name, value) "
+            "SELECT 'product_count', COUNT(*) FROM product "
+            "UNION ALL SELECT 'customer_count', COUNT(*) FROM customer "
+            f"UNION ALL SELECT 'order_count', SUM(n) FROM ({orders}) t"
+        )
+        tx.execute_update("DELETE FROM stats_daily")
+        # 归档按整月搬，同一天不会一半在热表一半在归档表，外层再合并一次只是保险
+        tx.execute_update(
+            "INSERT INTO stats_daily (stat_date, order_count, revenue) "
+            f"SELECT stat_date, SUM(n), SUM(revenue) FROM ({daily}) t GROUP BY stat_date"
+        )
+
+
+def main():
+    reconcile()
+    print("统计计数已重建：", load_dashboard())
+
+
+if __name__ == "__main__":
+    main()
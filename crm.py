@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""客户写入（CRM）。"""
+import re
+
+import counters
+import db
+
+_RE_NON_DIGIT = re.compile(r"[^0-9]")
+
+
+def normalize_phone(phone):
+    """电话只保留数字（customer.phone_digits），没有数字时为 None。"""
+    return _RE_NON_DIGIT.sub("", phone or "") or None
+
+
+def add_customer(name, phone=None, address=None, note=None):
+    """新增客户并累加客户数，返回 customer.id。"""
+    with db.transaction() as tx:
+        customer_id = tx.execute_insert(
+            "INSERT INTO customer (name, phone, phone_digits, address, note) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            (name, phone or None, normalize_phone(phone), address or None, note or None),
+        )
+        counters.incr(tx, "customer_count")
+    return customer_id
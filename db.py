@@ -1,46 +1,829 @@
 # -*- coding: utf-8 -*-
-"""MySQL 连接与简单封装（纯 Python，用 PyMySQL）"""
-import pymysql
+"""数据库连接与简单封装（纯 Python）。
+
+默认用 PyMySQL 连 MySQL；Config.DB_BACKEND = "sqlite" 时改用 db_sqlite 的本地 SQLite，
+execute_* / transaction 等接口和 %s 占位符不变。少数 MySQL 专有写法
+（ON DUPLICATE KEY、多表 UPDATE JOIN）请用 upsert_sql / update_join 生成。
+
+配置了只读副本（Config.DB_REPLICAS）时读写分离：execute_one / execute_all / fetch_* / iter_chunks
+走延迟在 DB_REPLICA_MAX_LAG 以内的副本，写入和事务走主库；同一会话（见 session）写过库后，
+副本追上之前的读仍走主库。副本连不上时自动改读主库。
+"""
+import contextvars
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+
+import pymysql
+
+import metrics
 from config import Config
 
-def get_connection():
+log = logging.getLogger("mycrm.db")
+
+def is_sqlite():
+    return Config.DB_BACKEND == "sqlite"
+
+def get_connection(replica=None):
+    """新建一条连接；replica 为 Config.DB_REPLICAS 里的一项（MySQL 为 host[:port]，SQLite 为库文件路径）。"""
+    if is_sqlite():
+        import db_sqlite
+        return db_sqlite.connect(replica, readonly=True) if replica else db_sqlite.connect()
+    host, port = Config.DB_HOST, Config.DB_PORT
+    if replica:
+        host, _, port = replica.partition(":")
+        port = int(port or Config.DB_PORT)
     return pymysql.connect(
-        host=Config.DB_HOST,
-        port=Config.DB_PORT,
+        host=host,
+        port=port,
         user=Config.DB_USER,
         password=Config.DB_PASSWORD,
         database=Config.DB_NAME,
         charset="utf8mb4",
         cursorclass=pymysql.cursors.DictCursor,
+        connect_timeout=Config.DB_CONNECT_TIMEOUT,
+        read_timeout=Config.DB_READ_TIMEOUT,
     )
 
+
+class PoolTimeout(Exception):
+    """连接池已满且在等待时间内没有连接被归还。"""
+
+
+class ConnectionPool:
+    """线程安全的有界连接池。
+
+    - 最多同时存在 max_size 个连接（空闲 + 借出），超出时借用方等待，超时抛 PoolTimeout；
+    - 空闲超过 max_idle 秒、或创建超过 max_lifetime 秒的连接直接关闭，不再复用；
+    - 空闲超过 ping_interval 秒的连接借出前先 ping，失效则换一条新连接。
+    """
+
+    def __init__(self, factory, max_size=10, timeout=10.0, max_idle=300.0,
+                 max_lifetime=3600.0, ping_interval=30.0):
+        self._factory = factory
+        self.max_size = max(1, int(max_size))
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.ping_interval = ping_interval
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, created_at, last_used)
+        self._created_at = {}  # id(conn) -> 创建时间（含借出中的连接）
+        self._closed = False
+        self._stats = {
+            "created": 0,
+            "reused": 0,
+            "closed": 0,
+            "ping_failed": 0,
+            "waits": 0,
+            "timeouts": 0,
+        }
+
+    def _expired(self, created_at, last_used, now):
+        if self.max_lifetime and now - created_at > self.max_lifetime:
+            return True
+        if self.max_idle and now - last_used > self.max_idle:
+            return True
+        return False
+
+    def _discard(self, conn):
+        """关闭连接并释放名额；调用方须持有 self._cond。"""
+        self._created_at.pop(id(conn), None)
+        self._stats["closed"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._cond.notify()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("连接池已关闭")
+                    now = time.monotonic()
+                    while self._idle:
+                        conn, created_at, last_used = self._idle.pop()
+                        if not self._expired(created_at, last_used, now):
+                            break
+                        self._discard(conn)
+                        conn = None
+                    if conn is not None or len(self._created_at) < self.max_size:
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(f"{self.timeout} 秒内未能获取数据库连接")
+                    if not waited:
+                        self._stats["waits"] += 1
+                        waited = True
+                    self._cond.wait(remaining)
+                if conn is None:
+                    # 先占名额再在锁外建连接，避免握手期间阻塞其他线程
+                    placeholder = object()
+                    self._created_at[id(placeholder)] = now
+            if conn is None:
+                break
+            # ping 同样在锁外做（已从空闲队列取出，别的线程拿不到）：半开连接上最多卡到 read_timeout
+            if self.ping_interval and now - last_used > self.ping_interval:
+                try:
+                    conn.ping(reconnect=False)
+                except Exception:
+                    with self._cond:
+                        self._stats["ping_failed"] += 1
+                        self._discard(conn)
+                    continue
+            with self._cond:
+                self._stats["reused"] += 1
+            return conn
+        try:
+            conn = self._factory()
+        except Exception:
+            with self._cond:
+                self._created_at.pop(id(placeholder), None)
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._created_at.pop(id(placeholder), None)
+            self._created_at[id(conn)] = time.monotonic()
+            self._stats["created"] += 1
+        return conn
+
+    def release(self, conn, discard=False):
+        with self._cond:
+            created_at = self._created_at.get(id(conn))
+            if created_at is None:
+                # 不是本池借出的连接（或已被丢弃），直接关掉
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                return
+            now = time.monotonic()
+            if discard or self._closed or self._expired(created_at, now, now):
+                self._discard(conn)
+                return
+            self._idle.append((conn, created_at, now))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except Exception as e:
+            # 连接层错误（断线、超时、被服务端 kill 等），这条连接不再放回池里
+            broken = is_connection_error(e)
+            raise
+        finally:
+            self.release(conn, discard=broken)
+
+    def stats(self):
+        with self._cond:
+            data = dict(self._stats)
+            data["max_size"] = self.max_size
+            data["open"] = len(self._created_at)
+            data["idle"] = len(self._idle)
+            data["in_use"] = data["open"] - data["idle"]
+            return data
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _, _ = self._idle.pop()
+                self._discard(conn)
+            self._cond.notify_all()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    get_connection,
+                    max_size=Config.DB_POOL_SIZE,
+                    timeout=Config.DB_POOL_TIMEOUT,
+                    max_idle=Config.DB_POOL_MAX_IDLE,
+                    max_lifetime=Config.DB_POOL_MAX_LIFETIME,
+                    ping_interval=Config.DB_POOL_PING_INTERVAL,
+                )
+    return _pool
+
+def pool_stats():
+    return get_pool().stats()
+
+# ---------- 读写分离 ----------
+
+class Replica:
+    """一个只读副本：自己的连接池、最近测得的延迟（秒，None 为未知）、连不上时暂停使用到 down_until。"""
+
+    def __init__(self, target):
+        self.target = target
+        self.pool = ConnectionPool(
+            lambda: get_connection(target),
+            max_size=Config.DB_POOL_SIZE,
+            timeout=Config.DB_POOL_TIMEOUT,
+            max_idle=Config.DB_POOL_MAX_IDLE,
+            max_lifetime=Config.DB_POOL_MAX_LIFETIME,
+            ping_interval=Config.DB_POOL_PING_INTERVAL,
+        )
+        self.lag = None
+        self.down_until = 0.0
+
+    def usable(self, now):
+        return self.down_until <= now and self.lag is not None and self.lag <= Config.DB_REPLICA_MAX_LAG
+
+    def mark_down(self):
+        self.lag = None
+        self.down_until = time.monotonic() + Config.DB_REPLICA_RETRY_SECONDS
+
+
+_replicas = None
+_session = contextvars.ContextVar("db_session", default=None)
+_process_session = {}
+_force_primary = contextvars.ContextVar("db_force_primary", default=False)
+_lag_lock = threading.Lock()
+_lag_thread = None
+_lag_stop = threading.Event()
+
+_HEARTBEAT_READ_SQL = "SELECT beat_at FROM replication_heartbeat WHERE id = 1"
+# 主库的心跳和主库当前时间一起读：延迟全按主库时钟算，与应用服务器的时钟无关
+_HEARTBEAT_PRIMARY_SQL = (
+    "SELECT NOW(6) AS now, (SELECT beat_at FROM replication_heartbeat WHERE id = 1) AS beat_at"
+)
+
+def get_replicas():
+    global _replicas
+    if _replicas is None:
+        with _pool_lock:
+            if _replicas is None:
+                _replicas = [Replica(t) for t in Config.DB_REPLICAS]
+                if _replicas:
+                    _start_lag_monitor()
+    return _replicas
+
+def _start_lag_monitor():
+    """启动后台测延迟的线程（每个进程一个）；读请求只看它测得的结果，不在读的路径上测。"""
+    global _lag_thread
+    if _lag_thread is None:
+        _lag_stop.clear()
+        _lag_thread = threading.Thread(target=_lag_monitor, name="db-replica-lag", daemon=True)
+        _lag_thread.start()
+
+def _stop_lag_monitor():
+    global _lag_thread
+    if _lag_thread is not None:
+        _lag_stop.set()
+        _lag_thread.join()
+        _lag_thread = None
+
+def _lag_monitor():
+    # 第一次测完之前各副本延迟未知，读都走主库
+    while not _lag_stop.is_set():
+        try:
+            _refresh_lag()
+        except Exception:
+            log.exception("测量副本延迟失败")
+        _lag_stop.wait(Config.DB_REPLICA_LAG_CHECK)
+
+@contextmanager
+def session(state):
+    """把一个可变 dict（如 st.session_state 里的一项）绑定为当前会话，用来做“读己之写”：
+    会话里写过库后，副本延迟 + DB_READ_YOUR_WRITES_SECONDS 之内的读都走主库。
+    没有绑定时整个进程算一个会话。"""
+    token = _session.set(state)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+@contextmanager
+def use_primary():
+    """with db.use_primary(): ... —— 期间的读都走主库（读了马上要据此写、或要读别的进程刚写的数据时用）。"""
+    token = _force_primary.set(True)
+    try:
+        yield
+    finally:
+        _force_primary.reset(token)
+
+def _note_write():
+    state = _session.get()
+    (_process_session if state is None else state)["last_write"] = time.monotonic()
+
+def _refresh_lag():
+    """测一次各副本延迟；由后台线程每 DB_REPLICA_LAG_CHECK 秒调用一次（见 _start_lag_monitor）。
+
+    主库 replication_heartbeat 里存最近一次心跳（主库写入时的 NOW(6)）：先读出主库上的心跳 P
+    和主库当前时间 T，再读各副本的心跳 R。R 已追上 P 只能说明延迟不超过 T - P，没追上则记 T - R，
+    即 T - min(R, P)，都取上界（偏保守）；最后写入新的心跳。时间全部来自主库时钟，应用服务器之间的
+    时钟偏差不影响结果。停住的副本 R 不再前进，延迟一直按 T - R 增长。
+
+    副本读心跳出错时该副本延迟记为未知（不读它），写心跳失败只记日志。
+    """
+    with _lag_lock:
+        now = time.monotonic()
+        try:
+            row = _execute(_HEARTBEAT_PRIMARY_SQL, None, _fetch_one)
+        except Exception:
+            # 心跳表还没建（迁移未跑）、主库读不了等：延迟一律视为未知，读都走主库
+            log.warning("读取主库复制心跳失败，副本暂不使用", exc_info=True)
+            for r in get_replicas():
+                r.lag = None
+            return
+        primary_now, primary_beat = row["now"], row["beat_at"]
+        if isinstance(primary_now, str):
+            # SQLite 后端的 NOW(6) 是函数结果，没有列类型，不会转成 datetime
+            primary_now = datetime.fromisoformat(primary_now)
+        for r in get_replicas():
+            if r.down_until > now:
+                continue
+            try:
+                with _cursor(r.pool) as cur:
+                    row = _timed(cur, _HEARTBEAT_READ_SQL, None, _fetch_one)
+            except Exception as e:
+                if is_connection_error(e):
+                    r.mark_down()
+                else:
+                    # 副本上缺表、权限不对等：这一轮不读它，下一轮再测
+                    log.warning("读取副本 %s 的复制心跳失败", r.target, exc_info=True)
+                    r.lag = None
+                continue
+            beat = row["beat_at"] if row else None
+            if beat is None or primary_beat is None:
+                r.lag = None
+            else:
+                r.lag = max(0.0, (primary_now - min(beat, primary_beat)).total_seconds())
+        try:
+            _execute(
+                upsert_sql("replication_heartbeat", ["id", "beat_at"], ["id"], {"beat_at": "NEW(beat_at)"},
+                           values={"beat_at": "NOW(6)"}),
+                (1,), _affected,
+            )
+        except Exception:
+            log.warning("写入复制心跳失败", exc_info=True)
+
+def _pick_replica():
+    """给这次读挑一个副本；没有可用副本、或本会话刚写过库时返回 None（读主库）。"""
+    replicas = get_replicas()
+    if not replicas or _force_primary.get():
+        return None
+    now = time.monotonic()
+    state = _session.get()
+    last_write = (_process_session if state is None else state).get("last_write")
+    candidates = [
+        r for r in replicas
+        if r.usable(now)
+        and (last_write is None or now - last_write > r.lag + Config.DB_READ_YOUR_WRITES_SECONDS)
+    ]
+    return random.choice(candidates) if candidates else None
+
+def replica_stats():
+    """各副本的状态：[{target, lag, down, pool}]。"""
+    now = time.monotonic()
+    return [
+        {"target": r.target, "lag": r.lag, "down": r.down_until > now, "pool": r.pool.stats()}
+        for r in get_replicas()
+    ]
+
+# 连接层的 MySQL 错误码。死锁（1213）、锁等待超时（1205）、SQL 写错（1054 等）、
+# 超过 max_execution_time（3024）也是 OperationalError，但连接本身没问题，不算在内
+_CONNECTION_ERRNOS = {
+    1040,  # Too many connections
+    1053,  # Server shutdown in progress
+    1927,  # Connection was killed
+    2002,  # Can't connect through socket
+    2003,  # Can't connect to MySQL server
+    2005,  # Unknown MySQL server host
+    2006,  # MySQL server has gone away
+    2013,  # Lost connection to MySQL server during query
+    2055,  # Lost connection to MySQL server at '...', system error
+    4031,  # 空闲超时被服务器断开
+}
+
+def is_connection_error(e):
+    """连不上、断线、借不到连接之类的错误（可以换一个库重试，连接不能再放回池里）。"""
+    if isinstance(e, PoolTimeout):
+        return True
+    if is_sqlite():
+        import db_sqlite
+        return db_sqlite.is_connection_error(e)
+    if isinstance(e, pymysql.err.InterfaceError):
+        # 在已关闭的连接上执行等
+        return True
+    return isinstance(e, pymysql.err.OperationalError) and bool(e.args) and e.args[0] in _CONNECTION_ERRNOS
+
+@contextmanager
+def _cursor(pool, commit=True, begin=False, cursorclass=None):
+    with pool.connection() as conn:
+        try:
+            if begin:
+                # 显式开事务（SQLite 为 BEGIN IMMEDIATE，一开始就拿写锁）
+                conn.begin()
+            with conn.cursor(cursorclass) as cur:
+                yield cur
+            if commit:
+                conn.commit()
+            else:
+                # 结束只读事务，避免池中连接一直持有旧快照
+                conn.rollback()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+
+@contextmanager
+def get_cursor(commit=True, begin=False, cursorclass=None):
+    """借一条主库连接的游标；cursorclass 为空时行为字典，传 pymysql.cursors.Cursor 则为元组。"""
+    with _cursor(get_pool(), commit=commit, begin=begin, cursorclass=cursorclass) as cur:
+        yield cur
+
+def _timed(cur, sql, args, fetch, acquire=0.0):
+    """执行一条语句并把耗时、行数记到 metrics；fetch(cur, affected) 返回 (结果, 行数)。"""
+    started = time.perf_counter()
+    rows = None
+    error = None
+    try:
+        affected = cur.execute(sql, args or ())
+        result, rows = fetch(cur, affected)
+        return result
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        metrics.record_query(sql, time.perf_counter() - started + acquire, rows, acquire, error)
+
+def _fetch_one(cur, affected):
+    row = cur.fetchone()
+    return row, 1 if row else 0
+
+def _fetch_all(cur, affected):
+    rows = cur.fetchall()
+    return rows, len(rows)
+
+def _fetch_columns(cur, affected):
+    rows = cur.fetchall()
+    return ([d[0] for d in cur.description], rows), len(rows)
+
+def _lastrowid(cur, affected):
+    return cur.lastrowid, affected
+
+def _affected(cur, affected):
+    return affected, affected
+
+class Transaction:
+    """同一连接、同一事务内执行多条语句；接口与模块级 execute_* 保持一致。"""
+
+    def __init__(self, cur):
+        self.cursor = cur
+
+    def execute_one(self, sql, args=None):
+        return _timed(self.cursor, sql, args, _fetch_one)
+
+    def execute_all(self, sql, args=None):
+        return _timed(self.cursor, sql, args, _fetch_all)
+
+    def execute_insert(self, sql, args=None):
+        return _timed(self.cursor, sql, args, _lastrowid)
+
+    def execute_update(self, sql, args=None):
+        return _timed(self.cursor, sql, args, _affected)
+
+    def execute_many(self, sql, seq_args):
+        started = time.perf_counter()
+        affected = None
+        error = None
+        try:
+            affected = self.cursor.executemany(sql, seq_args)
+            return affected
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            metrics.record_query(sql, time.perf_counter() - started, affected, error=error)
+
 @contextmanager
-def get_cursor(commit=True):
-    conn = get_connection()
+def transaction():
+    """with db.transaction() as tx: ... —— 正常退出提交，异常则整体回滚。"""
+    try:
+        with get_cursor(begin=True) as cur:
+            yield Transaction(cur)
+    finally:
+        _note_write()
+
+def _execute(sql, args, fetch, cursorclass=None, pool=None):
+    started = time.perf_counter()
+    with _cursor(pool or get_pool(), cursorclass=cursorclass) as cur:
+        # 借连接的耗时单独记，也计入这条语句的总耗时
+        return _timed(cur, sql, args, fetch, acquire=time.perf_counter() - started)
+
+def _read(sql, args, fetch, cursorclass=None):
+    """读：有可用副本时读副本，副本连不上则标记暂停并改读主库。"""
+    replica = _pick_replica()
+    if replica is not None:
+        try:
+            return _execute(sql, args, fetch, cursorclass, pool=replica.pool)
+        except Exception as e:
+            if not is_connection_error(e):
+                raise
+            replica.mark_down()
+    return _execute(sql, args, fetch, cursorclass)
+
+def _write(sql, args, fetch):
     try:
-        with conn.cursor() as cur:
-            yield cur
-        if commit:
-            conn.commit()
+        return _execute(sql, args, fetch)
     finally:
-        conn.close()
+        _note_write()
 
 def execute_one(sql, args=None):
-    with get_cursor() as cur:
-        cur.execute(sql, args or ())
-        return cur.fetchone()
+    return _read(sql, args, _fetch_one)
 
 def execute_all(sql, args=None):
-    with get_cursor() as cur:
-        cur.execute(sql, args or ())
-        return cur.fetchall()
+    return _read(sql, args, _fetch_all)
 
 def execute_insert(sql, args=None):
-    with get_cursor() as cur:
-        cur.execute(sql, args or ())
-        return cur.lastrowid
+    return _write(sql, args, _lastrowid)
 
 def execute_update(sql, args=None):
-    with get_cursor() as cur:
-        return cur.execute(sql, args or ())
+    return _write(sql, args, _affected)
+
+def iter_chunks(sql, args=None, chunk_size=5000):
+    """用非缓冲游标（SSCursor）流式读取大结果集，逐块 yield (列名列表, [元组行, ...])。
+
+    结果集不会整个进内存；读取期间占用一条池连接，调用方应尽快读完。
+    整个结果集在 metrics 里记一条，耗时只计执行和取数，不含调用方处理每块的时间。
+    """
+    replica = _pick_replica()
+    started = time.perf_counter()
+    with (replica.pool if replica else get_pool()).connection() as conn:
+        acquire = elapsed = time.perf_counter() - started
+        total = 0
+        error = None
+        cur = conn.cursor(pymysql.cursors.SSCursor)
+        try:
+            started = time.perf_counter()
+            cur.execute(sql, args or ())
+            columns = [d[0] for d in cur.description]
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                elapsed += time.perf_counter() - started
+                if not rows:
+                    break
+                total += len(rows)
+                yield columns, rows
+                started = time.perf_counter()
+        except Exception as e:
+            elapsed += time.perf_counter() - started
+            error = type(e).__name__
+            raise
+        finally:
+            # 没读完就关闭时 SSCursor 会把剩余结果读掉，连接才能放回池里
+            cur.close()
+            conn.rollback()
+            metrics.record_query(sql, elapsed, total, acquire, error)
+
+_RE_NEW = re.compile(r"\bNEW\((\w+)\)")
+
+def upsert_sql(table, columns, keys, updates=None, values=None):
+    """生成按唯一键插入或更新的语句（MySQL: ON DUPLICATE KEY UPDATE；SQLite: ON CONFLICT）。
+
+    updates 为 {列: 表达式}，表达式里用 NEW(列) 表示本次要插入的值；
+    为空时重复行保持不变（相当于只插入新行）。values 为 {列: SQL 表达式}（如 NOW(6)），
+    这些列插入表达式的值、不占参数位置。
+    """
+    values = values or {}
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(values.get(c, '%s') for c in columns)})"
+    )
+    new = r"excluded.\1" if is_sqlite() else r"VALUES(\1)"
+    sets = ", ".join(
+        "%s = %s" % (col, _RE_NEW.sub(new, expr)) for col, expr in (updates or {}).items()
+    )
+    if is_sqlite():
+        action = f"DO UPDATE SET {sets}" if sets else "DO NOTHING"
+        return f"{sql} ON CONFLICT ({', '.join(keys)}) {action}"
+    return f"{sql} ON DUPLICATE KEY UPDATE {sets or f'{keys[0]} = {keys[0]}'}"
+
+def update_join(table, alias, source, on, assignments):
+    """生成“用派生表批量更新”的语句（MySQL: UPDATE ... JOIN；SQLite: UPDATE ... FROM）。
+
+    source 为带别名 d 的派生表（见 values_table），assignments 为 [(列, 表达式), ...]。
+    """
+    if is_sqlite():
+        sets = ", ".join(f"{col} = {expr}" for col, expr in assignments)
+        return f"UPDATE {table} AS {alias} SET {sets} FROM {source} AS d WHERE {on}"
+    sets = ", ".join(f"{alias}.{col} = {expr}" for col, expr in assignments)
+    return f"UPDATE {table} {alias} JOIN {source} d ON {on} SET {sets}"
+
+def translate_ddl(stmt):
+    """schema.sql / 迁移文件里的 MySQL DDL 按当前后端翻译，返回语句列表。"""
+    if is_sqlite():
+        import db_sqlite
+        return db_sqlite.translate_ddl(stmt)
+    return [stmt]
+
+def is_duplicate_key(e):
+    """唯一键冲突（如型号重复）。"""
+    if is_sqlite():
+        import db_sqlite
+        return db_sqlite.is_duplicate_key(e)
+    return isinstance(e, pymysql.err.IntegrityError) and e.args and e.args[0] == 1062
+
+def is_duplicate_ddl_error(e):
+    """重跑迁移时“列/索引已存在”的错误，可以视为已完成。"""
+    if is_sqlite():
+        import db_sqlite
+        return db_sqlite.is_duplicate_ddl_error(e)
+    # 1060 Duplicate column name / 1061 Duplicate key name
+    return isinstance(e, pymysql.err.MySQLError) and e.args and e.args[0] in (1060, 1061)
+
+def values_table(rows, names):
+    """把 [(...), ...] 拼成 (SELECT %s AS a, ... UNION ALL SELECT %s, ...) 派生表，返回 (sql, args)。
+
+    用于一条 UPDATE ... JOIN 批量更新多行，例如：
+    UPDATE product p JOIN <派生表> d ON p.id = d.id SET p.quantity = p.quantity + d.qty
+
+    SQLite 的复合 SELECT 最多 500 段，那里改用一个多行 VALUES（行数不受这个限制）：
+    (SELECT column1 AS a, ... FROM (VALUES (%s, ...), (%s, ...)))。
+    """
+    args = [v for row in rows for v in row]
+    if is_sqlite():
+        cols = ", ".join(f"column{i} AS {n}" for i, n in enumerate(names, 1))
+        row = "(" + ", ".join(["%s"] * len(names)) + ")"
+        return f"(SELECT {cols} FROM (VALUES {', '.join([row] * len(rows))}))", args
+    head = "SELECT " + ", ".join(f"%s AS {n}" for n in names)
+    tail = " UNION ALL SELECT " + ", ".join(["%s"] * len(names))
+    sql = "(" + head + tail * (len(rows) - 1) + ")"
+    return sql, args
+
+def _keyset_sql(sql, key_col, before, limit, args, where, group_by):
+    conds = list(where or [])
+    params = list(args or ())
+    if before is not None:
+        conds.append(f"{key_col} < %s")
+        params.append(before)
+    if conds:
+        sql += " WHERE " + " AND ".join(conds)
+    if group_by:
+        sql += f" GROUP BY {group_by}"
+    sql += f" ORDER BY {key_col} DESC LIMIT %s"
+    params.append(int(limit) + 1)
+    return sql, params
+
+def _infer_dtype(values):
+    sample = next((v for v in values if v is not None), None)
+    if isinstance(sample, bool):
+        return "boolean"
+    if isinstance(sample, (Decimal, float)):
+        return "float64"
+    if isinstance(sample, int):
+        return "Int64"
+    if isinstance(sample, (datetime, date)):
+        return "datetime64[ns]"
+    return None
+
+def _to_column(values, dtype):
+    import numpy as np
+    import pandas as pd
+
+    if dtype is None:
+        return np.array(values, dtype=object)
+    if dtype == "float64":
+        return np.fromiter((np.nan if v is None else float(v) for v in values), "float64", len(values))
+    if dtype == "Int64":
+        return pd.array([None if v is None else int(v) for v in values], dtype="Int64")
+    if dtype.startswith("datetime64"):
+        return pd.to_datetime(list(values)).astype(dtype)
+    if dtype == "string":
+        return pd.array([None if v is None else str(v) for v in values], dtype="string")
+    return pd.array(list(values), dtype=dtype)
+
+def to_frame(columns, rows, dtypes=None, labels=None):
+    """元组行按列构造 DataFrame。
+
+    dtypes 为 {列: pandas dtype}，未给出的列按首个非空值推断：Decimal/float → float64，
+    int → Int64，日期时间 → datetime64，其余保持 object。labels 为 {列: 显示名}，
+    给出时只保留其中的列、按其顺序排列并换成显示名。
+    """
+    import pandas as pd
+
+    dtypes = dtypes or {}
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    data = {}
+    for name, col in zip(columns, values):
+        if labels is not None and name not in labels:
+            continue
+        data[name] = _to_column(col, dtypes.get(name) or _infer_dtype(col))
+    df = pd.DataFrame(data, columns=[c for c in (labels or columns) if c in data])
+    return df.rename(columns=labels) if labels else df
+
+def fetch_frame(sql, args=None, columns=None, dtypes=None):
+    """查询结果直接构造成 DataFrame（元组游标，按列转换类型），columns 为 {列: 显示名}。"""
+    names, rows = _read(sql, args, _fetch_columns, cursorclass=pymysql.cursors.Cursor)
+    return to_frame(names, rows, dtypes, columns)
+
+def fetch_keyset_frame(sql, key_col, before=None, limit=50, args=None, where=None, group_by=None,
+                       key_field="id", columns=None, dtypes=None):
+    """按主键倒序的 keyset 分页：WHERE key < before ORDER BY key DESC LIMIT n，结果为 DataFrame。
+
+    sql 只写到 FROM/JOIN 为止（不含 WHERE/GROUP BY/ORDER BY），其余由这里拼接；
+    where 为额外条件列表。多取一行用来判断是否还有下一页，返回 (df, has_more, 本页最后一行的 key_field)。
+    key_field 不必出现在 columns 里（游标用的 id 通常不展示）。
+    """
+    names, rows = _read(
+        *_keyset_sql(sql, key_col, before, limit, args, where, group_by),
+        _fetch_columns, cursorclass=pymysql.cursors.Cursor,
+    )
+    page = rows[:limit]
+    last = page[-1][names.index(key_field)] if page else None
+    return to_frame(names, page, dtypes, columns), len(rows) > limit, last
+
+_fetch_executor = None
+_fetch_slots = None  # 线程池的空闲名额，交任务前先占，满了就在调用方线程上执行
+_fetch_executor_lock = threading.Lock()
+_fetch_local = threading.local()
+
+def _fetch_workers():
+    """fetch_many 线程池大小：DB_FETCH_WORKERS，为 0 时与连接池一样大。"""
+    return Config.DB_FETCH_WORKERS or Config.DB_POOL_SIZE
+
+def _get_fetch_executor():
+    global _fetch_executor, _fetch_slots
+    if _fetch_executor is None:
+        with _fetch_executor_lock:
+            if _fetch_executor is None:
+                workers = _fetch_workers()
+                _fetch_slots = threading.BoundedSemaphore(workers)
+                _fetch_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db-fetch")
+    return _fetch_executor, _fetch_slots
+
+def _run_task(task):
+    if callable(task):
+        return task()
+    if isinstance(task, str):
+        return execute_all(task)
+    sql, args = task
+    return execute_all(sql, args)
+
+def _run_in_worker(task, slots):
+    _fetch_local.active = True
+    try:
+        return _run_task(task)
+    finally:
+        _fetch_local.active = False
+        slots.release()
+
+def fetch_many(tasks):
+    """并发执行几个互不依赖的读取，返回 {名字: 结果}，耗时约等于最慢的那个。
+
+    tasks 为 {名字: SQL | (SQL, args) | 无参函数}：SQL 按 execute_all 执行，
+    函数原样调用（如带缓存的 load_products、分页查询）。第一个任务在调用方线程上执行，
+    其余交给共用线程池（大小见 _fetch_workers），线程池没有空闲名额时也在调用方线程上顺序执行，
+    不排队等别的会话；每个任务各借一个连接。调用方的 contextvars（当前页面等）会带过去，
+    查询统计照常归到该页面。只用于读，写入请用 transaction()。
+    有任务出错时等其余任务结束后，按 tasks 的顺序抛出第一个错误。
+    """
+    items = list(tasks.items())
+    # 只有一个任务、或已经在工作线程里（嵌套调用）时直接顺序执行，避免占满线程池互等
+    if len(items) <= 1 or getattr(_fetch_local, "active", False) or _fetch_workers() <= 1:
+        return {name: _run_task(task) for name, task in items}
+    executor, slots = _get_fetch_executor()
+    futures = {}
+    inline = [items[0]]
+    for name, task in items[1:]:
+        if slots.acquire(blocking=False):
+            futures[name] = executor.submit(contextvars.copy_context().run, _run_in_worker, task, slots)
+        else:
+            inline.append((name, task))
+    results, errors = {}, {}
+    for name, task in inline:
+        try:
+            results[name] = _run_task(task)
+        except Exception as e:
+            errors[name] = e
+    wait(futures.values())
+    for name in tasks:
+        if name in errors:
+            raise errors[name]
+        if name in futures:
+            results[name] = futures[name].result()
+    return {name: results[name] for name in tasks}
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""SQLite 后端（单机门店用，DB_BACKEND=sqlite）。
+
+对 db.py 暴露和 PyMySQL 一样的连接/游标接口：%s 占位符、字典行、lastrowid、
+execute 返回影响行数。页面里的 MySQL 写法在这里翻译：
+- DML：%s → ?，去掉 FOR UPDATE，INSERT IGNORE → INSERT OR IGNORE，
+  GROUP_CONCAT(... SEPARATOR 'x') → group_concat(..., 'x')；
+  CONCAT / CURDATE / NOW / LAST_INSERT_ID 注册为自定义函数；
+- DDL：schema.sql 和 sql/migrations 里的建表/加列/加索引语句翻译成 SQLite 语法，
+  ON UPDATE CURRENT_TIMESTAMP 用触发器实现，FULLTEXT 索引跳过。
+连接开 WAL，写事务用 BEGIN IMMEDIATE，读不阻塞写。
+
+连接不按线程缓存，和 MySQL 一样走 db.py 的连接池：Streamlit 每次重跑都在新线程上，
+按线程缓存的连接几乎用不上；池里的连接以 check_same_thread=False 打开，同一时刻只借给一个线程。
+DECIMAL 读出时按列的小数位数取整（见下面的转换器），SQL 里的金额运算仍是浮点。
+"""
+import re
+import sqlite3
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+from pathlib import Path
+
+from config import Config
+
+# 时间带上微秒（有的话），NOW(6) 心跳、updated_at 水位才不会丢精度
+sqlite3.register_adapter(datetime, lambda v: v.isoformat(" "))
+sqlite3.register_adapter(date, lambda v: v.isoformat())
+# SQLite 没有定点小数，DECIMAL 列按 REAL 存、SQL 里的加减也是浮点；读出时按列的小数位数
+# 取整回 Decimal（建表时 DECIMAL(p,s) 翻译成 DECIMAL_s(p,s)，见 _decimal_columns），只在这一处处理
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_converter("DATETIME", lambda b: datetime.fromisoformat(b.decode()))
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()[:10]))
+sqlite3.register_converter("DECIMAL", lambda b: Decimal(b.decode()))
+for _scale in range(10):
+    sqlite3.register_converter(
+        f"DECIMAL_{_scale}",
+        lambda b, q=Decimal(1).scaleb(-_scale): Decimal(b.decode()).quantize(q, ROUND_HALF_UP),
+    )
+
+LOCAL_NOW = "datetime('now', 'localtime')"
+
+
+# ---------- DML 翻译 ----------
+
+_RE_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\b", re.I)
+_RE_INSERT_IGNORE = re.compile(r"\bINSERT\s+IGNORE\b", re.I)
+_RE_SEPARATOR = re.compile(r"\s+SEPARATOR\s+('(?:[^']|'')*')\s*\)", re.I)
+
+
+@lru_cache(maxsize=1024)
+def translate(sql):
+    s = sql.replace("%s", "?").replace("%%", "%")
+    s = _RE_FOR_UPDATE.sub("", s)
+    s = _RE_INSERT_IGNORE.sub("INSERT OR IGNORE", s)
+    s = _RE_SEPARATOR.sub(r", \1)", s)
+    return s
+
+
+# ---------- DDL 翻译 ----------
+
+_RE_COMMENT_LINE = re.compile(r"^\s*--.*$", re.M)
+_RE_COL_COMMENT = re.compile(r"\s+COMMENT\s+'(?:[^']|'')*'", re.I)
+_RE_TABLE_OPTIONS = re.compile(r"\)\s*ENGINE\s*=.*$", re.I | re.S)
+_RE_AUTO_PK = re.compile(r"\b(?:BIG)?INT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", re.I)
+_RE_ON_UPDATE = re.compile(r"\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP\b", re.I)
+_RE_DEFAULT_NOW = re.compile(r"\bDEFAULT\s+CURRENT_TIMESTAMP\b", re.I)
+_RE_UNIQUE_KEY = re.compile(r"^\s*UNIQUE\s+(?:KEY|INDEX)\s+(\w+)\s*\(", re.I)
+_RE_PLAIN_KEY = re.compile(r"^\s*(?:KEY|INDEX)\s+(\w+)\s*\(([^)]*)\)\s*,?\s*$", re.I)
+_RE_FULLTEXT_KEY = re.compile(r"^\s*FULLTEXT\s+(?:KEY|INDEX)\b", re.I)
+_RE_CREATE_TABLE = re.compile(r"^CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?", re.I)
+_RE_ALTER = re.compile(r"^ALTER\s+TABLE\s+`?(\w+)`?\s+(.*)$", re.I | re.S)
+_RE_ADD_INDEX = re.compile(
+    r"^ADD\s+(UNIQUE\s+)?(?:INDEX|KEY)\s+(\w+)\s*\(([^)]*)\)", re.I
+)
+_RE_ONLINE_OPTIONS = re.compile(r",\s*(?:ALGORITHM|LOCK)\s*=\s*\w+", re.I)
+_RE_AFTER = re.compile(r"\s+(?:AFTER\s+`?\w+`?|FIRST)\s*$", re.I)
+_RE_DECIMAL = re.compile(r"\bDECIMAL\s*\(\s*(\d+)\s*,\s*(\d+)\s*\)", re.I)
+
+
+def _decimal_columns(s):
+    # 类型名带上小数位数，读出时由对应的转换器取整（见文件开头）
+    return _RE_DECIMAL.sub(r"DECIMAL_\2(\1,\2)", s)
+
+
+def _strip_comments(stmt):
+    return _RE_COMMENT_LINE.sub("", stmt).strip()
+
+
+def _create_table(stmt, table):
+    out = []
+    indexes = []
+    triggers = []
+    for line in stmt.splitlines():
+        if _RE_FULLTEXT_KEY.match(line):
+            continue
+        m = _RE_PLAIN_KEY.match(line)
+        if m:
+            indexes.append(f"CREATE INDEX IF NOT EXISTS {m.group(1)} ON {table} ({m.group(2)})")
+            continue
+        line = _RE_UNIQUE_KEY.sub(lambda m: f"  CONSTRAINT {m.group(1)} UNIQUE (", line)
+        if _RE_ON_UPDATE.search(line):
+            col = line.split()[0].strip("`")
+            triggers.append(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{col} AFTER UPDATE ON {table} "
+                f"FOR EACH ROW WHEN NEW.{col} IS OLD.{col} "
+                f"BEGIN UPDATE {table} SET {col} = {LOCAL_NOW} WHERE rowid = NEW.rowid; END"
+            )
+            line = _RE_ON_UPDATE.sub("", line)
+        out.append(line)
+    s = "\n".join(out)
+    s = _RE_TABLE_OPTIONS.sub(")", s)
+    s = _RE_COL_COMMENT.sub("", s)
+    s = _RE_AUTO_PK.sub("INTEGER PRIMARY KEY AUTOINCREMENT", s)
+    s = _RE_DEFAULT_NOW.sub(f"DEFAULT ({LOCAL_NOW})", s)
+    s = _decimal_columns(s)
+    # 去掉删除索引行后留下的 ",\n)"
+    s = re.sub(r",\s*\)\s*$", "\n)", s)
+    return [s] + indexes + triggers
+
+
+def _alter_table(table, body):
+    body = _RE_ONLINE_OPTIONS.sub("", body).strip()
+    if re.search(r"\bADD\s+FULLTEXT\b", body, re.I):
+        return []  # SQLite 后端的搜索不走全文索引（含“DROP INDEX ..., ADD FULLTEXT ...”重建）
+    m = _RE_ADD_INDEX.match(body)
+    if m:
+        unique = "UNIQUE " if m.group(1) else ""
+        return [f"CREATE {unique}INDEX IF NOT EXISTS {m.group(2)} ON {table} ({m.group(3)})"]
+    m = re.match(r"^DROP\s+(?:INDEX|KEY)\s+(\w+)$", body, re.I)
+    if m:
+        return [f"DROP INDEX IF EXISTS {m.group(1)}"]
+    if re.match(r"^ADD\s+(?:COLUMN\s+)?", body, re.I):
+        col = _RE_AFTER.sub("", _RE_COL_COMMENT.sub("", body))
+        col = _RE_DEFAULT_NOW.sub("DEFAULT NULL", col)  # SQLite 加列不允许非常量默认值
+        col = _decimal_columns(col)
+        return [f"ALTER TABLE {table} {col}"]
+    return [f"ALTER TABLE {table} {body}"]
+
+
+def translate_ddl(stmt):
+    """把一条 MySQL DDL 翻译成若干条 SQLite 语句（可能为空）。"""
+    s = _strip_comments(stmt)
+    if not s or re.match(r"^(USE|SET)\s", s, re.I):
+        return []
+    m = _RE_CREATE_TABLE.match(s)
+    if m:
+        return _create_table(s, m.group(1))
+    m = _RE_ALTER.match(s)
+    if m:
+        return _alter_table(m.group(1), m.group(2))
+    return [translate(s)]
+
+
+def is_duplicate_ddl_error(e):
+    """重跑迁移时“列已存在”之类的错误。"""
+    return isinstance(e, sqlite3.OperationalError) and "duplicate column name" in str(e)
+
+
+def is_duplicate_key(e):
+    return isinstance(e, sqlite3.IntegrityError) and "UNIQUE constraint failed" in str(e)
+
+
+def is_connection_error(e):
+    """库文件打不开、磁盘错误之类（只读副本文件被替换或删除时出现）。"""
+    return isinstance(e, sqlite3.OperationalError) and (
+        "unable to open" in str(e) or "disk I/O error" in str(e)
+    )
+
+
+# ---------- 连接与游标 ----------
+
+def _concat(*args):
+    # 与 MySQL 一致：任一参数为 NULL 结果为 NULL
+    if any(a is None for a in args):
+        return None
+    return "".join(str(a) for a in args)
+
+
+def _now(fsp=0):
+    # NOW() 到秒，NOW(6) 带微秒（与 MySQL 一致）
+    return datetime.now().isoformat(" ", timespec="microseconds" if fsp else "seconds")
+
+
+def _regexp_replace(s, pattern, repl):
+    # 与 MySQL 8 的 REGEXP_REPLACE(expr, pat, repl) 一致：替换全部匹配，NULL 进 NULL 出
+    if s is None or pattern is None or repl is None:
+        return None
+    return re.sub(pattern, repl, str(s))
+
+
+class Cursor:
+    """包一层 sqlite3 游标，行为向 PyMySQL 看齐。"""
+
+    def __init__(self, conn, as_dict=True):
+        self._conn = conn
+        self._cur = conn.raw.cursor()
+        self._as_dict = as_dict
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _row(self, row):
+        if row is None or not self._as_dict:
+            return row
+        return {d[0]: v for d, v in zip(self._cur.description, row)}
+
+    def execute(self, sql, args=None):
+        self._cur.execute(translate(sql), tuple(args or ()))
+        return max(self._cur.rowcount, 0)
+
+    def executemany(self, sql, seq_args):
+        self._cur.executemany(translate(sql), [tuple(a) for a in seq_args])
+        return max(self._cur.rowcount, 0)
+
+    def fetchone(self):
+        return self._row(self._cur.fetchone())
+
+    def fetchmany(self, size):
+        return [self._row(r) for r in self._cur.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cur.fetchall()]
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    def close(self):
+        self._cur.close()
+
+
+class Connection:
+    """包一层 sqlite3 连接：自动提交模式，显式 begin() 开写事务。"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._last_insert_id = 0
+        raw.create_function("CONCAT", -1, _concat)
+        raw.create_function("REGEXP_REPLACE", 3, _regexp_replace)
+        raw.create_function("CURDATE", 0, lambda: date.today().isoformat())
+        raw.create_function("NOW", -1, _now)
+        raw.create_function("LAST_INSERT_ID", -1, self._last_insert_id_fn)
+
+    def _last_insert_id_fn(self, *args):
+        # LAST_INSERT_ID(expr) 记住 expr，LAST_INSERT_ID() 取回（numbering.py 发号用）
+        if args:
+            self._last_insert_id = args[0]
+            return args[0]
+        return self._last_insert_id
+
+    def cursor(self, cursorclass=None):
+        # 默认字典行（同 DictCursor）；显式传游标类（如 SSCursor）时返回元组行
+        return Cursor(self, as_dict=cursorclass is None)
+
+    def begin(self):
+        if not self.raw.in_transaction:
+            self.raw.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        if self.raw.in_transaction:
+            self.raw.execute("COMMIT")
+
+    def rollback(self):
+        if self.raw.in_transaction:
+            self.raw.execute("ROLLBACK")
+
+    def ping(self, reconnect=False):
+        self.raw.execute("SELECT 1")
+
+    def close(self):
+        self.raw.close()
+
+
+def connect(path=None, readonly=False):
+    """打开库文件；readonly 为真时只读打开（本地模拟只读副本用），文件不存在则报错而不是新建。"""
+    path = Path(path or Config.SQLITE_PATH)
+    if not readonly:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    raw = sqlite3.connect(
+        f"file:{path}?mode=ro" if readonly else str(path),
+        timeout=Config.SQLITE_BUSY_TIMEOUT,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        isolation_level=None,
+        # 连接由连接池保证同一时刻只被一个线程使用
+        check_same_thread=False,
+        uri=readonly,
+    )
+    pragmas = () if readonly else ("journal_mode = WAL", "synchronous = NORMAL")
+    for pragma in pragmas + (
+        "foreign_keys = ON",
+        f"busy_timeout = {int(Config.SQLITE_BUSY_TIMEOUT * 1000)}",
+        f"cache_size = {-Config.SQLITE_CACHE_MB * 1024}",
+        f"mmap_size = {Config.SQLITE_MMAP_MB * 1024 * 1024}",
+        "temp_store = MEMORY",
+    ):
+        raw.execute(f"PRAGMA {pragma}")
+    return Connection(raw)
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""发票、送货单：出库时只排队（jobs.enqueue），由 worker.py 在后台进程里生成。
+
+每张销售单最多一张发票、一张送货单（order_id 唯一）。生成时分配单号（numbering.py）、
+渲染成 HTML 写到 DOCUMENT_DIR 下，再写单据行；任务重试或被重新领取时，已有单据行且文件在
+就直接返回，单据行在但文件丢了就按原单号重新渲染。浏览器打开 HTML 即可打印或另存为 PDF。
+
+补生成：python worker.py --backfill 2026-01-01（见 enqueue_missing）。
+已归档（archive.py）的月份不再补生成，打包下载时连归档的单据一起打包。
+"""
+import html
+import os
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from pathlib import Path
+
+import archive
+import db
+import jobs
+import numbering
+from config import Config
+
+# 每种单据：表、单号列、标题
+KINDS = {
+    "invoice": {"table": "invoice", "no_col": "invoice_no", "title": "销售发票"},
+    "delivery_note": {"table": "delivery_note", "no_col": "note_no", "title": "送货单"},
+}
+
+_ORDER_SQL = (
+    "SELECT o.id, o.order_no, o.total_amount, o.created_at, c.name, c.phone, c.address "
+    "FROM sale_order o JOIN customer c ON c.id = o.customer_id WHERE o.id = %s"
+)
+_ITEMS_SQL = (
+    "SELECT p.category, p.model, i.quantity, i.unit_price "
+    "FROM sale_order_item i JOIN product p ON p.id = i.product_id "
+    "WHERE i.order_id = %s ORDER BY i.id"
+)
+
+_STYLE = (
+    "body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;width:100%}"
+    "th,td{border:1px solid #999;padding:4px 8px}td.n{text-align:right}"
+)
+
+
+def _esc(v):
+    return html.escape("" if v is None else str(v))
+
+
+def render(kind, number, order, items):
+    """渲染一张单据的 HTML。发票带单价、金额，送货单带收货地址和签收栏。"""
+    spec = KINDS[kind]
+    priced = kind == "invoice"
+    head = ["品类", "型号", "数量"] + (["单价", "金额"] if priced else [])
+    rows = []
+    for it in items:
+        cells = [f"<td>{_esc(it['category'])}</td>", f"<td>{_esc(it['model'])}</td>",
+                 f"<td class='n'>{it['quantity']}</td>"]
+        if priced:
+            cells += [f"<td class='n'>{float(it['unit_price']):.2f}</td>",
+                      f"<td class='n'>{it['quantity'] * float(it['unit_price']):.2f}</td>"]
+        rows.append("<tr>" + "".join(cells) + "</tr>")
+    lines = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>",
+        f"<title>{_esc(spec['title'])} {_esc(number)}</title><style>{_STYLE}</style></head><body>",
+        f"<h2>{_esc(spec['title'])}</h2>",
+        f"<p>单号：{_esc(number)}　销售单：{_esc(order['order_no'])}　日期：{order['created_at']:%Y-%m-%d}</p>",
+        f"<p>客户：{_esc(order['name'])}　电话：{_esc(order['phone'])}</p>",
+    ]
+    if not priced:
+        lines.append(f"<p>收货地址：{_esc(order['address'])}</p>")
+    lines.append("<table><tr>" + "".join(f"<th>{h}</th>" for h in head) + "</tr>" + "".join(rows) + "</table>")
+    if priced:
+        lines.append(f"<p>合计：{float(order['total_amount']):.2f}</p>")
+    else:
+        lines.append("<p>收货人签收：＿＿＿＿＿＿＿＿　日期：＿＿＿＿＿＿</p>")
+    lines.append("</body></html>")
+    return "\n".join(lines)
+
+
+def _write(rel_path, content):
+    """先写临时文件再改名，读方不会看到写了一半的文件。"""
+    path = Path(Config.DOCUMENT_DIR) / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def generate(kind, order_id):
+    """生成销售单 order_id 的一张单据，返回文件路径（相对 DOCUMENT_DIR）。可重复调用。
+
+    销售单是别的进程刚写入的，副本上可能还没有，全程读主库。
+    """
+    with db.use_primary():
+        return _generate(kind, order_id)
+
+
+def _generate(kind, order_id):
+    spec = KINDS[kind]
+    table, no_col = spec["table"], spec["no_col"]
+    existing = db.execute_one(
+        f"SELECT {no_col} AS number, file_path FROM {table} WHERE order_id = %s", (order_id,)
+    )
+    if existing and existing["file_path"] and (Path(Config.DOCUMENT_DIR) / existing["file_path"]).exists():
+        return existing["file_path"]
+
+    order = db.execute_one(_ORDER_SQL, (order_id,))
+    if order is None:
+        raise LookupError(f"销售单 {order_id} 不存在")
+    items = db.execute_all(_ITEMS_SQL, (order_id,))
+    number = existing["number"] if existing else numbering.next_number(kind)
+    rel_path = f"{kind}/{order['created_at']:%Y%m}/{number}.html"
+    _write(rel_path, render(kind, number, order, items))
+
+    if existing:
+        db.execute_update(f"UPDATE {table} SET file_path = %s WHERE order_id = %s", (rel_path, order_id))
+        return rel_path
+    columns = [no_col, "order_id", "file_path"] + (["amount"] if kind == "invoice" else [])
+    args = [number, order_id, rel_path] + ([order["total_amount"]] if kind == "invoice" else [])
+    try:
+        db.execute_insert(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+            args,
+        )
+    except Exception as e:
+        # 另一个 worker 同时生成了同一张单据：以先写入的为准，这次的号作废
+        if not db.is_duplicate_key(e):
+            raise
+        os.remove(Path(Config.DOCUMENT_DIR) / rel_path)
+        return db.execute_one(f"SELECT file_path FROM {table} WHERE order_id = %s", (order_id,))["file_path"]
+    return rel_path
+
+
+def enqueue_missing(start, end=None):
+    """给 [start, end] 内还没有单据的销售单排队生成，返回排队的任务数。"""
+    end = end or date.today()
+    pending = []
+    for kind, spec in KINDS.items():
+        rows = db.execute_all(
+            f"SELECT o.id FROM sale_order o LEFT JOIN {spec['table']} d ON d.order_id = o.id "
+            "WHERE o.created_at >= %s AND o.created_at < %s AND d.file_path IS NULL",
+            (start, end + timedelta(days=1)),
+        )
+        pending += [(kind, r["id"]) for r in rows]
+    size = Config.IMPORT_CHUNK_SIZE
+    for i in range(0, len(pending), size):
+        with db.transaction() as tx:
+            jobs.enqueue(tx, pending[i:i + size])
+    return len(pending)
+
+
+def bundle_to_tempfile(kind, start, end):
+    """把 [start, end] 内已生成的某种单据打成 zip 临时文件，返回 (文件路径, 单据数)；供页面下载用，文件由调用方下载后删除。"""
+    spec = KINDS[kind]
+    sql, args = archive.union(
+        f"SELECT d.id AS id, d.{spec['no_col']} AS number, d.file_path FROM {{{spec['table']}}} d "
+        "JOIN {sale_order} o ON o.id = d.order_id "
+        "WHERE o.created_at >= %s AND o.created_at < %s AND d.file_path IS NOT NULL",
+        (start, end + timedelta(days=1)),
+    )
+    rows = db.execute_all(sql + " ORDER BY id", args)
+    tmp = tempfile.NamedTemporaryFile(prefix=f"{kind}_", suffix=".zip", delete=False)
+    n = 0
+    with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zf:
+        for r in rows:
+            path = Path(Config.DOCUMENT_DIR) / r["file_path"]
+            if path.exists():
+                zf.write(path, arcname=f"{r['number']}.html")
+                n += 1
+    tmp.close()
+    return tmp.name, n
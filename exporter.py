@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""月底对账用的全量导出：销售明细、入库记录、维修记录。
+
+用非缓冲游标按块读取（db.iter_chunks），每块转成 DataFrame 后立即追加写入 CSV / Parquet，
+内存占用只和块大小有关，与历史数据量无关。销售、维修记录先读归档表再读热表（archive.sources），
+SQL 里的表名写成 {sale_order} 这样的占位。
+
+命令行：python exporter.py sales --start 2026-01-01 --end 2026-01-31 -o sales.csv
+"""
+import argparse
+import tempfile
+from datetime import date, timedelta
+
+import pandas as pd
+
+import archive
+import db
+from config import Config
+
+# 每个数据集：SQL（带日期条件占位）、列名映射、列类型；archived 表示要连归档表一起导出
+DATASETS = {
+    "sales": {
+        "title": "销售明细",
+        "sql": (
+            "SELECT o.order_no, o.created_at, o.status, c.name AS customer_name, c.phone, "
+            "       p.category, p.model, i.quantity, i.unit_price, "
+            "       i.quantity * i.unit_price AS line_amount, o.total_amount "
+            "FROM {sale_order} o "
+            "JOIN customer c ON o.customer_id = c.id "
+            "JOIN {sale_order_item} i ON i.order_id = o.id "
+            "JOIN product p ON p.id = i.product_id "
+            "WHERE o.created_at >= %s AND o.created_at < %s "
+            "ORDER BY o.id, i.id"
+        ),
+        "labels": {
+            "order_no": "单号",
+            "created_at": "时间",
+            "status": "状态",
+            "customer_name": "客户",
+            "phone": "电话",
+            "category": "品类",
+            "model": "型号",
+            "quantity": "数量",
+            "unit_price": "单价",
+            "line_amount": "行金额",
+            "total_amount": "整单金额",
+        },
+        "ints": ["quantity"],
+        "money": ["unit_price", "line_amount", "total_amount"],
+        "datetimes": ["created_at"],
+        "archived": True,
+    },
+    "stock_in": {
+        "title": "入库记录",
+        "sql": (
+            "SELECT s.id, s.created_at, p.category, p.model, s.quantity, s.cost_price, "
+            "       s.quantity * s.cost_price AS amount, s.note "
+            "FROM stock_in s JOIN product p ON s.product_id = p.id "
+            "WHERE s.created_at >= %s AND s.created_at < %s "
+            "ORDER BY s.id"
+        ),
+        "labels": {
+            "id": "入库ID",
+            "created_at": "时间",
+            "category": "品类",
+            "model": "型号",
+            "quantity": "数量",
+            "cost_price": "进价",
+            "amount": "金额",
+            "note": "备注",
+        },
+        "ints": ["id", "quantity"],
+        "money": ["cost_price", "amount"],
+        "datetimes": ["created_at"],
+    },
+    "maintenance": {
+        "title": "维修记录",
+        "sql": (
+            "SELECT m.id, m.created_at, m.maintained_at, c.name AS customer_name, c.phone, "
+            "       p.model AS product_model, m.content, m.result "
+            "FROM {maintenance} m "
+            "JOIN customer c ON m.customer_id = c.id "
+            "LEFT JOIN product p ON m.product_id = p.id "
+            "WHERE m.created_at >= %s AND m.created_at < %s "
+            "ORDER BY m.id"
+        ),
+        "labels": {
+            "id": "记录ID",
+            "created_at": "登记时间",
+            "maintained_at": "维修时间",
+            "customer_name": "客户",
+            "phone": "电话",
+            "product_model": "产品型号",
+            "content": "维修内容",
+            "result": "处理结果",
+        },
+        "ints": ["id"],
+        "money": [],
+        "datetimes": ["created_at", "maintained_at"],
+        "archived": True,
+    },
+}
+FORMATS = ("csv", "parquet")
+
+
+def iter_frames(dataset, start, end, chunk_size=None):
+    """按块 yield 已转好类型、换成中文列名的 DataFrame；end 为包含当天的截止日期。"""
+    spec = DATASETS[dataset]
+    args = (start, end + timedelta(days=1))
+    dtypes = {col: "string" for col in spec["labels"]}
+    dtypes.update({col: "Int64" for col in spec["ints"]})
+    dtypes.update({col: "float64" for col in spec["money"]})
+    dtypes.update({col: "datetime64[ns]" for col in spec["datetimes"]})
+    # 归档表里都是更早的整月，按顺序先导归档表再导热表，整体仍按时间排序
+    sqls = [spec["sql"].format(**src) for src in archive.sources()] if spec.get("archived") else [spec["sql"]]
+    for sql in sqls:
+        for columns, rows in db.iter_chunks(sql, args, chunk_size or Config.EXPORT_CHUNK_SIZE):
+            yield db.to_frame(columns, rows, dtypes, spec["labels"])
+
+
+def export(dataset, start, end, fmt, out, chunk_size=None):
+    """把数据集写到 out（路径或二进制文件对象），返回导出行数。"""
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的格式：{fmt}")
+    total = 0
+    if fmt == "csv":
+        first = True
+        for df in iter_frames(dataset, start, end, chunk_size):
+            # 带 BOM 方便 Excel 直接打开中文
+            df.to_csv(out, mode="w" if first else "a", header=first, index=False,
+                      encoding="utf-8-sig" if first else "utf-8")
+            first = False
+            total += len(df)
+        if first:
+            pd.DataFrame(columns=list(DATASETS[dataset]["labels"].values())).to_csv(
+                out, index=False, encoding="utf-8-sig"
+            )
+        return total
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for df in iter_frames(dataset, start, end, chunk_size):
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(out, table.schema)
+            else:
+                table = table.cast(writer.schema)
+            writer.write_table(table)
+            total += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return total
+
+
+def export_to_tempfile(dataset, start, end, fmt):
+    """导出到临时文件，返回 (文件路径, 行数)；供页面下载用，文件由调用方下载后删除。"""
+    tmp = tempfile.NamedTemporaryFile(prefix=f"{dataset}_", suffix=f".{fmt}", delete=False)
+    tmp.close()
+    return tmp.name, export(dataset, start, end, fmt, tmp.name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出销售/入库/维修历史（CSV 或 Parquet）")
+    parser.add_argument("dataset", choices=list(DATASETS))
+    parser.add_argument("--start", type=date.fromisoformat, required=True, help="起始日期 YYYY-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, required=True, help="截止日期（含当天）")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="默认按输出文件后缀判断")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--chunk-size", type=int, default=None)
+    opts = parser.parse_args()
+
+    fmt = opts.format or ("parquet" if opts.output.endswith(".parquet") else "csv")
+    n = export(opts.dataset, opts.start, opts.end, fmt, opts.output, opts.chunk_size)
+    print(f"已导出 {n} 行到 {opts.output}")
+
+
+if __name__ == "__main__":
+    main()
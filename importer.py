@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""批量导入产品 / 入库单（供应商送货清单，CSV 或 Excel）。
+
+每 IMPORT_CHUNK_SIZE 行一个事务：
+1. 新型号按 uk_model 批量插入（已存在的跳过）；
+2. 同一批里同一产品的数量合并成一条 UPDATE（顺带更新清单里给出的品类/售价/进价）；
+3. 入库记录用 executemany 批量写入。
+校验用 pandas 整列完成（含按表结构的长度、数值范围），不合格的行写进错误报告，不影响其他行；
+某一块写库失败时该块回滚、逐行记进错误报告，其余块照常导入。
+
+命令行：python importer.py 清单.csv [--errors 错误报告.csv]
+"""
+import argparse
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import cache
+import counters
+import db
+import valuation
+from config import Config
+
+# 表头别名：中文表头直接可用
+HEADER_ALIASES = {
+    "型号": "model",
+    "品类": "category",
+    "售价": "price",
+    "进价": "cost_price",
+    "数量": "quantity",
+    "备注": "note",
+}
+COLUMNS = ["model", "category", "price", "cost_price", "quantity", "note"]
+# 与表结构一致：price / cost_price 为 DECIMAL(12,2)，quantity 为 INT
+_MAX_PRICE = 1e10
+_MAX_QUANTITY = 2 ** 31 - 1
+# 一个派生表（values_table）最多放这么多行：一块 IMPORT_CHUNK_SIZE 行可能有上千个不同型号，
+# 一条语句里的行数和占位符个数都要有上限，按这个大小分几条语句在同一事务里执行
+_VALUES_BATCH = 500
+
+
+def read_chunks(source, chunk_size=None, filename=None):
+    """按块读取清单；source 为路径或文件对象（Streamlit 上传的文件）。"""
+    chunk_size = chunk_size or Config.IMPORT_CHUNK_SIZE
+    name = str(filename or getattr(source, "name", source)).lower()
+    if name.endswith((".xlsx", ".xls")):
+        # Excel 无法流式读取，整表读入后再切块
+        df = pd.read_excel(source, dtype=str)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    else:
+        yield from pd.read_csv(source, dtype=str, chunksize=chunk_size, encoding="utf-8-sig")
+
+
+def validate(chunk, first_line):
+    """整列校验，返回 (合格行 DataFrame, 错误列表)。first_line 为该块第一行在文件里的行号。"""
+    df = chunk.rename(columns=lambda c: HEADER_ALIASES.get(str(c).strip(), str(c).strip()))
+    if "model" not in df.columns:
+        raise ValueError("清单缺少“型号”(model) 列")
+    df = df.reindex(columns=COLUMNS)
+    df.index = range(first_line, first_line + len(df))
+
+    out = pd.DataFrame(index=df.index)
+    out["model"] = df["model"].astype("string").str.strip()
+    out["category"] = df["category"].astype("string").str.strip().replace("", pd.NA)
+    out["note"] = df["note"].astype("string").str.strip().replace("", pd.NA)
+    for col in ("price", "cost_price", "quantity"):
+        out[col] = pd.to_numeric(df[col], errors="coerce")
+
+    checks = [
+        (out["model"].isna() | (out["model"] == ""), "型号为空"),
+        (out["model"].str.len() > 128, "型号超过 128 个字符"),
+        (out["category"].str.len() > 64, "品类超过 64 个字符"),
+        (out["note"].str.len() > 255, "备注超过 255 个字符"),
+        (df["quantity"].notna() & out["quantity"].isna(), "数量不是数字"),
+        (out["quantity"].notna() & ((out["quantity"] < 0) | (out["quantity"] % 1 != 0)), "数量必须是非负整数"),
+        (out["quantity"] > _MAX_QUANTITY, "数量超出范围"),
+        (df["price"].notna() & (out["price"].isna() | (out["price"] < 0)), "售价无效"),
+        (out["price"] >= _MAX_PRICE, "售价超出范围"),
+        (df["cost_price"].notna() & (out["cost_price"].isna() | (out["cost_price"] < 0)), "进价无效"),
+        (out["cost_price"] >= _MAX_PRICE, "进价超出范围"),
+    ]
+    bad = pd.Series(False, index=out.index)
+    errors = []
+    for mask, message in checks:
+        mask = mask.fillna(False).astype(bool) & ~bad
+        for line, model in out.loc[mask, "model"].items():
+            errors.append({"行号": line, "型号": None if pd.isna(model) else model, "错误": message})
+        bad |= mask
+    good = out[~bad].copy()
+    good["quantity"] = good["quantity"].fillna(0).astype("int64")
+    return good, errors
+
+
+def _none(v):
+    return None if pd.isna(v) else v
+
+
+def import_chunk(good):
+    """一个事务导入一块合格行，返回 (新建型号数, 入库记录数)。"""
+    if good.empty:
+        return 0, 0
+    # 同一型号在一块里出现多次：属性取最后一次给出的值，数量求和
+    per_model = good.groupby("model", sort=False).agg(
+        category=("category", "last"),
+        price=("price", "last"),
+        cost_price=("cost_price", "last"),
+        quantity=("quantity", "sum"),
+    )
+    models = list(per_model.index)
+
+    with db.transaction() as tx:
+        created = tx.execute_many(
+            db.upsert_sql("product", ["category", "model", "price", "cost_price", "quantity"], ["model"]),
+            [
+                (_none(r.category), m, float(_none(r.price) or 0), float(_none(r.cost_price) or 0), 0)
+                for m, r in per_model.iterrows()
+            ],
+        ) or 0
+        # 清单型号由库按唯一键对到已有行：utf8mb4 默认排序规则不分大小写和重音，
+        # 库里返回的 model 可能和清单写法不同（"wm-100a" 对到 "WM-100A"），不能按字符串在 Python 里对
+        existing = []
+        for start in range(0, len(models), _VALUES_BATCH):
+            table, args = db.values_table([(m,) for m in models[start:start + _VALUES_BATCH]], ["model"])
+            existing += tx.execute_all(
+                f"SELECT d.model AS given, p.id, p.cost_price FROM product p JOIN {table} d ON p.model = d.model "
+                "FOR UPDATE",
+                args,
+            )
+        ids = {r["given"]: r["id"] for r in existing}
+        old_cost = {r["given"]: r["cost_price"] for r in existing}
+        # 写法不同的同一型号落到同一行，按产品再合并一次
+        per_product = per_model.assign(id=[ids[m] for m in models]).groupby("id", sort=False).agg(
+            category=("category", "last"),
+            price=("price", "last"),
+            cost_price=("cost_price", "last"),
+            quantity=("quantity", "sum"),
+        )
+
+        receipts = [
+            (
+                ids[r.model],
+                int(r.quantity),
+                float(r.cost_price) if not pd.isna(r.cost_price) else old_cost[r.model],
+                _none(r.note),
+            )
+            for r in good.itertuples()
+            if r.quantity > 0
+        ]
+        # 每行入库按各自进价计入库存总成本（移动加权平均）
+        value = {}
+        for pid, qty, cost, _ in receipts:
+            value[pid] = value.get(pid, 0) + valuation.receipt_value(qty, cost)
+
+        updates = [
+            (pid, int(r.quantity), value.get(pid, 0), _none(r.category), _none(r.price), _none(r.cost_price))
+            for pid, r in per_product.iterrows()
+        ]
+        for start in range(0, len(updates), _VALUES_BATCH):
+            table, args = db.values_table(
+                updates[start:start + _VALUES_BATCH],
+                ["id", "qty", "value", "category", "price", "cost_price"],
+            )
+            tx.execute_update(
+                db.update_join("product", "p", table, "p.id = d.id", [
+                    ("quantity", "p.quantity + d.qty"),
+                    ("stock_value", "p.stock_value + d.value"),
+                    ("category", "COALESCE(d.category, p.category)"),
+                    ("price", "COALESCE(d.price, p.price)"),
+                    ("cost_price", "COALESCE(d.cost_price, p.cost_price)"),
+                ]),
+                args,
+            )
+
+        if receipts:
+            tx.execute_many(
+                "INSERT INTO stock_in (product_id, quantity, cost_price, note) VALUES (%s, %s, %s, %s)",
+                receipts,
+            )
+        if created:
+            counters.incr(tx, "product_count", created)
+    return created, len(receipts)
+
+
+def import_file(source, chunk_size=None, filename=None, progress=None):
+    """导入整份清单，返回汇总 dict（含 errors 错误报告 DataFrame）。"""
+    started = time.monotonic()
+    result = {"rows": 0, "imported": 0, "products_created": 0, "stock_in_rows": 0}
+    errors = []
+    line = 2  # 第 1 行是表头
+    try:
+        for chunk in read_chunks(source, chunk_size, filename):
+            good, chunk_errors = validate(chunk, line)
+            line += len(chunk)
+            errors.extend(chunk_errors)
+            result["rows"] += len(chunk)
+            try:
+                created, receipts = import_chunk(good)
+            except Exception as e:
+                # 这一块整体回滚，逐行记进错误报告后继续导入后面的块（前面的块已提交）
+                message = f"写入数据库失败，本块 {len(good)} 行均未导入：{e}"
+                errors.extend({"行号": n, "型号": model, "错误": message} for n, model in good["model"].items())
+                if progress:
+                    progress(result["rows"])
+                continue
+            result["imported"] += len(good)
+            result["products_created"] += created
+            result["stock_in_rows"] += receipts
+            if progress:
+                progress(result["rows"])
+    finally:
+        # 已提交的块也要让缓存失效
+        if result["imported"]:
+            cache.bump("product", "replenish")
+    result["errors"] = pd.DataFrame(errors, columns=["行号", "型号", "错误"])
+    result["seconds"] = round(time.monotonic() - started, 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量导入产品/入库清单（CSV 或 Excel）")
+    parser.add_argument("file")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--errors", help="错误报告输出路径（CSV）")
+    opts = parser.parse_args()
+
+    result = import_file(Path(opts.file), opts.chunk_size)
+    errors = result.pop("errors")
+    print("导入完成：", result)
+    if len(errors):
+        print(f"有 {len(errors)} 行未导入")
+        if opts.errors:
+            errors.to_csv(opts.errors, index=False, encoding="utf-8-sig")
+            print("错误报告已写入", opts.errors)
+        else:
+            print(errors.head(20).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,44 @@
 """
 一键执行 schema.sql 建表（在 Cursor 里没有“执行 SQL”时用这个）。
 在项目根目录运行：python init_db.py
+
+之后的表结构变更放在 sql/migrations/NNNN_说明.sql，按编号顺序执行一次，
+执行记录（含校验和）存在 schema_migration 表；streamlit_app 启动时也会检查一遍。
 """
+import hashlib
+import re
+import threading
+import time
+
 import pymysql
 from pathlib import Path
 
+import analytics
+import counters
+import db
+import valuation
 from config import Config
 
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "sql" / "migrations"
+MIGRATION_LOCK = "mycrm_schema_migration"
+
+_CREATE_MIGRATION_TABLE = (
+    "CREATE TABLE IF NOT EXISTS schema_migration ("
+    "  version VARCHAR(16) NOT NULL PRIMARY KEY,"
+    "  name VARCHAR(128) NOT NULL,"
+    "  checksum CHAR(64) NOT NULL,"
+    "  duration_ms INT NOT NULL DEFAULT 0,"
+    "  applied_at DATETIME DEFAULT CURRENT_TIMESTAMP"
+    ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+)
+
+_migrated = False
+_migrate_lock = threading.Lock()
+
+
+class MigrationError(Exception):
+    pass
+
 def _split_sql(sql: str):
     stmts = []
     buf = []
@@ -48,6 +80,100 @@ def _split_sql(sql: str):
         stmts.append(last)
     return stmts
 
+def load_migrations():
+    """读取 sql/migrations 下的迁移文件，返回按版本排序的 [(version, name, checksum, sql)]。"""
+    migrations = []
+    if not MIGRATIONS_DIR.exists():
+        return migrations
+    for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        m = re.match(r"^(\d+)_(.+)\.sql$", path.name)
+        if not m:
+            continue
+        sql = path.read_text(encoding="utf-8")
+        checksum = hashlib.sha256(sql.encode("utf-8")).hexdigest()
+        migrations.append((m.group(1), m.group(2), checksum, sql))
+    return migrations
+
+
+def _pending(cur, migrations):
+    cur.execute("SELECT version, checksum FROM schema_migration")
+    applied = {r["version"]: r["checksum"] for r in cur.fetchall()}
+    changed = [v for v, _, checksum, _ in migrations if v in applied and applied[v] != checksum]
+    if changed:
+        raise MigrationError(f"已执行的迁移文件被修改过：{', '.join(changed)}，请新建迁移而不是改旧文件")
+    return [m for m in migrations if m[0] not in applied]
+
+
+def migrate(verbose=True):
+    """执行所有未执行的迁移，返回本次执行的版本列表。
+
+    多个进程同时启动时用 GET_LOCK 串行化（SQLite 没有 GET_LOCK，整批迁移放在一个
+    BEGIN IMMEDIATE 写事务里，别的进程等写锁）；没有待执行迁移时只有一次查询。
+    迁移文件按 MySQL 写，SQLite 后端经 db.translate_ddl 翻译后执行。
+    """
+    migrations = load_migrations()
+    sqlite = db.is_sqlite()
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            for stmt in db.translate_ddl(_CREATE_MIGRATION_TABLE):
+                cur.execute(stmt)
+            if not _pending(cur, migrations):
+                return []
+            if sqlite:
+                conn.begin()
+            else:
+                cur.execute("SELECT GET_LOCK(%s, 60) AS ok", (MIGRATION_LOCK,))
+                if not cur.fetchone()["ok"]:
+                    raise MigrationError("等待迁移锁超时")
+                # 结束上面 _pending 打开的一致性读快照，下面重新确认时才看得到别的进程刚提交的迁移
+                conn.commit()
+            try:
+                done = []
+                # 拿到锁后重新确认，别的进程可能已经跑完了
+                for version, name, checksum, sql in _pending(cur, migrations):
+                    started = time.monotonic()
+                    for stmt in _split_sql(sql):
+                        for s in db.translate_ddl(stmt):
+                            try:
+                                cur.execute(s)
+                            except Exception as e:
+                                # 迁移中途失败后重跑时，已经加上的列/索引视为已完成
+                                if db.is_duplicate_ddl_error(e):
+                                    continue
+                                raise
+                    cur.execute(
+                        "INSERT INTO schema_migration (version, name, checksum, duration_ms) "
+                        "VALUES (%s, %s, %s, %s)",
+                        (version, name, checksum, int((time.monotonic() - started) * 1000)),
+                    )
+                    if not sqlite:
+                        conn.commit()
+                    done.append(version)
+                    if verbose:
+                        print(f"迁移 {version}_{name} 已执行")
+                conn.commit()
+                return done
+            finally:
+                if sqlite:
+                    conn.rollback()
+                else:
+                    cur.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+    finally:
+        conn.close()
+
+
+def ensure_migrated():
+    """每个进程只检查一次（供 streamlit_app 启动时调用）。"""
+    global _migrated
+    if _migrated:
+        return
+    with _migrate_lock:
+        if not _migrated:
+            migrate(verbose=False)
+            _migrated = True
+
+
 def main():
     base = Path(__file__).resolve().parent
     schema_file = base / "sql" / "schema.sql"
@@ -55,31 +181,27 @@ def main():
         print("找不到 sql/schema.sql")
         return
 
-    # 1. 先建库（连接时不指定 database）
-    conn_no_db = pymysql.connect(
-        host=Config.DB_HOST,
-        port=Config.DB_PORT,
-        user=Config.DB_USER,
-        password=Config.DB_PASSWORD,
-        charset="utf8mb4",
-    )
-    try:
-        with conn_no_db.cursor() as cur:
-            cur.execute("CREATE DATABASE IF NOT EXISTS mycrm DEFAULT CHARACTER SET utf8mb4")
-        conn_no_db.commit()
-        print("数据库 mycrm 已就绪")
-    finally:
-        conn_no_db.close()
-
-    # 2. 连接 mycrm 并执行 schema.sql
-    conn = pymysql.connect(
-        host=Config.DB_HOST,
-        port=Config.DB_PORT,
-        user=Config.DB_USER,
-        password=Config.DB_PASSWORD,
-        database=Config.DB_NAME,
-        charset="utf8mb4",
-    )
+    # 1. 先建库（连接时不指定 database）；SQLite 库文件在连接时自动创建
+    if db.is_sqlite():
+        print(f"SQLite 数据库文件：{Config.SQLITE_PATH}")
+    else:
+        conn_no_db = pymysql.connect(
+            host=Config.DB_HOST,
+            port=Config.DB_PORT,
+            user=Config.DB_USER,
+            password=Config.DB_PASSWORD,
+            charset="utf8mb4",
+        )
+        try:
+            with conn_no_db.cursor() as cur:
+                cur.execute(f"CREATE DATABASE IF NOT EXISTS `{Config.DB_NAME}` DEFAULT CHARACTER SET utf8mb4")
+            conn_no_db.commit()
+            print(f"数据库 {Config.DB_NAME} 已就绪")
+        finally:
+            conn_no_db.close()
+
+    # 2. 连接 DB_NAME 并执行 schema.sql（SQLite 后端先翻译成 SQLite 语法）
+    conn = db.get_connection()
     sql = schema_file.read_text(encoding="utf-8")
     try:
         with conn.cursor() as cur:
@@ -90,16 +212,14 @@ def main():
                 # 忽略 MySQL CLI 专用指令
                 if s.lower().startswith("delimiter "):
                     continue
-                cur.execute(s)
-            # 兼容已创建旧表：补充品类字段
-            try:
-                cur.execute(
-                    "ALTER TABLE product "
-                    "ADD COLUMN category VARCHAR(64) DEFAULT NULL COMMENT '品类/大类（如 洗衣机、烘干机）' "
-                    "AFTER id"
-                )
-            except Exception:
-                pass
+                # 跳过纯注释段；连接时已指定 DB_NAME，忽略 schema.sql 里写死的 USE mycrm
+                code = "\n".join(
+                    line for line in s.splitlines() if not line.lstrip().startswith("--")
+                ).strip()
+                if not code or code.lower().startswith("use "):
+                    continue
+                for t in db.translate_ddl(s):
+                    cur.execute(t)
         conn.commit()
         print("schema.sql 执行成功，表已创建。")
     except Exception as e:
@@ -107,5 +227,40 @@ def main():
     finally:
         conn.close()
 
+    # 3. 执行 sql/migrations 下未执行过的迁移（旧表补列、索引等）
+    try:
+        done = migrate()
+        print(f"迁移完成，本次执行 {len(done)} 个。")
+    except Exception as e:
+        print("迁移出错:", e)
+        return
+
+    # 4. 按现有数据重建概览页计数
+    try:
+        counters.reconcile()
+        print("统计计数已重建。")
+    except Exception as e:
+        print("重建统计计数出错:", e)
+
+    # 5. 按入库/出库历史重放核对库存估价（只报告，回填需确认后手动运行）
+    try:
+        result = valuation.verify()
+        if result["product_diffs"] or result["item_diffs"]:
+            print(
+                f"库存估价与历史重放不一致：{len(result['product_diffs'])} 个产品，"
+                f"{result['item_diffs']} 行销售成本，确认后运行 python valuation.py --fix 回填。"
+            )
+        else:
+            print("库存估价已核对。")
+    except Exception as e:
+        print("核对库存估价出错:", e)
+
+    # 6. 按现有销售明细重建销售分析日汇总
+    try:
+        n = analytics.rebuild()
+        print(f"销售分析日汇总已重建（{n} 行）。")
+    except Exception as e:
+        print("重建销售分析日汇总出错:", e)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""后台任务队列：任务存在 job 表里，由 worker.py 的进程池执行。
+
+- enqueue 在业务事务里调用，随业务一起提交或回滚；同一 (kind, ref_id) 只有一行，
+  重复排队会把它重置为待执行（任务本身须可重复执行）；
+- claim 用带条件的 UPDATE 抢占，多个 worker 同时领取也不会重复执行；
+- 领取时记下租约，worker 异常退出后由 requeue_expired 把过期任务放回队列；
+- 失败按 JOB_RETRY_SECONDS 翻倍退避重试，超过 JOB_MAX_ATTEMPTS 次记为 failed，
+  可在“单据”页面重新排队。
+"""
+from datetime import datetime, timedelta
+
+import db
+from config import Config
+
+STATUSES = ["pending", "running", "done", "failed"]
+
+
+def enqueue(tx, jobs, delay=0):
+    """在事务 tx 里排队，jobs 为 [(kind, ref_id), ...]。"""
+    run_after = datetime.now() + timedelta(seconds=delay)
+    tx.execute_many(
+        db.upsert_sql(
+            "job",
+            ["kind", "ref_id", "status", "attempts", "run_after"],
+            ["kind", "ref_id"],
+            {
+                "status": "NEW(status)",
+                "attempts": "NEW(attempts)",
+                "run_after": "NEW(run_after)",
+                "last_error": "NULL",
+            },
+        ),
+        [(kind, ref_id, "pending", 0, run_after) for kind, ref_id in jobs],
+    )
+
+
+def claim(worker_id, limit):
+    """领取最多 limit 个到期任务，返回 [{"id", "kind", "ref_id", "attempts"}, ...]（attempts 已含本次）。"""
+    now = datetime.now()
+    with db.use_primary():
+        rows = db.execute_all(
+            "SELECT id, kind, ref_id, attempts FROM job WHERE status = 'pending' AND run_after <= %s "
+            "ORDER BY run_after, id LIMIT %s",
+            (now, int(limit)),
+        )
+    lease = now + timedelta(seconds=Config.JOB_LEASE_SECONDS)
+    claimed = []
+    for row in rows:
+        # 别的 worker 先改掉了 status 时这里影响 0 行，跳过即可
+        n = db.execute_update(
+            "UPDATE job SET status = 'running', attempts = attempts + 1, locked_by = %s, locked_until = %s "
+            "WHERE id = %s AND status = 'pending'",
+            (worker_id, lease, row["id"]),
+        )
+        if n:
+            row["attempts"] += 1
+            claimed.append(row)
+    return claimed
+
+
+def complete(job_id):
+    db.execute_update(
+        "UPDATE job SET status = 'done', locked_by = NULL, locked_until = NULL, last_error = NULL "
+        "WHERE id = %s",
+        (job_id,),
+    )
+
+
+def fail(job, error):
+    """执行失败：次数未用完则退避后重新排队，否则记为 failed。"""
+    if job["attempts"] >= Config.JOB_MAX_ATTEMPTS:
+        status, run_after = "failed", datetime.now()
+    else:
+        delay = Config.JOB_RETRY_SECONDS * 2 ** (job["attempts"] - 1)
+        status, run_after = "pending", datetime.now() + timedelta(seconds=delay)
+    db.execute_update(
+        "UPDATE job SET status = %s, run_after = %s, locked_by = NULL, locked_until = NULL, "
+        "last_error = %s WHERE id = %s",
+        (status, run_after, str(error)[:255], job["id"]),
+    )
+
+
+def release(job_ids):
+    """worker 退出前把还没做完的任务放回队列（不计失败次数）。"""
+    if not job_ids:
+        return
+    placeholders = ", ".join(["%s"] * len(job_ids))
+    db.execute_update(
+        "UPDATE job SET status = 'pending', attempts = attempts - 1, locked_by = NULL, locked_until = NULL "
+        f"WHERE status = 'running' AND id IN ({placeholders})",
+        list(job_ids),
+    )
+
+
+def requeue_expired():
+    """租约已过期的 running 任务（worker 被杀、机器重启）重新排队，返回条数。"""
+    return db.execute_update(
+        "UPDATE job SET status = 'pending', locked_by = NULL, locked_until = NULL "
+        "WHERE status = 'running' AND locked_until < %s",
+        (datetime.now(),),
+    )
+
+
+def retry_failed(kind=None):
+    """把 failed 的任务清零次数重新排队，返回条数。"""
+    sql = "UPDATE job SET status = 'pending', attempts = 0, run_after = %s WHERE status = 'failed'"
+    args = [datetime.now()]
+    if kind:
+        sql += " AND kind = %s"
+        args.append(kind)
+    return db.execute_update(sql, args)
+
+
+def stats():
+    """各状态的任务数：{status: n}。"""
+    rows = db.execute_all("SELECT status, COUNT(*) AS n FROM job GROUP BY status")
+    counts = dict.fromkeys(STATUSES, 0)
+    counts.update({r["status"]: int(r["n"]) for r in rows})
+    return counts
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""查询与页面耗时统计（进程内）。
+
+db.py 的 execute_* / execute_many / iter_chunks 每执行一条语句记一条：耗时、返回/影响行数、
+借连接耗时、所在页面、出错时的异常类型；
+streamlit_app 每次渲染页面记一条页面耗时。样本放在定长环形缓冲区里，
+按 SQL 指纹 / 页面汇总出 p50/p95/p99。超过 SLOW_QUERY_MS 的语句另写慢查询日志。
+"""
+import contextvars
+import logging
+import math
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from config import Config
+
+slow_log = logging.getLogger("mycrm.slow_query")
+
+current_page = contextvars.ContextVar("current_page", default=None)
+
+_lock = threading.Lock()
+_queries = deque(maxlen=Config.METRICS_BUFFER_SIZE)
+_pages = deque(maxlen=Config.METRICS_BUFFER_SIZE)
+
+_RE_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+_RE_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_UNION_VALUES = re.compile(r"(SELECT \?(?: AS \w+)?(?:, \?(?: AS \w+)?)*)(?: UNION ALL SELECT \?(?:, \?)*)+")
+_RE_VALUES_ROWS = re.compile(r"VALUES (\(\?(?:, \.\.\.)?\))(?:, \(\?(?:, \.\.\.)?\))+")
+_RE_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """把 SQL 归一成指纹：参数/字面量换成 ?，IN 列表和批量派生表折叠成一份。"""
+    s = _RE_SPACE.sub(" ", sql).strip()
+    s = s.replace("%s", "?")
+    s = _RE_STRING.sub("?", s)
+    s = _RE_NUMBER.sub("?", s)
+    s = _RE_PLACEHOLDER_LIST.sub("(?, ...)", s)
+    s = _RE_UNION_VALUES.sub(r"\1 UNION ALL ...", s)
+    s = _RE_VALUES_ROWS.sub(r"VALUES \1, ...", s)
+    return s
+
+
+def record_query(sql, elapsed, rows=None, acquire=0.0, error=None):
+    page = current_page.get()
+    with _lock:
+        _queries.append({
+            "ts": time.time(),
+            "sql": sql,
+            "elapsed": elapsed,
+            "rows": rows,
+            "acquire": acquire,
+            "page": page,
+            "error": error,
+        })
+    if Config.SLOW_QUERY_MS and elapsed * 1000 >= Config.SLOW_QUERY_MS:
+        slow_log.warning(
+            "慢查询 %.1fms（借连接 %.1fms，行数 %s，页面 %s）：%s",
+            elapsed * 1000, acquire * 1000, rows, page, _RE_SPACE.sub(" ", sql).strip(),
+        )
+
+
+@contextmanager
+def page_timer(name):
+    """包住一次页面渲染：期间的查询都标记为该页面，结束时记一条页面耗时。"""
+    token = current_page.set(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        current_page.reset(token)
+        with _lock:
+            _pages.append({"ts": time.time(), "page": name, "elapsed": elapsed})
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    # 最近秩法
+    k = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[k]
+
+
+def _summarize(groups):
+    out = []
+    for key, samples in groups.items():
+        elapsed = sorted(s["elapsed"] for s in samples)
+        row = {
+            "key": key,
+            "count": len(samples),
+            "p50_ms": round(percentile(elapsed, 50) * 1000, 2),
+            "p95_ms": round(percentile(elapsed, 95) * 1000, 2),
+            "p99_ms": round(percentile(elapsed, 99) * 1000, 2),
+            "max_ms": round(elapsed[-1] * 1000, 2),
+            "total_ms": round(sum(elapsed) * 1000, 2),
+        }
+        if "acquire" in samples[0]:
+            rows = [s["rows"] for s in samples if s["rows"] is not None]
+            row["avg_rows"] = round(sum(rows) / len(rows), 1) if rows else None
+            row["avg_acquire_ms"] = round(sum(s["acquire"] for s in samples) / len(samples) * 1000, 2)
+            row["errors"] = sum(1 for s in samples if s["error"])
+            row["pages"] = ", ".join(sorted({s["page"] for s in samples if s["page"]}))
+        out.append(row)
+    out.sort(key=lambda r: r["total_ms"], reverse=True)
+    return out
+
+
+def query_summary(samples=None):
+    """按 SQL 指纹汇总，按总耗时倒序；samples 不给时取本进程缓冲区里的记录（见 raw_samples）。"""
+    if samples is None:
+        with _lock:
+            samples = list(_queries)
+    groups = {}
+    for s in samples:
+        groups.setdefault(fingerprint(s["sql"]), []).append(s)
+    return _summarize(groups)
+
+
+def page_summary(samples=None):
+    if samples is None:
+        with _lock:
+            samples = list(_pages)
+    groups = {}
+    for s in samples:
+        groups.setdefault(s["page"], []).append(s)
+    return _summarize(groups)
+
+
+def slow_queries(limit=50):
+    """环形缓冲区里最慢的若干条原始记录。"""
+    with _lock:
+        samples = list(_queries)
+    samples.sort(key=lambda s: s["elapsed"], reverse=True)
+    return [
+        {**s, "elapsed_ms": round(s["elapsed"] * 1000, 2), "acquire_ms": round(s["acquire"] * 1000, 2)}
+        for s in samples[:limit]
+    ]
+
+
+def raw_samples():
+    """缓冲区里的原始记录 {"queries": [...], "pages": [...]}，可序列化；
+    多进程压测时各进程交回主进程，拼起来再传给 query_summary / page_summary。"""
+    with _lock:
+        return {"queries": list(_queries), "pages": list(_pages)}
+
+
+def reset():
+    with _lock:
+        _queries.clear()
+        _pages.clear()
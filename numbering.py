@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""销售单号 / 发票号 / 送货单号分配。
+
+号码格式：前缀 + 日期 + 6 位流水，例如 SO20261018000123，每天从 1 开始。
+流水号存在 number_sequence 表，每个进程一次预留 NUMBER_BLOCK_SIZE 个号放在内存里，
+大部分分配不访问数据库；进程退出时没用完的号直接作废（允许跳号）。
+同一进程内严格递增，多进程之间按号段交错，不会重复。
+
+号码里的日期和概览计数（counters.py）一样按数据库时钟：预留号段时在同一事务里取 CURDATE()，
+并记下数据库与本机的时差；两次预留之间用本机时钟加这个时差判断是否已跨天，跨天就重新预留。
+每个前缀一把锁，预留号段访问数据库时不挡其他前缀的分配。
+"""
+import threading
+from datetime import date, datetime
+
+import db
+from config import Config
+
+PREFIXES = {
+    "sale_order": "SO",
+    "invoice": "INV",
+    "delivery_note": "DN",
+}
+
+
+class _Block:
+    __slots__ = ("day", "next", "end")
+
+    def __init__(self, day, start, end):
+        self.day = day
+        self.next = start
+        self.end = end  # 不含
+
+
+_blocks = {}
+_locks = {prefix: threading.Lock() for prefix in PREFIXES.values()}
+# 数据库时钟 - 本机时钟，每次按数据库日期预留号段时更新；None 表示还没量过
+_db_offset = None
+
+
+def _as_date(v):
+    return date.fromisoformat(v) if isinstance(v, str) else v
+
+
+def _as_datetime(v):
+    return datetime.fromisoformat(v) if isinstance(v, str) else v
+
+
+def _db_today():
+    """按上次量到的时差推算的数据库当天日期；还没量过返回 None。"""
+    if _db_offset is None:
+        return None
+    return (datetime.now() + _db_offset).date()
+
+
+def _reserve(prefix, day, size):
+    """在独立的短事务里预留 [start, start + size) 号段，返回 (day, start)；不占用调用方的业务事务。
+
+    day 为 None 时取数据库的 CURDATE()，并顺带更新时差。
+    """
+    global _db_offset
+    with db.transaction() as tx:
+        if day is None:
+            row = tx.execute_one("SELECT CURDATE() AS day, NOW() AS now")
+            day = _as_date(row["day"])
+            _db_offset = _as_datetime(row["now"]) - datetime.now()
+        tx.execute_update(
+            "INSERT IGNORE INTO number_sequence (name, seq_date, next_value) VALUES (%s, %s, 1)",
+            (prefix, day),
+        )
+        tx.execute_update(
+            "UPDATE number_sequence SET next_value = LAST_INSERT_ID(next_value) + %s "
+            "WHERE name = %s AND seq_date = %s",
+            (size, prefix, day),
+        )
+        start = tx.execute_one("SELECT LAST_INSERT_ID() AS v")["v"]
+    return day, int(start)
+
+
+def next_number(kind, today=None):
+    """分配一个单号，kind 为 sale_order / invoice / delivery_note；today 不给时按数据库的当天日期。"""
+    prefix = PREFIXES[kind]
+    with _locks[prefix]:
+        day = today or _db_today()
+        block = _blocks.get(prefix)
+        if block is None or day is None or block.day != day or block.next >= block.end:
+            size = max(1, Config.NUMBER_BLOCK_SIZE)
+            # 跨天或号段用完：数据库日期以预留时那次查询为准
+            day, start = _reserve(prefix, today, size)
+            block = _blocks[prefix] = _Block(day, start, start + size)
+        seq = block.next
+        block.next += 1
+    return f"{prefix}{day:%Y%m%d}{seq:06d}"
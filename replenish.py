@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""补货提醒：按日销量算每个型号的补货点和可售天数。
+
+日销量取 sales_daily_rollup（出库时增量累加，见 analytics.py），不扫销售明细：
+- 最近 REPLENISH_WINDOW_DAYS 天里今天以前的部分按天缓存在进程内（每个产品一行：销量和、日销量平方和），
+  只有重建汇总时才失效；今天的销量每次现查，出库后马上反映；
+- 补货点 = 日均销量 × 到货周期 + 安全库存，安全库存 = REPLENISH_SAFETY_Z × 日销量标准差 × √到货周期；
+- 可售天数 = 库存 / 日均销量；库存不高于补货点的记为“需补货”，没有库存的记为“缺货”。
+整份目录用 pandas/NumPy 整列算一遍，库存取全进程共用、增量刷新的产品列表（streamlit_app.load_products）。
+首页、出库页的提醒横幅只要两个数，用 cached_counts 全进程缓存，出库、入库、导入后才重算。
+"""
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import cache
+import db
+from config import Config
+
+STATUSES = {"out": "缺货", "low": "需补货", "ok": "正常"}
+
+# 先按天合计（汇总表还分客户），再按产品求和、平方和
+_DEMAND_SQL = (
+    "SELECT product_id, SUM(q) AS total, SUM(q * q) AS sq FROM ("
+    "  SELECT product_id, stat_date, SUM(quantity) AS q FROM sales_daily_rollup "
+    "  WHERE stat_date >= %s AND stat_date < %s GROUP BY product_id, stat_date"
+    ") d GROUP BY product_id"
+)
+_TODAY_SQL = (
+    "SELECT product_id, SUM(quantity) AS q FROM sales_daily_rollup WHERE stat_date = %s GROUP BY product_id"
+)
+
+
+def _history(day, window):
+    """[day - window + 1, day) 内每个产品的销量和、日销量平方和（index 为 product_id）。"""
+    def load():
+        df = db.fetch_frame(
+            _DEMAND_SQL, (day - timedelta(days=window - 1), day),
+            dtypes={"product_id": "int64", "total": "float64", "sq": "float64"},
+        )
+        return df.set_index("product_id")
+    # 过去的日汇总只有 analytics.rebuild 会改，它会 bump("replenish_history")
+    return cache.get_or_load("replenish_history", ("history", day, window), load, ttl=86400)
+
+
+def _today(day):
+    df = db.fetch_frame(_TODAY_SQL, (day,), dtypes={"product_id": "int64", "q": "float64"})
+    return df.set_index("product_id")["q"]
+
+
+def plan(products, day=None, window=None):
+    """products 为含 id、quantity、lead_time_days 列的 DataFrame，返回按原顺序对齐的 DataFrame：
+
+    velocity（日均销量）、lead_time、safety_stock、reorder_point、days_of_cover（没有销量为 inf）、
+    suggested（建议补货量）、status（out / low / ok）。
+    """
+    day = day or date.today()
+    window = window or Config.REPLENISH_WINDOW_DAYS
+    ids = products["id"].to_numpy(dtype="int64")
+    history = _history(day, window).reindex(ids)
+    today = _today(day).reindex(ids).fillna(0.0).to_numpy()
+
+    total = history["total"].fillna(0.0).to_numpy() + today
+    sq = history["sq"].fillna(0.0).to_numpy() + today * today
+    velocity = total / window
+    sigma = np.sqrt(np.clip(sq / window - velocity * velocity, 0.0, None))
+    lead = pd.to_numeric(products["lead_time_days"]).fillna(Config.REPLENISH_LEAD_DAYS).to_numpy(dtype="float64")
+    quantity = pd.to_numeric(products["quantity"]).fillna(0).to_numpy(dtype="float64")
+
+    safety = Config.REPLENISH_SAFETY_Z * sigma * np.sqrt(lead)
+    reorder = velocity * lead + safety
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cover = np.where(velocity > 0, quantity / velocity, np.inf)
+    target = reorder + velocity * Config.REPLENISH_ORDER_DAYS
+    selling = velocity > 0
+    status = np.select(
+        [selling & (quantity <= 0), selling & (quantity <= reorder)], ["out", "low"], default="ok"
+    )
+
+    return pd.DataFrame({
+        "velocity": velocity.round(2),
+        "lead_time": lead.astype("int64"),
+        "safety_stock": np.ceil(safety).astype("int64"),
+        "reorder_point": np.ceil(reorder).astype("int64"),
+        "days_of_cover": cover.round(1),
+        "suggested": np.where(status != "ok", np.ceil(np.clip(target - quantity, 0, None)), 0).astype("int64"),
+        "status": status,
+    }, index=products.index)
+
+
+def low_stock(products, day=None):
+    """缺货、需补货的型号（products 的列 + plan 的列），按可售天数从少到多排序。"""
+    result = products.join(plan(products, day))
+    result = result[result["status"] != "ok"]
+    return result.sort_values(["days_of_cover", "velocity"], ascending=[True, False], ignore_index=True)
+
+
+def counts(products, day=None):
+    """{"out": 缺货型号数, "low": 需补货型号数}，给提醒横幅用。"""
+    status = plan(products, day)["status"]
+    return {"out": int((status == "out").sum()), "low": int((status == "low").sum())}
+
+
+def cached_counts(load_products, day=None):
+    """counts 的进程内缓存，出库、入库、导入后 bump("replenish") 失效。
+
+    load_products 为返回产品 DataFrame 的无参函数，只在缓存未命中时调用。
+    """
+    day = day or date.today()
+    return cache.get_or_load("replenish", ("counts", day), lambda: counts(load_products(), day))
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""产品搜索：走 product 上的 ngram 全文索引（见 sql/migrations/0003）。
+
+索引不带停用词，MySQL 服务器须设 innodb_ft_enable_stopword = OFF，否则重建表时停用词又会进索引。
+排序：型号完全相同 > 型号前缀匹配 > 全文相关度 > 型号；只对相关度最高的 SEARCH_CANDIDATES 个命中
+和型号前缀匹配的行排序，不对全部命中做 filesort。
+关键词短于 ngram 长度时全文索引查不到，改用型号前缀 LIKE（走 uk_model 索引）。
+SQLite 后端没有全文索引，按型号/品类子串 LIKE 搜，排序规则不变（无相关度一项）。
+
+客户查找（出库、维修记录选客户）：输入像电话号码时按 phone_digits 查（开头匹配走范围扫描，
+号码中间几位只扫 phone_digits 索引），否则按姓名开头查（走 idx_customer_name）。
+"""
+import re
+
+import crm
+import db
+from config import Config
+
+_COLUMNS = "id, category, model, price, cost_price, quantity"
+_CUSTOMER_COLUMNS = "id, name, phone"
+_RE_PHONE = re.compile(r"[0-9+\-().\s]+")
+# 号码少于这么多位时只按开头查，不做中间匹配
+_PHONE_CONTAINS_MIN = 3
+
+
+def _like_escape(s):
+    return s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _like():
+    # SQLite 的 LIKE 没有默认转义符
+    return "LIKE %s ESCAPE '\\'" if db.is_sqlite() else "LIKE %s"
+
+
+def _query(q, category, limit):
+    """按关键字拼出搜索语句，返回 (sql, args)。"""
+    q = (q or "").strip()
+    limit = int(limit or Config.SEARCH_LIMIT)
+    where = []
+    args = []
+    if category:
+        where.append("category = %s")
+        args.append(category)
+
+    if not q:
+        sql = f"SELECT {_COLUMNS} FROM product"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return sql + " ORDER BY category, model LIMIT %s", args + [limit]
+
+    prefix = _like_escape(q) + "%"
+    if len(q) < Config.SEARCH_NGRAM_SIZE:
+        where.append(f"model {_like()}")
+        args.append(prefix)
+        return (
+            f"SELECT {_COLUMNS} FROM product WHERE " + " AND ".join(where)
+            + " ORDER BY model LIMIT %s",
+            args + [limit],
+        )
+
+    if db.is_sqlite():
+        where.insert(0, f"(model {_like()} OR category {_like()})")
+        contains = "%" + _like_escape(q) + "%"
+        args[:0] = [contains, contains]
+        return (
+            f"SELECT {_COLUMNS} FROM product WHERE " + " AND ".join(where)
+            + f" ORDER BY model = %s DESC, model {_like()} DESC, model LIMIT %s",
+            args + [q, prefix, limit],
+        )
+
+    # 双引号包起来按短语搜，ngram 下相当于子串匹配；去掉关键字里的布尔运算符
+    phrase = '"' + "".join(ch for ch in q if ch not in '"+-<>()~*@') + '"'
+    match = "MATCH(model, category) AGAINST (%s IN BOOLEAN MODE)"
+    extra = "".join(f" AND {w}" for w in where)
+    # 先按相关度取前 SEARCH_CANDIDATES 个命中，再并上型号前缀匹配的（走 uk_model，
+    # 完全相同、前缀匹配的型号不会因相关度低被截掉），最后只在这一小批候选里排序
+    return (
+        f"SELECT {_COLUMNS}, score FROM ("
+        f"(SELECT {_COLUMNS}, {match} AS score FROM product WHERE {match}{extra} "
+        "ORDER BY score DESC LIMIT %s)"
+        f" UNION (SELECT {_COLUMNS}, {match} AS score FROM product WHERE model LIKE %s{extra} "
+        "ORDER BY model LIMIT %s)"
+        ") c ORDER BY model = %s DESC, model LIKE %s DESC, score DESC, model LIMIT %s",
+        [phrase, phrase] + args + [Config.SEARCH_CANDIDATES]
+        + [phrase, prefix] + args + [limit]
+        + [q, prefix, limit],
+    )
+
+
+def search_products(q, category=None, limit=None):
+    """按型号/品类关键字搜索产品，category 不为空时只在该品类内搜，最多返回 limit 条。"""
+    return db.execute_all(*_query(q, category, limit))
+
+
+def search_frame(q, category=None, limit=None, columns=None):
+    """同 search_products，结果直接构造成 DataFrame（columns 为 {列: 显示名}）。"""
+    sql, args = _query(q, category, limit)
+    return db.fetch_frame(sql, args, columns=columns)
+
+
+def _customer_query(q, limit):
+    """按关键字拼出客户查找语句，返回 (sql, args)。"""
+    q = (q or "").strip()
+    limit = int(limit or Config.CUSTOMER_SEARCH_LIMIT)
+    if not q:
+        return f"SELECT {_CUSTOMER_COLUMNS} FROM customer ORDER BY id DESC LIMIT %s", [limit]
+
+    digits = crm.normalize_phone(q)
+    if digits and _RE_PHONE.fullmatch(q):
+        prefix = digits + "%"
+        if len(digits) < _PHONE_CONTAINS_MIN:
+            return (
+                f"SELECT {_CUSTOMER_COLUMNS} FROM customer WHERE phone_digits LIKE %s "
+                "ORDER BY phone_digits LIMIT %s",
+                [prefix, limit],
+            )
+        # 先只在 phone_digits 索引上挑出前 limit 个 id（开头匹配的排前面），再回表取姓名
+        return (
+            "SELECT c.id, c.name, c.phone FROM ("
+            "SELECT id, phone_digits FROM customer WHERE phone_digits LIKE %s "
+            "ORDER BY phone_digits LIKE %s DESC, id DESC LIMIT %s"
+            ") m JOIN customer c ON c.id = m.id "
+            "ORDER BY m.phone_digits LIKE %s DESC, c.id DESC",
+            ["%" + digits + "%", prefix, limit, prefix],
+        )
+
+    return (
+        f"SELECT {_CUSTOMER_COLUMNS} FROM customer WHERE name {_like()} ORDER BY name, id LIMIT %s",
+        [_like_escape(q) + "%", limit],
+    )
+
+
+def search_customers(q, limit=None):
+    """按姓名开头或电话号码（任意连续几位）查找客户，q 为空时返回最近添加的客户，最多 limit 条。"""
+    return db.execute_all(*_customer_query(q, limit))
@@ -0,0 +1,3 @@
+-- 旧版本建的 product 表没有品类字段（原先在 init_db.py 里 try/except 补列）
+ALTER TABLE product
+  ADD COLUMN category VARCHAR(64) DEFAULT NULL COMMENT '品类/大类（如 洗衣机、烘干机）' AFTER id;
@@ -0,0 +1,26 @@
+-- 各页面列表/下拉框实际用到的排序与过滤，均为在线加索引（不锁表读写）
+
+-- 产品列表、入库下拉：ORDER BY category, model
+ALTER TABLE product
+  ADD INDEX idx_product_category_model (category, model),
+  ALGORITHM=INPLACE, LOCK=NONE;
+
+-- 出库下拉：WHERE quantity > 0 ORDER BY category, model
+ALTER TABLE product
+  ADD INDEX idx_product_qty_category_model (quantity, category, model),
+  ALGORITHM=INPLACE, LOCK=NONE;
+
+-- 按客户查销售单
+ALTER TABLE sale_order
+  ADD INDEX idx_sale_order_customer_created (customer_id, created_at),
+  ALGORITHM=INPLACE, LOCK=NONE;
+
+-- 按客户查维修记录
+ALTER TABLE maintenance
+  ADD INDEX idx_maintenance_customer_id (customer_id, id),
+  ALGORITHM=INPLACE, LOCK=NONE;
+
+-- 客户下拉：ORDER BY name
+ALTER TABLE customer
+  ADD INDEX idx_customer_name (name),
+  ALGORITHM=INPLACE, LOCK=NONE;
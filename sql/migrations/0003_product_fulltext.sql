@@ -0,0 +1,11 @@
+-- 库存查询按型号/品类搜索：ngram 全文索引（默认 2 字一切分，中英文型号都能做子串匹配）
+-- 注意：FULLTEXT 索引不支持 LOCK=NONE，首次添加时会重建 product 表，大表请在低峰期执行
+--
+-- 索引不用停用词：ngram 分词下，含停用词（a、i、to、on 等）的 2 字切分整段不进索引，
+-- 很多型号因此搜不全甚至搜不到。停用词在建索引时确定，所以建索引的会话里先关掉。
+-- 服务器端还须在 my.cnf 里设 innodb_ft_enable_stopword = OFF：之后 OPTIMIZE TABLE、
+-- ALTER TABLE ... FORCE 等重建表时按全局设置重建全文索引，全局仍为 ON 会把停用词带回来
+SET SESSION innodb_ft_enable_stopword = 0;
+
+ALTER TABLE product
+  ADD FULLTEXT INDEX ft_product_model_category (model, category) WITH PARSER ngram;
@@ -0,0 +1,7 @@
+-- 单号发号表（numbering.py）：每种单据每天一行，next_value 为下一个未分配的流水号
+CREATE TABLE IF NOT EXISTS number_sequence (
+  name VARCHAR(16) NOT NULL COMMENT '单据前缀：SO/INV/DN',
+  seq_date DATE NOT NULL,
+  next_value BIGINT NOT NULL DEFAULT 1,
+  PRIMARY KEY (name, seq_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
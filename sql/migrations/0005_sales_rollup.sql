@@ -0,0 +1,13 @@
+-- 销售分析日汇总（analytics.py）：每天 × 产品 × 客户一行，出库时在同一事务里累加；
+-- 成本按出库当时的产品进价计。数据不一致时运行 python analytics.py 重建
+CREATE TABLE IF NOT EXISTS sales_daily_rollup (
+  stat_date DATE NOT NULL,
+  product_id INT NOT NULL,
+  customer_id INT NOT NULL,
+  order_count INT NOT NULL DEFAULT 0 COMMENT '含该产品的销售单数',
+  quantity INT NOT NULL DEFAULT 0,
+  revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+  cost DECIMAL(14,2) NOT NULL DEFAULT 0,
+  PRIMARY KEY (stat_date, product_id, customer_id),
+  KEY idx_rollup_customer (customer_id, stat_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
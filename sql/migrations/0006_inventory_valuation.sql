@@ -0,0 +1,11 @@
+-- 库存估价（valuation.py）：移动加权平均成本，入库/出库时在同一事务里增量维护。
+-- product.stock_value 为当前库存总成本，平均成本 = stock_value / quantity；
+-- 出库明细记下按当时平均成本算出的销售成本（COGS）
+ALTER TABLE product
+  ADD COLUMN stock_value DECIMAL(16,4) NOT NULL DEFAULT 0 COMMENT '库存总成本（移动加权平均）' AFTER quantity;
+
+ALTER TABLE sale_order_item
+  ADD COLUMN cost_amount DECIMAL(16,4) DEFAULT NULL COMMENT '销售成本（出库时平均成本 × 数量）';
+
+-- 已有库存先按当前进价估值；之后运行 python valuation.py --fix 按入库/出库历史重放校正
+UPDATE product SET stock_value = quantity * cost_price WHERE quantity > 0;
@@ -0,0 +1,9 @@
+-- 产品、客户全量列表按 updated_at 水位增量刷新（streamlit_app.delta_query），均为在线加索引
+
+ALTER TABLE product
+  ADD INDEX idx_product_updated_at (updated_at),
+  ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE customer
+  ADD INDEX idx_customer_updated_at (updated_at),
+  ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,14 @@
+-- 客户查找（search.search_customers）：按姓名开头或电话号码里的数字查。
+-- phone_digits 为电话去掉分隔符后的纯数字，由写入方维护（crm.normalize_phone）
+ALTER TABLE customer
+  ADD COLUMN phone_digits VARCHAR(32) DEFAULT NULL COMMENT '电话（仅数字，用于查找）' AFTER phone;
+
+-- 已有客户回填：与 crm.normalize_phone 一样去掉所有非数字字符（+、/、全角字符等），需 MySQL 8.0
+UPDATE customer
+SET phone_digits = NULLIF(REGEXP_REPLACE(phone, '[^0-9]', ''), '')
+WHERE phone IS NOT NULL;
+
+-- 号码开头走范围扫描；号码中间几位只扫这个索引（覆盖 id），不回表
+ALTER TABLE customer
+  ADD INDEX idx_customer_phone_digits (phone_digits),
+  ALGORITHM=INPLACE, LOCK=NONE;
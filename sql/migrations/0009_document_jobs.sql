@@ -0,0 +1,32 @@
+-- 后台任务队列（jobs.py / worker.py）：发票、送货单等慢任务由独立的 worker 进程执行，
+-- 出库事务里只插一行任务
+CREATE TABLE IF NOT EXISTS job (
+  id BIGINT AUTO_INCREMENT PRIMARY KEY,
+  kind VARCHAR(32) NOT NULL COMMENT '任务类型：invoice / delivery_note',
+  ref_id INT NOT NULL COMMENT '关联记录 id（销售单）',
+  status VARCHAR(16) NOT NULL DEFAULT 'pending' COMMENT 'pending / running / done / failed',
+  attempts INT NOT NULL DEFAULT 0,
+  run_after DATETIME NOT NULL COMMENT '最早执行时间，失败重试时往后推',
+  locked_by VARCHAR(64) DEFAULT NULL,
+  locked_until DATETIME DEFAULT NULL COMMENT '租约到期时间，过期仍未完成的任务重新排队',
+  last_error VARCHAR(255) DEFAULT NULL,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  UNIQUE KEY uk_job_kind_ref (kind, ref_id),
+  KEY idx_job_status_run_after (status, run_after)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 每张销售单最多一张发票、一张送货单；file_path 为生成的单据文件（相对 DOCUMENT_DIR）
+ALTER TABLE invoice
+  ADD COLUMN file_path VARCHAR(255) DEFAULT NULL COMMENT '单据文件（相对 DOCUMENT_DIR）';
+
+ALTER TABLE invoice
+  ADD UNIQUE INDEX uk_invoice_order (order_id),
+  ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE delivery_note
+  ADD COLUMN file_path VARCHAR(255) DEFAULT NULL COMMENT '单据文件（相对 DOCUMENT_DIR）';
+
+ALTER TABLE delivery_note
+  ADD UNIQUE INDEX uk_delivery_note_order (order_id),
+  ALGORITHM=INPLACE, LOCK=NONE;
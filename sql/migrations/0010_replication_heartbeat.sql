@@ -0,0 +1,5 @@
+-- 读写分离（db.py）：主库定时写入心跳时间，各只读副本上读到的心跳与之比较得出复制延迟
+CREATE TABLE IF NOT EXISTS replication_heartbeat (
+  id INT NOT NULL PRIMARY KEY,
+  beat_at DATETIME(6) NOT NULL COMMENT '主库写入时的 NOW(6)'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
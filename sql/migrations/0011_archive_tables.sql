@@ -0,0 +1,55 @@
+-- 冷数据归档（archive.py）：早于保留期的整月销售单（连同明细、发票、送货单）和维修记录
+-- 分批搬到 *_archive 表，热表只留近期数据。归档表与热表列相同、id 保持不变，不设外键。
+CREATE TABLE IF NOT EXISTS sale_order_archive (
+  id INT NOT NULL PRIMARY KEY,
+  order_no VARCHAR(32) NOT NULL,
+  customer_id INT NOT NULL,
+  total_amount DECIMAL(12,2) NOT NULL DEFAULT 0,
+  status VARCHAR(20) DEFAULT 'completed',
+  note VARCHAR(255) DEFAULT NULL,
+  created_at DATETIME DEFAULT NULL,
+  UNIQUE KEY uk_sale_order_archive_no (order_no),
+  KEY idx_sale_order_archive_created (created_at),
+  KEY idx_sale_order_archive_customer (customer_id, created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS sale_order_item_archive (
+  id INT NOT NULL PRIMARY KEY,
+  order_id INT NOT NULL,
+  product_id INT NOT NULL,
+  quantity INT NOT NULL,
+  unit_price DECIMAL(12,2) NOT NULL,
+  cost_amount DECIMAL(16,4) DEFAULT NULL,
+  KEY idx_sale_order_item_archive_order (order_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS invoice_archive (
+  id INT NOT NULL PRIMARY KEY,
+  invoice_no VARCHAR(32) NOT NULL,
+  order_id INT NOT NULL,
+  amount DECIMAL(12,2) NOT NULL,
+  created_at DATETIME DEFAULT NULL,
+  file_path VARCHAR(255) DEFAULT NULL,
+  UNIQUE KEY uk_invoice_archive_order (order_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS delivery_note_archive (
+  id INT NOT NULL PRIMARY KEY,
+  note_no VARCHAR(32) NOT NULL,
+  order_id INT NOT NULL,
+  created_at DATETIME DEFAULT NULL,
+  file_path VARCHAR(255) DEFAULT NULL,
+  UNIQUE KEY uk_delivery_note_archive_order (order_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS maintenance_archive (
+  id INT NOT NULL PRIMARY KEY,
+  customer_id INT NOT NULL,
+  product_id INT NULL,
+  content TEXT DEFAULT NULL,
+  result VARCHAR(255) DEFAULT NULL,
+  maintained_at DATETIME DEFAULT NULL,
+  created_at DATETIME DEFAULT NULL,
+  KEY idx_maintenance_archive_created (created_at),
+  KEY idx_maintenance_archive_customer (customer_id, id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
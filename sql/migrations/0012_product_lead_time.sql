@@ -0,0 +1,3 @@
+-- 补货提醒（replenish.py）：每个型号的到货周期，为空时按 REPLENISH_LEAD_DAYS 计
+ALTER TABLE product
+  ADD COLUMN lead_time_days SMALLINT DEFAULT NULL COMMENT '到货周期（天），为空按默认值' AFTER quantity;
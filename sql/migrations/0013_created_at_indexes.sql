@@ -0,0 +1,13 @@
+-- 热表按日期取数：归档（archive.py 按 created_at 挑批次）、导出、重建统计、单据打包等历史查询
+-- 热表这一段都是 WHERE created_at 范围条件，没有索引时走主键全表扫描
+ALTER TABLE sale_order
+  ADD INDEX idx_sale_order_created (created_at),
+  ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE maintenance
+  ADD INDEX idx_maintenance_created (created_at),
+  ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE stock_in
+  ADD INDEX idx_stock_in_created (created_at),
+  ALGORITHM=INPLACE, LOCK=NONE;
@@ -101,3 +101,17 @@ CREATE TABLE IF NOT EXISTS maintenance (
   FOREIGN KEY (customer_id) REFERENCES customer(id),
   FOREIGN KEY (product_id) REFERENCES product(id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 10. 汇总计数（概览页用；写入路径在同一事务里增量维护，python counters.py 可全量重建）
+CREATE TABLE IF NOT EXISTS stats_counter (
+  name VARCHAR(64) NOT NULL PRIMARY KEY COMMENT 'product_count/customer_count/order_count',
+  value DECIMAL(16,2) NOT NULL DEFAULT 0,
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 11. 每日销售汇总（当日单数、营业额）
+CREATE TABLE IF NOT EXISTS stats_daily (
+  stat_date DATE NOT NULL PRIMARY KEY,
+  order_count INT NOT NULL DEFAULT 0,
+  revenue DECIMAL(14,2) NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""入库 / 出库写入：每笔业务在一个事务里完成，出库先锁住产品行校验库存再扣减，防止超卖。"""
+import analytics
+import cache
+import counters
+import db
+import jobs
+import numbering
+import valuation
+
+
+class InsufficientStock(Exception):
+    """库存不足（或产品不存在），整笔出库已回滚。product_ids 为不足的产品。"""
+
+    def __init__(self, message="库存不足", product_ids=()):
+        super().__init__(message)
+        self.product_ids = list(product_ids)
+
+
+def add_product(category, model, price, cost_price, lead_time_days=None):
+    """新增产品（初始库存 0）并累加型号数，返回 product.id；型号重复时抛出数据库唯一键错误。
+
+    lead_time_days 为到货周期（天），为空时补货提醒按 REPLENISH_LEAD_DAYS 计。
+    """
+    with db.transaction() as tx:
+        product_id = tx.execute_insert(
+            "INSERT INTO product (category, model, price, cost_price, quantity, lead_time_days) "
+            "VALUES (%s, %s, %s, %s, 0, %s)",
+            (category or None, model, price, cost_price, lead_time_days or None),
+        )
+        counters.incr(tx, "product_count")
+    cache.bump("product")
+    return product_id
+
+
+def stock_in(product_id, quantity, cost_price, note=None):
+    """入库：写入库记录，增加库存数量和库存总成本（移动加权平均），返回 stock_in.id。"""
+    with db.transaction() as tx:
+        stock_in_id = tx.execute_insert(
+            "INSERT INTO stock_in (product_id, quantity, cost_price, note) VALUES (%s, %s, %s, %s)",
+            (product_id, quantity, cost_price, note or None),
+        )
+        tx.execute_update(
+            "UPDATE product SET quantity = quantity + %s, stock_value = stock_value + %s WHERE id = %s",
+            (quantity, valuation.receipt_value(quantity, cost_price), product_id),
+        )
+    cache.bump("product", "replenish")
+    return stock_in_id
+
+
+def create_sale(customer_id, items):
+    """出库：一张销售单可含多行，items 为 [(product_id, quantity, unit_price), ...]。
+
+    整单一个事务：按 id 顺序 FOR UPDATE 锁住涉及的产品行并一次校验库存，
+    明细用 executemany 写入（带按移动加权平均算出的销售成本），库存数量和库存总成本
+    用一条 UPDATE ... JOIN（db.update_join）批量扣减，同一事务里累加概览计数和销售分析日汇总，
+    并排队生成发票、送货单（由 worker.py 在后台生成，见 documents.py）。
+    任一产品库存不足则整单回滚，返回 (order_id, order_no)。
+    """
+    items = [(int(pid), int(qty), float(price)) for pid, qty, price in items]
+    if not items:
+        raise ValueError("销售单没有明细")
+    need = {}
+    for pid, qty, _ in items:
+        need[pid] = need.get(pid, 0) + qty
+    total = round(sum(qty * price for _, qty, price in items), 2)
+    product_ids = sorted(need)
+    # 单号在业务事务外分配，出库失败时这个号作废即可
+    order_no = numbering.next_number("sale_order")
+
+    with db.transaction() as tx:
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        rows = tx.execute_all(
+            f"SELECT id, quantity, stock_value FROM product WHERE id IN ({placeholders}) "
+            "ORDER BY id FOR UPDATE",
+            product_ids,
+        )
+        stock = {r["id"]: r["quantity"] for r in rows}
+        short = [pid for pid in product_ids if stock.get(pid, 0) < need[pid]]
+        if short:
+            raise InsufficientStock(product_ids=short)
+        # 每个产品的销售成本，再按数量分摊到该产品的各明细行
+        cost = {r["id"]: valuation.issue_cost(r["quantity"], r["stock_value"], need[r["id"]]) for r in rows}
+        line_cost = {
+            pid: valuation.split_cost(cost[pid], [qty for p, qty, _ in items if p == pid])
+            for pid in product_ids
+        }
+
+        order_id = tx.execute_insert(
+            "INSERT INTO sale_order (order_no, customer_id, total_amount) "
+            "VALUES (%s, %s, %s)",
+            (order_no, customer_id, total),
+        )
+        tx.execute_many(
+            "INSERT INTO sale_order_item ("
+            "order_id, product_id, quantity, unit_price, cost_amount"
+            ") VALUES (%s, %s, %s, %s, %s)",
+            [(order_id, pid, qty, price, line_cost[pid].pop(0)) for pid, qty, price in items],
+        )
+        table, args = db.values_table(
+            [(pid, need[pid], cost[pid]) for pid in product_ids], ["id", "qty", "cost"]
+        )
+        tx.execute_update(
+            db.update_join("product", "p", table, "p.id = d.id", [
+                ("quantity", "p.quantity - d.qty"),
+                ("stock_value", "p.stock_value - d.cost"),
+            ]),
+            args,
+        )
+        day = counters.sale_day(tx, order_id)
+        counters.record_sale(tx, total, day)
+        revenue = {}
+        for pid, qty, price in items:
+            revenue[pid] = revenue.get(pid, 0.0) + qty * price
+        analytics.record_sale(tx, customer_id, [
+            (pid, need[pid], round(revenue[pid], 2), round(float(cost[pid]), 2))
+            for pid in product_ids
+        ], day)
+        jobs.enqueue(tx, [("invoice", order_id), ("delivery_note", order_id)])
+    cache.bump("product", "analytics", "replenish")
+    return order_id, order_no
@@ -1,10 +1,157 @@
+import datetime
+import os
 import time
 
 import pandas as pd
 import streamlit as st
 
+import analytics
+import cache
+import counters
+import crm
 import db
+import documents
+import exporter
+import importer
+import init_db
+import jobs
+import metrics
+import replenish
+import search
+import stock
 from auth import AdminUser
+from config import Config
+
+# 各页面的查询（bench/ 基准测试直接复用，改页面查询时这里一起改）
+PRODUCT_LIST_SQL = (
+    "SELECT id, category, model, price, cost_price, quantity, stock_value, "
+    "       ROUND(stock_value / NULLIF(quantity, 0), 2) AS avg_cost, "
+    "       lead_time_days, updated_at "
+    "FROM product"
+)
+STOCK_IN_LIST_SQL = (
+    "SELECT s.id, s.created_at, p.category, p.model, s.quantity, s.cost_price, s.note "
+    "FROM stock_in s JOIN product p ON s.product_id = p.id"
+)
+CUSTOMER_PAGE_SQL = "SELECT id, name, phone, address, note, created_at FROM customer"
+SALE_ORDER_LIST_SQL = (
+    "SELECT "
+    "  o.id, o.order_no, o.total_amount, o.created_at, "
+    "  c.name AS customer_name, c.phone, "
+    "  GROUP_CONCAT("
+    "    CONCAT("
+    "      CASE WHEN p.category IS NULL OR p.category = '' "
+    "           THEN '' ELSE CONCAT(p.category, ' - ') END,"
+    "      p.model, ' x', i.quantity"
+    "    ) SEPARATOR '；'"
+    "  ) AS items_summary "
+    "FROM sale_order o "
+    "JOIN customer c ON o.customer_id = c.id "
+    "LEFT JOIN sale_order_item i ON i.order_id = o.id "
+    "LEFT JOIN product p ON p.id = i.product_id"
+)
+MAINTENANCE_LIST_SQL = (
+    "SELECT m.id, m.created_at, c.name AS customer_name, "
+    "       p.model AS product_model, m.content, m.result "
+    "FROM maintenance m "
+    "JOIN customer c ON m.customer_id = c.id "
+    "LEFT JOIN product p ON m.product_id = p.id"
+)
+DOCUMENT_LIST_SQL = (
+    "SELECT o.id, o.order_no, o.created_at, c.name AS customer_name, o.total_amount, "
+    "       v.invoice_no, d.note_no "
+    "FROM sale_order o "
+    "JOIN customer c ON o.customer_id = c.id "
+    "LEFT JOIN invoice v ON v.order_id = o.id "
+    "LEFT JOIN delivery_note d ON d.order_id = o.id"
+)
+
+# 各列表的显示列：{字段: 显示名}，按此顺序展示，不在其中的字段（如游标用的 id）不展示
+PRODUCT_COLUMNS = {
+    "id": "ID",
+    "category": "品类",
+    "model": "型号",
+    "price": "售价",
+    "cost_price": "进价",
+    "quantity": "库存数量",
+    "avg_cost": "平均成本",  # 移动加权平均（见 valuation.py）
+    "stock_value": "库存金额",
+    "lead_time_days": "到货周期（天）",
+}
+STOCK_IN_COLUMNS = {
+    "created_at": "时间",
+    "category": "品类",
+    "model": "型号",
+    "quantity": "数量",
+    "cost_price": "进价",
+    "note": "备注",
+}
+CUSTOMER_PAGE_COLUMNS = {
+    "id": "ID",
+    "name": "客户名",
+    "phone": "电话",
+    "address": "地址",
+    "note": "备注",
+    "created_at": "创建时间",
+}
+SALE_ORDER_COLUMNS = {
+    "order_no": "单号",
+    "total_amount": "金额",
+    "created_at": "时间",
+    "customer_name": "客户",
+    "phone": "电话",
+    "items_summary": "商品明细",
+}
+MAINTENANCE_COLUMNS = {
+    "created_at": "登记时间",
+    "customer_name": "客户",
+    "product_model": "产品型号",
+    "content": "维修内容",
+    "result": "处理结果",
+}
+# 产品全量列表（下拉框、产品列表页）全进程共用一份、增量刷新（见 delta_query），
+# 列类型固定下来，全量与增量结果才能直接比较、合并
+PRODUCT_LIST_DTYPES = {
+    "id": "Int64",
+    "category": "string",
+    "model": "string",
+    "price": "float64",
+    "cost_price": "float64",
+    "quantity": "Int64",
+    "stock_value": "float64",
+    "avg_cost": "float64",
+    "lead_time_days": "Int64",
+    "updated_at": "datetime64[ns]",
+}
+DOCUMENT_COLUMNS = {
+    "order_no": "销售单号",
+    "created_at": "时间",
+    "customer_name": "客户",
+    "total_amount": "金额",
+    "invoice_no": "发票号",
+    "note_no": "送货单号",
+}
+# 页面生成的临时下载文件：{session_state 键: 所在页面}，见 download_button
+TEMP_DOWNLOADS = {"export_file": "数据导出", "document_bundle": "单据"}
+LOW_STOCK_COLUMNS = {
+    "status": "状态",
+    "category": "品类",
+    "model": "型号",
+    "quantity": "库存数量",
+    "velocity": "日均销量",
+    "days_of_cover": "可售天数",
+    "reorder_point": "补货点",
+    "safety_stock": "安全库存",
+    "lead_time": "到货周期（天）",
+    "suggested": "建议补货量",
+}
+SEARCH_COLUMNS = {
+    "category": "品类",
+    "model": "型号",
+    "price": "售价",
+    "cost_price": "进价",
+    "quantity": "库存数量",
+}
 
 
 def require_login():
@@ -46,20 +193,210 @@ def sidebar_user():
             st.rerun()
 
 
+def delta_query(key, sql, dtypes, namespace, mark_col="updated_at"):
+    """增量刷新列表的查询，返回无参函数（可交给 db.fetch_many），结果交给 delta_merge。
+
+    列表和水位（结果中最大的 mark_col）存在 cache.frame_state(key) 里，进程内所有会话共用一份：
+    - 距上次查库不到 DELTA_POLL_SECONDS、且本进程没有 bump(namespace) 过时不查库，直接用现有的；
+    - 还没有列表或距上次全量超过 DELTA_RESYNC_SECONDS 时全量重取（删除的行也靠这一步去掉）；
+    - 否则只取 mark_col >= 水位 - DELTA_OVERLAP_SECONDS 的行；往回多取几秒是为了接住时间戳较早、
+      但在上次读取之后才提交的写入（包括别的进程的写入）。
+    sql 只写到 FROM 为止。
+    """
+    # 版本号在查库前读：查询期间的写入会再 bump 一次，下一轮照样去取
+    ver = cache.version(namespace)
+    now = time.monotonic()
+    with cache.frame_state(key) as state:
+        if state.get("df") is not None and state["version"] == ver and (
+            now - state["polled_at"] < Config.DELTA_POLL_SECONDS
+        ):
+            return lambda: ("cached", None, ver, now)
+        if state.get("mark") is None or now - state["synced_at"] > Config.DELTA_RESYNC_SECONDS:
+            return lambda: ("full", db.fetch_frame(sql, dtypes=dtypes), ver, now)
+        since = (state["mark"] - pd.Timedelta(seconds=Config.DELTA_OVERLAP_SECONDS)).to_pydatetime()
+    return lambda: (
+        "delta", db.fetch_frame(f"{sql} WHERE {mark_col} >= %s", (since,), dtypes=dtypes), ver, now
+    )
+
+
+def delta_merge(key, result, order_by, key_field="id", mark_col="updated_at"):
+    """把 delta_query 的结果并进共享列表并返回（按 order_by 排序的 DataFrame，各会话只读）。
+
+    各会话的结果可能乱序到达：比现有全量早发起的全量直接丢掉；增量里与已有行完全相同的
+    （重叠窗口里的旧行）、以及 mark_col 比已有行旧的都忽略，有变化时才替换、重排。
+    """
+    kind, df, ver, started = result
+    with cache.frame_state(key) as state:
+        if kind == "full" and started > state.get("synced_at", float("-inf")):
+            state["df"] = df.sort_values(order_by, ignore_index=True)
+            state["synced_at"] = started
+        elif kind == "delta" and state.get("df") is not None:
+            base = state["df"]
+            old = base[base[key_field].isin(df[key_field])]
+            changed = df.merge(old, on=list(df.columns), how="left", indicator=True)
+            changed = changed[changed["_merge"] == "left_only"].drop(columns="_merge")
+            if not changed.empty:
+                current = changed[[key_field]].merge(
+                    old[[key_field, mark_col]], on=key_field, how="left"
+                )[mark_col].to_numpy()
+                changed = changed[~(current > changed[mark_col].to_numpy())]
+            if not changed.empty:
+                rest = base[~base[key_field].isin(changed[key_field])]
+                state["df"] = pd.concat([rest, changed], ignore_index=True).sort_values(
+                    order_by, ignore_index=True
+                )
+        if kind != "cached" and state.get("df") is not None:
+            if started >= state.get("polled_at", float("-inf")):
+                state["version"], state["polled_at"] = ver, started
+            state["mark"] = state["df"][mark_col].max() if not state["df"].empty else None
+        return state["df"]
+
+
+def products_query():
+    return delta_query("product_list", PRODUCT_LIST_SQL, PRODUCT_LIST_DTYPES, "product")
+
+
+def load_products(result=None):
+    """全部产品（DataFrame，按品类、型号排序），全进程共用一份、增量刷新；不要原地修改。
+
+    result 为已经取好的 products_query() 结果，为空时在这里查询。
+    """
+    return delta_merge("product_list", result or products_query()(), ["category", "model"])
+
+
+def customer_query(key):
+    """客户查找框当前关键字的查询，返回无参函数（可交给 db.fetch_many），结果交给 customer_picker。"""
+    q = st.session_state.get(f"{key}_q", "")
+    return lambda: search.search_customers(q)
+
+
+def customer_picker(key, rows=None):
+    """客户查找框 + 候选下拉框，返回选中的 customer.id，没有候选时为 None。
+
+    下拉框按 id 取值，同名客户也能区分。rows 为已经取好的 customer_query(key) 结果，
+    为空时在这里查询。
+    """
+    q = st.text_input("查找客户", key=f"{key}_q", placeholder="姓名开头，或电话号码（任意连续几位）")
+    if rows is None:
+        rows = search.search_customers(q)
+    if not rows:
+        st.caption("没有匹配的客户" if q.strip() else "暂无客户，请先添加客户。")
+        return None
+    labels = {r["id"]: f"{r['name']} {r['phone'] or ''}（#{r['id']}）" for r in rows}
+    return st.selectbox("客户", list(labels), format_func=labels.get, key=f"{key}_id")
+
+
+def product_labels(products, with_stock=True):
+    """产品下拉框的选项文字：“品类 - 型号（库存 n）”，整列拼接。"""
+    category = products["category"].fillna("")
+    labels = category.where(category == "", category + " - ") + products["model"]
+    if with_stock:
+        labels = labels + "（库存 " + products["quantity"].astype(str) + "）"
+    return labels
+
+
+PAGE_SIZE_OPTIONS = [20, 50, 100, 200]
+
+
+def _page_state(key):
+    state = st.session_state.setdefault(key, {"cursors": [None], "size": Config.PAGE_SIZE})
+    # “每页条数”下拉框改动后的值在本轮渲染前就已在 session_state 里，先同步过来，
+    # 这样当前页的查询可以在画下拉框之前发出（见 page_query）
+    size = st.session_state.get(f"{key}_size", state["size"])
+    if size != state["size"]:
+        state["size"] = size
+        state["cursors"] = [None]
+    return state
+
+
+def page_query(key, sql, key_col, columns, key_field="id", where=None, args=None, group_by=None):
+    """paged_table 当前页的查询，返回无参函数，可交给 db.fetch_many 和页面其他读取并发执行。"""
+    state = _page_state(key)
+    before, size = state["cursors"][-1], state["size"]
+    return lambda: db.fetch_keyset_frame(
+        sql, key_col, before=before, limit=size, args=args, where=where, group_by=group_by,
+        key_field=key_field, columns=columns,
+    )
+
+
+def paged_table(key, sql, key_col, columns, key_field="id", where=None, args=None, group_by=None,
+                page=None):
+    """按主键倒序分页展示的表格（服务端 keyset 分页，只取当前页）。
+
+    st.session_state[key] 里存每一页的起点游标栈，上一页/下一页只是出栈/入栈。
+    columns 为 {字段名: 显示列名}，不在其中的字段（如游标用的 id）不展示。
+    page 为已经取好的当前页 (df, has_more, last_key)（page_query 的结果），为空时在这里查询。
+    """
+    state = _page_state(key)
+    options = sorted(set(PAGE_SIZE_OPTIONS + [Config.PAGE_SIZE]))
+    st.selectbox(
+        "每页条数", options, index=options.index(state["size"]) if state["size"] in options else 0,
+        key=f"{key}_size",
+    )
+
+    if page is None:
+        page = page_query(
+            key, sql, key_col, columns, key_field=key_field, where=where, args=args, group_by=group_by
+        )()
+    df, has_more, last_key = page
+    if not df.empty:
+        st.dataframe(df, width="stretch")
+
+    page_no = len(state["cursors"])
+    col1, col2, col3 = st.columns([1, 1, 4])
+    with col1:
+        if st.button("上一页", key=f"{key}_prev", disabled=page_no <= 1):
+            state["cursors"].pop()
+            st.rerun()
+    with col2:
+        if st.button("下一页", key=f"{key}_next", disabled=not has_more):
+            state["cursors"].append(last_key)
+            st.rerun()
+    with col3:
+        st.caption(f"第 {page_no} 页")
+
+
+def low_stock_query():
+    """提醒横幅的型号数，返回无参函数（可交给 db.fetch_many），结果交给 low_stock_banner。"""
+    return lambda: replenish.cached_counts(load_products)
+
+
+def low_stock_banner(n=None):
+    """缺货、低于补货点的型号数提醒（见 replenish.cached_counts），没有则不显示。
+
+    n 为已经取好的 low_stock_query() 结果，为空时在这里查询（通常命中进程内缓存）。
+    """
+    n = n or low_stock_query()()
+    parts = [f"{n['out']} 个型号已缺货"] if n["out"] else []
+    parts += [f"{n['low']} 个型号库存低于补货点"] if n["low"] else []
+    if parts:
+        st.warning("，".join(parts) + "，详见“补货提醒”。")
+
+
 def page_dashboard():
     st.title("概览")
     st.write("流程：添加产品，入库产品，库存查询，客户管理，出库产品，维修记录。")
+    low_stock_banner()
 
+    stats = counters.load_dashboard()
     col1, col2, col3 = st.columns(3)
     with col1:
-        p_count = db.execute_one("SELECT COUNT(*) AS n FROM product")["n"]
-        st.metric("产品型号数", p_count)
+        st.metric("产品型号数", stats["product_count"])
     with col2:
-        c_count = db.execute_one("SELECT COUNT(*) AS n FROM customer")["n"]
-        st.metric("客户数", c_count)
+        st.metric("客户数", stats["customer_count"])
     with col3:
-        s_count = db.execute_one("SELECT COUNT(*) AS n FROM sale_order")["n"]
-        st.metric("销售单数", s_count)
+        st.metric("销售单数", stats["order_count"])
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("今日销售单数", stats["today_order_count"])
+    with col2:
+        st.metric("今日营业额", f"{float(stats['today_revenue']):.2f}")
+
+    with st.expander("运行状态"):
+        st.write("连接池：", db.pool_stats())
+        if Config.DB_REPLICAS:
+            st.write("只读副本：", db.replica_stats())
+        st.write("进程内缓存：", cache.stats())
 
 
 def page_products():
@@ -69,67 +406,49 @@ def page_products():
         with st.form("add_product"):
             category = st.text_input("洗衣机, 烘干机")
             model = st.text_input("型号", help="必填")
-            col1, col2 = st.columns(2)
+            col1, col2, col3 = st.columns(3)
             with col1:
                 price = st.number_input("售价", min_value=0.0, value=0.0, step=0.01)
             with col2:
                 cost_price = st.number_input("进价", min_value=0.0, value=0.0, step=0.01)
+            with col3:
+                lead_time = st.number_input(
+                    "到货周期（天）", min_value=0, value=0, step=1,
+                    help=f"从下单到到货的天数，0 = 按默认 {Config.REPLENISH_LEAD_DAYS} 天",
+                )
             submitted = st.form_submit_button("保存")
         if submitted:
             if not model.strip():
                 st.error("型号不能为空")
             else:
                 try:
-                    db.execute_insert(
-                        "INSERT INTO product (category, model, price, cost_price, quantity) "
-                        "VALUES (%s, %s, %s, %s, 0)",
-                        (category or None, model.strip(), price, cost_price),
-                    )
+                    stock.add_product(category, model.strip(), price, cost_price, int(lead_time))
                     st.success("产品已添加")
                 except Exception as e:
-                    if "Duplicate" in str(e) or "uk_model" in str(e):
+                    if db.is_duplicate_key(e):
                         st.error("该型号已存在")
                     else:
                         st.error(f"添加失败：{e}")
 
-    rows = db.execute_all(
-        "SELECT id, category, model, price, cost_price, quantity "
-        "FROM product ORDER BY category, model"
-    )
+    df = load_products()
     st.write("当前产品：")
-    if rows:
-        df = pd.DataFrame(rows)
-        df = df.rename(
-            columns={
-                "id": "ID",
-                "category": "品类",
-                "model": "型号",
-                "price": "售价",
-                "cost_price": "进价",
-                "quantity": "库存数量",
-            }
+    if not df.empty:
+        st.caption(f"库存金额合计：{df['stock_value'].sum():,.2f}")
+        st.dataframe(
+            df[list(PRODUCT_COLUMNS)].rename(columns=PRODUCT_COLUMNS), width="stretch"
         )
-        st.dataframe(df, use_container_width=True)
 
 
 def page_stock_in():
     st.title("入库")
 
-    products = db.execute_all(
-        "SELECT id, category, model, price, cost_price, quantity "
-        "FROM product ORDER BY category, model"
-    )
-    if not products:
+    products = load_products()
+    if products.empty:
         st.info("暂无产品，请先在“产品&型号”中添加。")
         return
 
     with st.form("stock_in_form"):
-        product_options = {
-            f"{(p['category'] + ' - ') if p['category'] else ''}{p['model']}（库存 {p['quantity']}）": p[
-                "id"
-            ]
-            for p in products
-        }
+        product_options = dict(zip(product_labels(products), products["id"].tolist()))
         product_label = st.selectbox("产品", list(product_options.keys()))
         quantity = st.number_input("数量", min_value=1, value=1, step=1)
         cost_price = st.number_input("进价", min_value=0.0, value=0.0, step=0.01)
@@ -138,35 +457,50 @@ def page_stock_in():
 
     if submitted:
         product_id = product_options[product_label]
-        db.execute_insert(
-            "INSERT INTO stock_in (product_id, quantity, cost_price, note) VALUES (%s, %s, %s, %s)",
-            (product_id, quantity, cost_price, note or None),
-        )
-        db.execute_update(
-            "UPDATE product SET quantity = quantity + %s WHERE id = %s",
-            (quantity, product_id),
-        )
+        stock.stock_in(product_id, quantity, cost_price, note)
         st.success("入库成功")
 
-    records = db.execute_all(
-        "SELECT s.created_at, p.category, p.model, s.quantity, s.cost_price, s.note "
-        "FROM stock_in s JOIN product p ON s.product_id = p.id "
-        "ORDER BY s.id DESC LIMIT 100"
+    st.write("入库记录：")
+    paged_table(
+        "stock_in_page",
+        STOCK_IN_LIST_SQL,
+        "s.id",
+        STOCK_IN_COLUMNS,
     )
-    st.write("最近入库记录：")
-    if records:
-        df = pd.DataFrame(records)
-        df = df.rename(
-            columns={
-                "created_at": "时间",
-                "category": "品类",
-                "model": "型号",
-                "quantity": "数量",
-                "cost_price": "进价",
-                "note": "备注",
-            }
+
+
+def page_import():
+    st.title("批量导入")
+    st.write(
+        "上传供应商送货清单（CSV 或 Excel），表头：型号、品类、售价、进价、数量、备注。"
+        "型号不存在则新建产品，数量大于 0 的行记一笔入库。"
+    )
+
+    uploaded = st.file_uploader("清单文件", type=["csv", "xlsx", "xls"])
+    if uploaded is not None and st.button("开始导入", type="primary"):
+        progress = st.empty()
+        try:
+            result = importer.import_file(
+                uploaded, filename=uploaded.name,
+                progress=lambda n: progress.caption(f"已处理 {n} 行"),
+            )
+        except Exception as e:
+            st.error(f"导入失败：{e}")
+            return
+        errors = result.pop("errors")
+        st.success(
+            f"共 {result['rows']} 行，导入 {result['imported']} 行，新建型号 {result['products_created']} 个，"
+            f"入库记录 {result['stock_in_rows']} 条，用时 {result['seconds']} 秒"
         )
-        st.dataframe(df, use_container_width=True)
+        if len(errors):
+            st.warning(f"{len(errors)} 行未导入：")
+            st.dataframe(errors, width="stretch")
+            st.download_button(
+                "下载错误报告",
+                errors.to_csv(index=False).encode("utf-8-sig"),
+                file_name="import_errors.csv",
+                mime="text/csv",
+            )
 
 
 def page_customers():
@@ -182,184 +516,198 @@ def page_customers():
         if not name.strip():
             st.error("客户名不能为空")
         else:
-            db.execute_insert(
-                "INSERT INTO customer (name, phone, address, note) VALUES (%s, %s, %s, %s)",
-                (name.strip(), phone or None, address or None, note or None),
-            )
+            crm.add_customer(name.strip(), phone, address, note)
             st.success("客户已添加")
 
-    rows = db.execute_all(
-        "SELECT id, name, phone, address, note, created_at FROM customer ORDER BY id DESC"
+    paged_table(
+        "customer_page",
+        CUSTOMER_PAGE_SQL,
+        "id",
+        CUSTOMER_PAGE_COLUMNS,
     )
-    if rows:
-        df = pd.DataFrame(rows)
-        df = df.rename(
-            columns={
-                "id": "ID",
-                "name": "客户名",
-                "phone": "电话",
-                "address": "地址",
-                "note": "备注",
-                "created_at": "创建时间",
-            }
-        )
-        st.dataframe(df, use_container_width=True)
 
 
 def page_sales():
     st.title("出库")
 
-    products = db.execute_all(
-        "SELECT id, category, model, price, quantity FROM product WHERE quantity > 0 "
-        "ORDER BY category, model"
-    )
-    customers = db.execute_all(
-        "SELECT id, name, phone, address FROM customer ORDER BY name"
-    )
-
-    if not products:
+    # 产品、补货提醒数、客户、销售单当前页互不依赖，并发取
+    data = db.fetch_many({
+        "products": products_query(),
+        "low_stock": low_stock_query(),
+        "customers": customer_query("sale_customer"),
+        "orders": page_query(
+            "sale_order_page", SALE_ORDER_LIST_SQL, "o.id", SALE_ORDER_COLUMNS, group_by="o.id"
+        ),
+    })
+    products = load_products(data["products"])
+    low_stock_banner(data["low_stock"])
+    products = products[products["quantity"] > 0]
+    sold = False
+
+    if products.empty:
         st.info("暂无可出库的产品，请先入库。")
         return
-    if not customers:
-        st.info("暂无客户，请先添加客户。")
-        return
 
-    product_options = {
-        f"{(p['category'] + ' - ') if p['category'] else ''}{p['model']}（库存 {p['quantity']}）": p[
-            "id"
-        ]
-        for p in products
-    }
-    customer_options = {f"{c['name']} {c['phone'] or ''}": c["id"] for c in customers}
-
-    with st.form("sale_form"):
-        customer_label = st.selectbox("客户", list(customer_options.keys()))
-        product_label = st.selectbox("产品", list(product_options.keys()))
-        quantity = st.number_input("数量", min_value=1, value=1, step=1)
-        # 默认单价用产品售价
-        default_price = 0.0
-        selected_id = product_options[product_label]
-        for p in products:
-            if p["id"] == selected_id:
-                default_price = float(p["price"] or 0)
-                break
-        unit_price = st.number_input(
-            "单价", min_value=0.0, value=default_price, step=0.01
+    product_options = dict(zip(product_labels(products), products["id"].tolist()))
+    prices = dict(zip(products["id"].tolist(), products["price"].tolist()))
+
+    # 购物车：一张销售单可以有多行明细，存在会话里直到提交或清空
+    cart = st.session_state.setdefault("sale_cart", [])
+
+    with st.form("cart_add_form", clear_on_submit=True):
+        col1, col2, col3 = st.columns([3, 1, 1])
+        with col1:
+            product_label = st.selectbox("产品", list(product_options.keys()))
+        with col2:
+            quantity = st.number_input("数量", min_value=1, value=1, step=1)
+        with col3:
+            unit_price = st.number_input(
+                "单价（0 = 按售价）", min_value=0.0, value=0.0, step=0.01
+            )
+        added = st.form_submit_button("加入销售单")
+    if added:
+        product_id = product_options[product_label]
+        # 单价不填时默认用产品售价
+        price = unit_price or float(prices[product_id] or 0)
+        cart.append(
+            {"product_id": product_id, "label": product_label.split("（库存")[0],
+             "quantity": int(quantity), "unit_price": price}
         )
-        submitted = st.form_submit_button("出库")
 
-    if submitted:
-        from datetime import datetime
+    if cart:
+        st.write("当前销售单：")
+        for idx, line in enumerate(cart):
+            col1, col2 = st.columns([6, 1])
+            with col1:
+                st.write(
+                    f"{line['label']} × {line['quantity']} @ {line['unit_price']:.2f} "
+                    f"= {line['quantity'] * line['unit_price']:.2f}"
+                )
+            with col2:
+                if st.button("移除", key=f"cart_remove_{idx}"):
+                    cart.pop(idx)
+                    st.rerun()
+        st.write(f"合计：{sum(l['quantity'] * l['unit_price'] for l in cart):.2f}")
 
-        customer_id = customer_options[customer_label]
-        product_id = product_options[product_label]
-        prod = db.execute_one(
-            "SELECT id, quantity FROM product WHERE id = %s", (product_id,)
-        )
-        if not prod or prod["quantity"] < quantity:
-            st.error("库存不足")
-        else:
-            total = quantity * unit_price
-            order_no = (
-                "SO"
-                + datetime.now().strftime("%Y%m%d%H%M%S")
-                + str(datetime.now().microsecond)[:3]
-            )
-            order_id = db.execute_insert(
-                "INSERT INTO sale_order (order_no, customer_id, total_amount) "
-                "VALUES (%s, %s, %s)",
-                (order_no, customer_id, total),
-            )
-            db.execute_insert(
-                "INSERT INTO sale_order_item ("
-                "order_id, product_id, quantity, unit_price"
-                ") VALUES (%s, %s, %s, %s)",
-                (order_id, product_id, quantity, unit_price),
-            )
-            db.execute_update(
-                "UPDATE product SET quantity = quantity - %s WHERE id = %s",
-                (quantity, product_id),
-            )
-            st.success(f"出库成功，单号：{order_no}")
-
-    rows = db.execute_all(
-        "SELECT "
-        "  o.order_no, o.total_amount, o.created_at, "
-        "  c.name AS customer_name, c.phone, "
-        "  GROUP_CONCAT("
-        "    CONCAT("
-        "      CASE WHEN p.category IS NULL OR p.category = '' "
-        "           THEN '' ELSE CONCAT(p.category, ' - ') END,"
-        "      p.model, ' x', i.quantity"
-        "    ) SEPARATOR '；'"
-        "  ) AS items_summary "
-        "FROM sale_order o "
-        "JOIN customer c ON o.customer_id = c.id "
-        "LEFT JOIN sale_order_item i ON i.order_id = o.id "
-        "LEFT JOIN product p ON p.id = i.product_id "
-        "GROUP BY o.id "
-        "ORDER BY o.id DESC "
-        "LIMIT 100"
+        customer_id = customer_picker("sale_customer", data["customers"])
+        with st.form("sale_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                submitted = st.form_submit_button("出库", type="primary")
+            with col2:
+                cleared = st.form_submit_button("清空")
+        if cleared:
+            cart.clear()
+            st.rerun()
+        if submitted and customer_id is None:
+            st.error("请先选择客户")
+        elif submitted:
+            try:
+                _, order_no = stock.create_sale(
+                    customer_id,
+                    [(l["product_id"], l["quantity"], l["unit_price"]) for l in cart],
+                )
+            except stock.InsufficientStock as e:
+                names = [l["label"] for l in cart if l["product_id"] in e.product_ids]
+                st.error(f"库存不足：{'、'.join(dict.fromkeys(names))}")
+            else:
+                cart.clear()
+                sold = True
+                st.success(f"出库成功，单号：{order_no}（发票、送货单在后台生成，见“单据”）")
+
+    st.write("销售单：")
+    paged_table(
+        "sale_order_page",
+        SALE_ORDER_LIST_SQL,
+        "o.id",
+        SALE_ORDER_COLUMNS,
+        group_by="o.id",
+        # 刚出库的话预取的那页不含新单，重新查
+        page=None if sold else data["orders"],
     )
-    st.write("最近销售单：")
-    if rows:
-        df = pd.DataFrame(rows)
-        df = df.rename(
-            columns={
-                "order_no": "单号",
-                "total_amount": "金额",
-                "created_at": "时间",
-                "customer_name": "客户",
-                "phone": "电话",
-                "items_summary": "商品明细",
-            }
-        )
-        st.dataframe(df, use_container_width=True)
 
 
 def page_inventory():
     st.title("库存查询")
 
-    model_q = st.text_input("按型号搜索", placeholder="输入型号")
-    if st.button("查询") or model_q:
-        rows = db.execute_all(
-            "SELECT category, model, price, cost_price, quantity "
-            "FROM product WHERE model LIKE %s "
-            "ORDER BY category, model",
-            (f"%{model_q}%",),
+    categories = sorted(c for c in load_products()["category"].dropna().unique() if c)
+    col1, col2, col3 = st.columns([3, 1, 1])
+    with col1:
+        model_q = st.text_input("按型号/品类搜索", placeholder="输入型号")
+    with col2:
+        category = st.selectbox("品类", ["全部"] + categories)
+    with col3:
+        limit = st.number_input("最多显示", min_value=10, max_value=1000, value=Config.SEARCH_LIMIT, step=10)
+    if st.button("查询") or model_q or category != "全部":
+        df = search.search_frame(
+            model_q, category=None if category == "全部" else category, limit=limit,
+            columns=SEARCH_COLUMNS,
         )
-        if rows:
-            df = pd.DataFrame(rows)
-            df = df.rename(
-                columns={
-                    "category": "品类",
-                    "model": "型号",
-                    "price": "售价",
-                    "cost_price": "进价",
-                    "quantity": "库存数量",
-                }
-            )
-            st.dataframe(df, use_container_width=True)
+        if not df.empty:
+            st.dataframe(df, width="stretch")
+        else:
+            st.info("没有匹配的产品")
+
+
+def page_replenish():
+    st.title("补货提醒")
+    st.caption(
+        f"按最近 {Config.REPLENISH_WINDOW_DAYS} 天的日销量计算：补货点 = 日均销量 × 到货周期 + 安全库存，"
+        f"建议补货量补到补货点之外再够卖 {Config.REPLENISH_ORDER_DAYS} 天。到货周期在“产品&型号”里设置。"
+    )
+
+    df = replenish.low_stock(load_products())
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("缺货型号", int((df["status"] == "out").sum()))
+    with col2:
+        st.metric("需补货型号", int((df["status"] == "low").sum()))
+    if df.empty:
+        st.success("所有在售型号库存都高于补货点。")
+        return
+
+    categories = sorted(c for c in df["category"].dropna().unique() if c)
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        category = st.selectbox("品类", ["全部"] + categories, key="replenish_category")
+    with col2:
+        status = st.selectbox(
+            "状态", ["全部", "out", "low"], key="replenish_status",
+            format_func=lambda v: replenish.STATUSES.get(v, v),
+        )
+    with col3:
+        limit = st.number_input("最多显示", min_value=10, max_value=5000, value=200, step=50)
+    if category != "全部":
+        df = df[df["category"] == category]
+    if status != "全部":
+        df = df[df["status"] == status]
+
+    view = df[list(LOW_STOCK_COLUMNS)].rename(columns=LOW_STOCK_COLUMNS)
+    view["状态"] = view["状态"].map(replenish.STATUSES)
+    st.caption(f"共 {len(view)} 个型号，按可售天数从少到多排列")
+    st.dataframe(view.head(int(limit)), width="stretch")
+    st.download_button(
+        "下载补货清单（CSV）",
+        view.to_csv(index=False).encode("utf-8-sig"),
+        file_name=f"replenish_{datetime.date.today():%Y%m%d}.csv",
+        mime="text/csv",
+    )
 
 
 def page_maintenance():
     st.title("维修记录")
 
-    customers = db.execute_all("SELECT id, name FROM customer ORDER BY name")
-    products = db.execute_all("SELECT id, category, model FROM product ORDER BY category, model")
-
-    if not customers:
-        st.info("暂无客户，请先添加客户。")
-        return
+    data = db.fetch_many({
+        "customers": customer_query("maint_customer"),
+        "products": products_query(),
+        "records": page_query("maintenance_page", MAINTENANCE_LIST_SQL, "m.id", MAINTENANCE_COLUMNS),
+    })
+    products = load_products(data["products"])
+    product_options = dict(zip(product_labels(products, with_stock=False), products["id"].tolist()))
 
-    customer_options = {c["name"]: c["id"] for c in customers}
-    product_options = {
-        f"{(p['category'] + ' - ') if p['category'] else ''}{p['model']}": p["id"]
-        for p in products
-    }
+    customer_id = customer_picker("maint_customer", data["customers"])
 
     with st.form("maint_form"):
-        customer_label = st.selectbox("客户", list(customer_options.keys()))
         product_label = st.selectbox(
             "产品（可选）", ["—"] + list(product_options.keys())
         )
@@ -367,8 +715,10 @@ def page_maintenance():
         result = st.text_input("处理结果")
         submitted = st.form_submit_button("添加记录")
 
-    if submitted:
-        customer_id = customer_options[customer_label]
+    if submitted and customer_id is None:
+        st.error("请先选择客户")
+        submitted = False
+    elif submitted:
         product_id = None
         if product_label != "—":
             product_id = product_options[product_label]
@@ -379,30 +729,260 @@ def page_maintenance():
         )
         st.success("维修记录已添加")
 
-    rows = db.execute_all(
-        "SELECT m.created_at, c.name AS customer_name, "
-        "       p.model AS product_model, m.content, m.result "
-        "FROM maintenance m "
-        "JOIN customer c ON m.customer_id = c.id "
-        "LEFT JOIN product p ON m.product_id = p.id "
-        "ORDER BY m.id DESC"
+    paged_table(
+        "maintenance_page",
+        MAINTENANCE_LIST_SQL,
+        "m.id",
+        MAINTENANCE_COLUMNS,
+        page=None if submitted else data["records"],
     )
-    if rows:
-        df = pd.DataFrame(rows)
-        df = df.rename(
-            columns={
-                "created_at": "登记时间",
-                "customer_name": "客户",
-                "product_model": "产品型号",
-                "content": "维修内容",
-                "result": "处理结果",
-            }
+
+
+def discard_download(key):
+    """删掉会话里 key 对应的临时下载文件。"""
+    item = st.session_state.pop(key, None)
+    if item and os.path.exists(item[0]):
+        os.remove(item[0])
+
+
+def download_button(key):
+    """会话里 key 对应的临时文件 (路径, 条数, 下载文件名) 的下载按钮，返回该条目，没有则为 None。
+
+    按钮用延迟读取：点下载时才打开文件交给 Streamlit，平时重跑不会把文件读进内存。
+    """
+    item = st.session_state.get(key)
+    if not item:
+        return None
+    path, _, filename = item
+    if not os.path.exists(path):
+        # 已经下载过（文件已删除）
+        st.session_state.pop(key, None)
+        return None
+
+    def serve():
+        # 返回打开的句柄，由 Streamlit 自己读；打开后即删除临时文件，句柄仍可读，读完释放后磁盘空间回收
+        f = open(path, "rb")
+        os.remove(path)
+        return f
+
+    st.download_button("下载", serve, file_name=filename)
+    return item
+
+
+def page_export():
+    st.title("数据导出")
+
+    today = datetime.date.today()
+    col1, col2 = st.columns(2)
+    with col1:
+        dataset = st.selectbox(
+            "数据", list(exporter.DATASETS), format_func=lambda k: exporter.DATASETS[k]["title"]
         )
-        st.dataframe(df, use_container_width=True)
+        fmt = st.radio("格式", exporter.FORMATS, horizontal=True)
+    with col2:
+        start = st.date_input("起始日期", value=today.replace(day=1))
+        end = st.date_input("截止日期（含）", value=today)
+
+    if st.button("生成导出文件", type="primary"):
+        if start > end:
+            st.error("起始日期不能晚于截止日期")
+            return
+        discard_download("export_file")
+        with st.spinner("正在导出…"):
+            path, n = exporter.export_to_tempfile(dataset, start, end, fmt)
+        st.session_state["export_file"] = (path, n, f"{dataset}_{start}_{end}.{fmt}")
+
+    export_file = download_button("export_file")
+    if export_file:
+        st.success(f"共 {export_file[1]} 行")
+
+
+def page_documents():
+    st.title("单据")
+    st.caption("发票、送货单由后台任务生成（python worker.py），出库后稍等片刻即可在这里下载。")
+
+    counts = jobs.stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("排队中", counts["pending"])
+    with col2:
+        st.metric("生成中", counts["running"])
+    with col3:
+        st.metric("已完成", counts["done"])
+    with col4:
+        st.metric("失败", counts["failed"])
+    if counts["failed"] and st.button("失败任务重新排队"):
+        st.success(f"已重新排队 {jobs.retry_failed()} 个任务")
+
+    today = datetime.date.today()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        kind = st.selectbox(
+            "单据", list(documents.KINDS), format_func=lambda k: documents.KINDS[k]["title"]
+        )
+    with col2:
+        start = st.date_input("起始日期", value=today, key="doc_start")
+    with col3:
+        end = st.date_input("截止日期（含）", value=today, key="doc_end")
+    if st.button("打包下载", type="primary"):
+        if start > end:
+            st.error("起始日期不能晚于截止日期")
+            return
+        discard_download("document_bundle")
+        with st.spinner("正在打包…"):
+            path, n = documents.bundle_to_tempfile(kind, start, end)
+        st.session_state["document_bundle"] = (path, n, f"{kind}_{start}_{end}.zip")
+
+    bundle = download_button("document_bundle")
+    if bundle:
+        st.success(f"共 {bundle[1]} 张")
+
+    st.write("销售单及单据：")
+    paged_table("document_page", DOCUMENT_LIST_SQL, "o.id", DOCUMENT_COLUMNS)
+
+
+def is_admin():
+    user = st.session_state.get("user") or {}
+    return not Config.ADMIN_USERNAMES or user.get("username") in Config.ADMIN_USERNAMES
+
+
+ANALYTICS_METRICS = {
+    "revenue": "销售额",
+    "margin": "毛利",
+    "cost": "成本",
+    "quantity": "销量",
+    "orders": "单数",
+}
+
+
+def load_analytics(start, end, top_customers):
+    """销售分析数据（只读日汇总），走进程内缓存，出库/重建汇总时 bump("analytics")。"""
+    return cache.get_or_load(
+        "analytics",
+        (start, end, top_customers),
+        lambda: analytics.load_period(start, end, top_customers),
+    )
+
+
+def _compare_table(df, label_cols):
+    columns = {
+        **label_cols,
+        "quantity_current": "销量",
+        "revenue_current": "销售额",
+        "margin_current": "毛利",
+        "margin_rate": "毛利率",
+        "revenue_previous": "上期销售额",
+        "revenue_change": "销售额环比",
+    }
+    return df[list(columns)].rename(columns=columns)
+
+
+def page_analytics():
+    st.title("销售分析")
+
+    today = datetime.date.today()
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        start = st.date_input("起始日期", today - datetime.timedelta(days=29))
+    with col2:
+        end = st.date_input("截止日期（含当天）", today)
+    with col3:
+        top = st.number_input("客户排行", min_value=5, max_value=200, value=20, step=5)
+    if start > end:
+        st.error("起始日期不能晚于截止日期")
+        return
+
+    data = load_analytics(start, end, int(top))
+    st.caption(f"环比对比上期：{data['previous_start']} ~ {data['previous_end']}")
+
+    summary = data["summary"]
+    cols = st.columns(len(ANALYTICS_METRICS) + 1)
+    for col, (key, label) in zip(cols, ANALYTICS_METRICS.items()):
+        value = summary.loc[key, "current"]
+        change = summary.loc[key, "change"]
+        with col:
+            st.metric(
+                label,
+                f"{value:,.0f}" if key in ("quantity", "orders") else f"{value:,.2f}",
+                None if pd.isna(change) else f"{change:+.1%}",
+            )
+    revenue = summary.loc["revenue", "current"]
+    with cols[-1]:
+        st.metric("毛利率", f"{summary.loc['margin', 'current'] / revenue:.1%}" if revenue else "—")
+
+    daily = data["daily"]
+    if daily["revenue"].any():
+        st.line_chart(daily[["revenue", "margin"]].rename(columns={"revenue": "销售额", "margin": "毛利"}))
+
+    st.subheader("按品类")
+    st.dataframe(_compare_table(data["categories"], {"category": "品类"}), width="stretch")
+
+    st.subheader("按型号")
+    products = data["products"]
+    st.dataframe(
+        _compare_table(products[products["revenue_current"] != 0].head(200),
+                       {"category": "品类", "model": "型号"}),
+        width="stretch",
+    )
+
+    st.subheader("客户排行")
+    customers = data["customers"]
+    if not customers.empty:
+        st.dataframe(
+            customers[["name", "phone", "quantity", "revenue", "margin", "margin_rate"]].rename(
+                columns={
+                    "name": "客户",
+                    "phone": "电话",
+                    "quantity": "销量",
+                    "revenue": "销售额",
+                    "margin": "毛利",
+                    "margin_rate": "毛利率",
+                }
+            ),
+            width="stretch",
+        )
+
+
+def page_metrics():
+    st.title("性能监控")
+    if not is_admin():
+        st.error("无权限")
+        return
+
+    st.caption(
+        f"本进程最近 {Config.METRICS_BUFFER_SIZE} 条样本；"
+        f"慢查询日志阈值：{Config.SLOW_QUERY_MS or '关闭'} ms"
+    )
+    if st.button("清空统计"):
+        metrics.reset()
+
+    st.subheader("页面渲染")
+    pages = metrics.page_summary()
+    if pages:
+        df = pd.DataFrame(pages).rename(columns={"key": "页面", "count": "次数"})
+        st.dataframe(df, width="stretch")
+
+    st.subheader("查询（按 SQL 指纹）")
+    queries = metrics.query_summary()
+    if queries:
+        df = pd.DataFrame(queries).rename(
+            columns={"key": "SQL 指纹", "count": "次数", "pages": "页面", "errors": "出错"}
+        )
+        st.dataframe(df, width="stretch")
+
+    st.subheader("最慢的查询")
+    slow = metrics.slow_queries(20)
+    if slow:
+        df = pd.DataFrame(slow)[["elapsed_ms", "acquire_ms", "rows", "page", "error", "sql"]]
+        st.dataframe(df, width="stretch")
+
+    st.subheader("连接池")
+    st.write(db.pool_stats())
 
 
 def main():
     st.set_page_config(page_title="进销存 CRM", layout="wide")
+    init_db.ensure_migrated()
 
     if "user" not in st.session_state:
         page_login()
@@ -414,13 +994,26 @@ def main():
         "首页": page_dashboard,
         "产品&型号": page_products,
         "入库": page_stock_in,
+        "批量导入": page_import,
         "客户": page_customers,
         "出库": page_sales,
         "库存查询": page_inventory,
+        "补货提醒": page_replenish,
         "维修记录": page_maintenance,
+        "数据导出": page_export,
+        "单据": page_documents,
+        "销售分析": page_analytics,
     }
+    if is_admin():
+        pages["性能监控"] = page_metrics
     choice = st.sidebar.radio("功能菜单", list(pages.keys()))
-    pages[choice]()
+    # 离开页面时丢掉该页生成、还没下载的临时文件
+    for key, page in TEMP_DOWNLOADS.items():
+        if page != choice:
+            discard_download(key)
+    # 本会话写过库后，接下来的读在副本追上之前走主库（见 db.session）
+    with db.session(st.session_state.setdefault("db_session", {})), metrics.page_timer(choice):
+        pages[choice]()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""测试跑在 SQLite 后端上（每个用例一个临时库文件），不需要 MySQL。
+
+  pip install -r requirements-dev.txt
+  python -m pytest -q
+"""
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+# Config 在导入时读环境变量，须在导入任何项目模块之前设好
+os.environ["DB_BACKEND"] = "sqlite"
+os.environ["DB_REPLICAS"] = ""
+
+import pytest  # noqa: E402
+
+import cache  # noqa: E402
+import db  # noqa: E402
+import init_db  # noqa: E402
+import numbering  # noqa: E402
+from config import Config  # noqa: E402
+
+
+def _reset():
+    db._stop_lag_monitor()
+    if db._pool is not None:
+        db._pool.close()
+    db._pool = None
+    for r in db._replicas or []:
+        r.pool.close()
+    db._replicas = None
+    db._process_session.clear()
+    numbering._blocks.clear()
+    numbering._db_offset = None
+    cache.clear()
+    cache._frames.clear()
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """建好表结构（schema.sql + 全部迁移）的空库。"""
+    monkeypatch.setattr(Config, "SQLITE_PATH", str(tmp_path / "test.sqlite3"))
+    _reset()
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            for stmt in init_db._split_sql((ROOT / "sql" / "schema.sql").read_text(encoding="utf-8")):
+                for s in db.translate_ddl(stmt):
+                    cur.execute(s)
+    finally:
+        conn.close()
+    init_db.migrate(verbose=False)
+    yield
+    _reset()
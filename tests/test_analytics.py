@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""analytics：销售日汇总的增量累加与按明细重建同一口径（销售单的数据库日期）。"""
+from datetime import date, timedelta
+
+import pytest
+
+import analytics
+import crm
+import db
+import stock
+
+
+def _rollup():
+    rows = db.execute_all(
+        "SELECT stat_date, product_id, customer_id, order_count, quantity, revenue, cost "
+        "FROM sales_daily_rollup ORDER BY stat_date, product_id, customer_id"
+    )
+    return [
+        (str(r["stat_date"]), r["product_id"], r["customer_id"], r["order_count"], r["quantity"],
+         float(r["revenue"]), float(r["cost"]))
+        for r in rows
+    ]
+
+
+@pytest.fixture
+def sales(sqlite_db):
+    a = stock.add_product("洗衣机", "WM-1", 500, 300)
+    b = stock.add_product("烘干机", "DR-1", 800, 500)
+    c1, c2 = crm.add_customer("张三"), crm.add_customer("李四")
+    stock.stock_in(a, 10, 300)
+    stock.stock_in(b, 10, 500)
+    orders = [
+        stock.create_sale(c1, [(a, 1, 500), (b, 1, 800)])[0],
+        stock.create_sale(c1, [(a, 2, 450)])[0],
+        stock.create_sale(c2, [(b, 1, 780)])[0],
+    ]
+    return a, b, c1, c2, orders
+
+
+def test_incremental_rollup_is_dated_by_order_date(sales):
+    a, b, c1, c2, _ = sales
+    day = str(db.execute_one("SELECT DATE(created_at) AS day FROM sale_order ORDER BY id LIMIT 1")["day"])
+    assert _rollup() == [
+        (day, a, c1, 2, 3, 1400.0, 900.0),
+        (day, b, c1, 1, 1, 800.0, 500.0),
+        (day, b, c2, 1, 1, 780.0, 500.0),
+    ]
+
+
+def test_rebuild_matches_incremental_rollup(sales):
+    before = _rollup()
+    assert analytics.rebuild() == 3
+    assert _rollup() == before
+
+
+def test_rebuild_moves_backdated_order(sales):
+    a, b, c1, c2, orders = sales
+    yesterday = date.today() - timedelta(days=1)
+    with db.transaction() as tx:
+        tx.execute_update(
+            "UPDATE sale_order SET created_at = %s WHERE id = %s", (f"{yesterday} 23:59:59", orders[2])
+        )
+    analytics.rebuild()
+    assert [r for r in _rollup() if r[0] == str(yesterday)] == [(str(yesterday), b, c2, 1, 1, 780.0, 500.0)]
+
+
+def test_load_period_compares_with_previous_period(sales):
+    today = date.fromisoformat(_rollup()[0][0])
+    result = analytics.load_period(today, today)
+    summary = result["summary"]
+    assert summary.loc["revenue", "current"] == 2980.0
+    assert summary.loc["orders", "current"] == 3
+    assert summary.loc["revenue", "previous"] == 0.0
+    assert list(result["customers"]["name"]) == ["张三", "李四"]
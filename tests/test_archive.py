@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""archive：整月冷数据分批搬到归档表，union 同时查热表和归档表。"""
+from datetime import date
+
+import archive
+import counters
+import crm
+import db
+import stock
+
+OLD = "2020-03-15 10:00:00"
+
+
+def _ids(table):
+    return [r["id"] for r in db.execute_all(f"SELECT id FROM {table} ORDER BY id")]
+
+
+def test_cutoff_keeps_whole_months():
+    assert archive.cutoff(12, today=date(2026, 10, 18)) == date(2025, 10, 1)
+    assert archive.cutoff(0, today=date(2026, 1, 31)) == date(2026, 1, 1)
+    assert archive.cutoff(1, today=date(2026, 1, 31)) == date(2025, 12, 1)
+
+
+def test_union_substitutes_archive_then_hot_tables():
+    sql, args = archive.union("SELECT id FROM {sale_order} WHERE created_at >= %s", ["2020-01-01"])
+    assert sql == (
+        "SELECT id FROM sale_order_archive WHERE created_at >= %s "
+        "UNION ALL SELECT id FROM sale_order WHERE created_at >= %s"
+    )
+    assert args == ["2020-01-01", "2020-01-01"]
+
+
+def test_run_moves_old_orders_with_children(sqlite_db):
+    pid = stock.add_product("洗衣机", "WM-1", 500, 300)
+    cid = crm.add_customer("张三")
+    stock.stock_in(pid, 10, 300)
+    orders = [stock.create_sale(cid, [(pid, 1, 500), (pid, 1, 480)])[0] for _ in range(3)]
+    with db.transaction() as tx:
+        tx.execute_insert(
+            "INSERT INTO maintenance (customer_id, content, created_at) VALUES (%s, '换皮带', %s)", (cid, OLD)
+        )
+        tx.execute_insert("INSERT INTO maintenance (customer_id, content) VALUES (%s, '上门检查')", (cid,))
+        tx.execute_update("UPDATE sale_order SET created_at = %s WHERE id IN (%s, %s)", (OLD, orders[0], orders[1]))
+    dashboard = counters.load_dashboard()
+    items = _ids("sale_order_item")
+
+    assert archive.pending(archive.cutoff(12)) == {"sale_order": 2, "maintenance": 1, "job": 0}
+    assert archive.run(keep_months=12, batch=1) == {"sale_order": 2, "maintenance": 1, "job": 0}
+
+    assert _ids("sale_order") == [orders[2]]
+    assert _ids("sale_order_archive") == orders[:2]
+    assert _ids("sale_order_item_archive") == items[:4]
+    assert _ids("sale_order_item") == items[4:]
+    assert len(_ids("maintenance_archive")) == 1 and len(_ids("maintenance")) == 1
+    # 重跑没有可搬的
+    assert archive.run(keep_months=12) == {"sale_order": 0, "maintenance": 0, "job": 0}
+
+    # 历史查询合并热表和归档表，重建计数结果不变
+    sql, args = archive.union("SELECT id FROM {sale_order} WHERE customer_id = %s", [cid])
+    assert sorted(r["id"] for r in db.execute_all(sql, args)) == orders
+    counters.reconcile()
+    assert counters.load_dashboard()["order_count"] == dashboard["order_count"] == 3
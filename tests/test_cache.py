@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""cache：命名空间版本号失效、TTL、按最近最少使用淘汰。"""
+import time
+
+import cache
+import db
+import stock
+from config import Config
+
+
+def _loader(values):
+    calls = []
+
+    def load():
+        calls.append(1)
+        return values[len(calls) - 1]
+
+    return load, calls
+
+
+def test_hit_after_first_load(sqlite_db):
+    before = cache.stats()
+    load, calls = _loader(["a", "b"])
+    assert cache.get_or_load("t_hit", 1, load) == "a"
+    assert cache.get_or_load("t_hit", 1, load) == "a"
+    assert len(calls) == 1
+    after = cache.stats()
+    assert (after["hits"] - before["hits"], after["misses"] - before["misses"]) == (1, 1)
+
+
+def test_expired_entry_is_reloaded(sqlite_db):
+    load, calls = _loader(["a", "b"])
+    assert cache.get_or_load("t_ttl", 1, load, ttl=0.05) == "a"
+    time.sleep(0.06)
+    assert cache.get_or_load("t_ttl", 1, load, ttl=0.05) == "b"
+    assert len(calls) == 2
+
+
+def test_least_recently_used_entry_is_evicted(sqlite_db, monkeypatch):
+    monkeypatch.setattr(Config, "CACHE_MAX_ENTRIES", 2)
+    cache.get_or_load("t_lru", "a", lambda: 1)
+    cache.get_or_load("t_lru", "b", lambda: 2)
+    # 访问 a 之后 b 成了最久没用的
+    cache.get_or_load("t_lru", "a", lambda: None)
+    cache.get_or_load("t_lru", "c", lambda: 3)
+    assert cache.get_or_load("t_lru", "a", lambda: None) == 1
+    assert cache.get_or_load("t_lru", "b", lambda: "reloaded") == "reloaded"
+
+
+def test_bump_invalidates_every_key_of_the_namespace_only(sqlite_db):
+    cache.get_or_load("t_a", 1, lambda: "a1")
+    cache.get_or_load("t_a", 2, lambda: "a2")
+    cache.get_or_load("t_b", 1, lambda: "b1")
+    cache.bump("t_a")
+    assert cache.get_or_load("t_a", 1, lambda: "new1") == "new1"
+    assert cache.get_or_load("t_a", 2, lambda: "new2") == "new2"
+    assert cache.get_or_load("t_b", 1, lambda: "不应加载") == "b1"
+
+
+def test_value_loaded_across_a_bump_is_not_cached(sqlite_db):
+    def load():
+        # 加载期间别的会话写库并 bump：这次结果可以返回，但不能留给后面的读方
+        cache.bump("t_race")
+        return "old"
+
+    assert cache.get_or_load("t_race", 1, load) == "old"
+    assert cache.get_or_load("t_race", 1, lambda: "new") == "new"
+
+
+def test_writes_invalidate_cached_queries(sqlite_db):
+    def count():
+        return db.execute_one("SELECT COUNT(*) AS n FROM product")["n"]
+
+    assert cache.get_or_load("product", "count", count) == 0
+    stock.add_product("洗衣机", "WM-1", 500, 300)
+    # stock.add_product 提交后 bump("product")，缓存里的 0 不会再被读到
+    assert cache.get_or_load("product", "count", count) == 1
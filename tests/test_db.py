@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""db：upsert_sql / update_join 按后端生成的语句及其在 SQLite 上的效果，keyset 分页，结果转 DataFrame 的列类型。"""
+import db
+import stock
+from config import Config
+
+
+def test_upsert_sql_mysql(monkeypatch):
+    monkeypatch.setattr(Config, "DB_BACKEND", "mysql")
+    assert db.upsert_sql("stats_counter", ["name", "value"], ["name"], {"value": "value + NEW(value)"}) == (
+        "INSERT INTO stats_counter (name, value) VALUES (%s, %s) "
+        "ON DUPLICATE KEY UPDATE value = value + VALUES(value)"
+    )
+    assert db.upsert_sql("t", ["k"], ["k"]).endswith("ON DUPLICATE KEY UPDATE k = k")
+
+
+def test_upsert_sql_sqlite():
+    assert db.upsert_sql("stats_counter", ["name", "value"], ["name"], {"value": "value + NEW(value)"}) == (
+        "INSERT INTO stats_counter (name, value) VALUES (%s, %s) "
+        "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value"
+    )
+    assert db.upsert_sql("t", ["k"], ["k"]).endswith("ON CONFLICT (k) DO NOTHING")
+
+
+def test_upsert_accumulates(sqlite_db):
+    sql = db.upsert_sql("stats_counter", ["name", "value"], ["name"], {"value": "value + NEW(value)"})
+    with db.transaction() as tx:
+        tx.execute_many(sql, [("a", 1), ("b", 5), ("a", 2)])
+    with db.transaction() as tx:
+        tx.execute_update(sql, ("a", 10))
+    rows = db.execute_all("SELECT name, value FROM stats_counter ORDER BY name")
+    assert [(r["name"], r["value"]) for r in rows] == [("a", 13), ("b", 5)]
+
+
+def test_upsert_without_updates_keeps_existing_row(sqlite_db):
+    sql = db.upsert_sql("stats_counter", ["name", "value"], ["name"])
+    with db.transaction() as tx:
+        tx.execute_update(sql, ("a", 1))
+        tx.execute_update(sql, ("a", 2))
+    assert db.execute_one("SELECT value FROM stats_counter WHERE name = 'a'")["value"] == 1
+
+
+def test_update_join_sql_mysql(monkeypatch):
+    monkeypatch.setattr(Config, "DB_BACKEND", "mysql")
+    table, _ = db.values_table([(1, 2)], ["id", "qty"])
+    assert db.update_join("product", "p", table, "p.id = d.id", [("quantity", "p.quantity + d.qty")]) == (
+        f"UPDATE product p JOIN {table} d ON p.id = d.id SET p.quantity = p.quantity + d.qty"
+    )
+
+
+def test_update_join_updates_matching_rows(sqlite_db):
+    with db.transaction() as tx:
+        ids = [
+            tx.execute_insert("INSERT INTO product (model, price, cost_price, quantity) VALUES (%s, 0, 0, %s)",
+                              (model, qty))
+            for model, qty in (("A", 1), ("B", 2), ("C", 3))
+        ]
+    table, args = db.values_table([(ids[0], 10), (ids[2], 30)], ["id", "qty"])
+    with db.transaction() as tx:
+        n = tx.execute_update(
+            db.update_join("product", "p", table, "p.id = d.id", [("quantity", "p.quantity + d.qty")]), args
+        )
+    assert n == 2
+    rows = db.execute_all("SELECT model, quantity FROM product ORDER BY model")
+    assert [(r["model"], r["quantity"]) for r in rows] == [("A", 11), ("B", 2), ("C", 33)]
+
+
+def _customers(n):
+    with db.transaction() as tx:
+        return [tx.execute_insert("INSERT INTO customer (name) VALUES (%s)", (f"客户{i}",)) for i in range(n)]
+
+
+def test_keyset_pages_walk_backwards_without_gaps(sqlite_db):
+    ids = _customers(5)
+    sql = "SELECT c.id, c.name FROM customer c"
+    pages, before = [], None
+    while True:
+        df, has_more, before = db.fetch_keyset_frame(sql, "c.id", before, limit=2, columns={"name": "姓名"})
+        pages.append(list(df["姓名"]))
+        if not has_more:
+            break
+    assert pages == [["客户4", "客户3"], ["客户2", "客户1"], ["客户0"]]
+    # 游标用的 id 不在展示列里，返回的是本页最后一行的 id
+    assert before == ids[0]
+    df, has_more, last = db.fetch_keyset_frame(sql, "c.id", ids[0], limit=2)
+    assert df.empty and not has_more and last is None
+
+
+def test_keyset_with_where_and_group_by(sqlite_db):
+    ids = _customers(4)
+    with db.transaction() as tx:
+        tx.execute_many(
+            "INSERT INTO maintenance (customer_id, content) VALUES (%s, '上门')",
+            [(ids[0],), (ids[2],), (ids[2],), (ids[3],)],
+        )
+    df, has_more, last = db.fetch_keyset_frame(
+        "SELECT c.id, c.name, COUNT(m.id) AS n FROM customer c LEFT JOIN maintenance m ON m.customer_id = c.id",
+        "c.id", before=ids[3], limit=2, where=["c.name <> %s"], args=["客户1"], group_by="c.id, c.name",
+    )
+    assert list(zip(df["name"], df["n"])) == [("客户2", 2), ("客户0", 1)]
+    assert not has_more and last == ids[0]
+
+
+def test_fetch_frame_infers_nullable_types(sqlite_db):
+    stock.add_product("洗衣机", "A", 500, 300)
+    stock.add_product("洗衣机", "B", 1.5, 1, lead_time_days=7)
+    df = db.fetch_frame("SELECT id, model, price, lead_time_days, created_at FROM product ORDER BY id")
+    assert {c: str(t) for c, t in df.dtypes.items() if c != "model"} == {
+        "id": "Int64", "price": "float64", "lead_time_days": "Int64", "created_at": "datetime64[ns]",
+    }
+    # 没填的整数列是 <NA>，不会把整列变成 float
+    assert df["lead_time_days"].isna().tolist() == [True, False]
+    assert df["lead_time_days"].iloc[1] == 7
+
+
+def test_fetch_frame_labels_and_explicit_dtypes(sqlite_db):
+    stock.add_product("洗衣机", "A", 500, 300)
+    df = db.fetch_frame(
+        "SELECT id, model, price FROM product", columns={"model": "型号", "price": "售价"},
+        dtypes={"price": "string"},
+    )
+    assert list(df.columns) == ["型号", "售价"]
+    assert str(df["售价"].dtype) == "string" and df["售价"].iloc[0] == "500.00"
+
+
+def test_empty_result_keeps_columns_and_given_dtypes(sqlite_db):
+    df = db.fetch_frame("SELECT id, model, price FROM product", dtypes={"id": "Int64", "price": "float64"})
+    assert df.empty and list(df.columns) == ["id", "model", "price"]
+    assert (str(df["id"].dtype), str(df["price"].dtype)) == ("Int64", "float64")
+    frame = db.to_frame(["id", "name"], [], labels={"name": "姓名"})
+    assert frame.empty and list(frame.columns) == ["姓名"]
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""db_sqlite：MySQL 写法到 SQLite 的翻译，以及金额、时间、批量派生表在 SQLite 上的行为。"""
+import sqlite3
+from datetime import datetime
+from decimal import Decimal
+
+import db
+import db_sqlite
+
+
+def test_translate_placeholders_and_locking():
+    sql = "SELECT id FROM product WHERE model LIKE %s AND note LIKE '%%x' FOR UPDATE"
+    assert db_sqlite.translate(sql) == "SELECT id FROM product WHERE model LIKE ? AND note LIKE '%x'"
+
+
+def test_translate_insert_ignore_and_group_concat():
+    assert db_sqlite.translate("INSERT IGNORE INTO t (a) VALUES (%s)") == "INSERT OR IGNORE INTO t (a) VALUES (?)"
+    assert (
+        db_sqlite.translate("SELECT GROUP_CONCAT(model SEPARATOR '、') FROM product")
+        == "SELECT GROUP_CONCAT(model, '、') FROM product"
+    )
+
+
+CREATE_TABLE = """
+-- 注释行
+CREATE TABLE IF NOT EXISTS item (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  code VARCHAR(32) NOT NULL COMMENT '编码',
+  qty INT NOT NULL DEFAULT 0,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  UNIQUE KEY uk_item_code (code),
+  KEY idx_item_qty (qty, code),
+  FULLTEXT KEY ft_item_code (code) WITH PARSER ngram
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+
+def test_translate_create_table():
+    stmts = db_sqlite.translate_ddl(CREATE_TABLE)
+    create, rest = stmts[0], stmts[1:]
+    assert "INTEGER PRIMARY KEY AUTOINCREMENT" in create
+    assert "COMMENT" not in create and "ENGINE" not in create and "FULLTEXT" not in create
+    assert "CREATE INDEX IF NOT EXISTS idx_item_qty ON item (qty, code)" in rest
+    assert any(s.startswith("CREATE TRIGGER IF NOT EXISTS trg_item_updated_at") for s in rest)
+
+    conn = sqlite3.connect(":memory:")
+    for s in stmts:
+        conn.execute(s)
+    conn.execute("INSERT INTO item (code) VALUES ('A')")
+    conn.execute("UPDATE item SET updated_at = '2000-01-01 00:00:00'")
+    conn.execute("UPDATE item SET qty = 1")
+    # ON UPDATE CURRENT_TIMESTAMP 由触发器补上
+    assert conn.execute("SELECT updated_at FROM item").fetchone()[0] > "2000-01-01 00:00:00"
+    try:
+        conn.execute("INSERT INTO item (code) VALUES ('A')")
+    except sqlite3.IntegrityError as e:
+        assert db_sqlite.is_duplicate_key(e)
+    else:
+        raise AssertionError("唯一键没有生效")
+
+
+def test_translate_alter_table():
+    assert db_sqlite.translate_ddl(
+        "ALTER TABLE item\n  ADD INDEX idx_item_created (created_at),\n  ALGORITHM=INPLACE, LOCK=NONE"
+    ) == ["CREATE INDEX IF NOT EXISTS idx_item_created ON item (created_at)"]
+    assert db_sqlite.translate_ddl("ALTER TABLE item DROP INDEX idx_item_qty") == [
+        "DROP INDEX IF EXISTS idx_item_qty"
+    ]
+    assert db_sqlite.translate_ddl(
+        "ALTER TABLE item ADD COLUMN lead SMALLINT DEFAULT NULL COMMENT '天' AFTER qty"
+    ) == ["ALTER TABLE item ADD COLUMN lead SMALLINT DEFAULT NULL"]
+
+
+def test_translate_ddl_skips_mysql_only_statements():
+    assert db_sqlite.translate_ddl("USE mycrm") == []
+    assert db_sqlite.translate_ddl("SET SESSION innodb_ft_enable_stopword = 0") == []
+    assert db_sqlite.translate_ddl("-- 只有注释") == []
+    assert db_sqlite.translate_ddl(
+        "ALTER TABLE item ADD FULLTEXT INDEX ft_item (code) WITH PARSER ngram"
+    ) == []
+    assert db_sqlite.translate_ddl(
+        "ALTER TABLE item DROP INDEX ft_item, ADD FULLTEXT INDEX ft_item (code) WITH PARSER ngram"
+    ) == []
+
+
+def test_translate_decimal_columns_keep_scale():
+    [create] = db_sqlite.translate_ddl("CREATE TABLE t (\n  a DECIMAL(12,2) NOT NULL,\n  b DECIMAL(16, 4)\n)")
+    assert "a DECIMAL_2(12,2) NOT NULL" in create and "b DECIMAL_4(16,4)" in create
+    assert db_sqlite.translate_ddl("ALTER TABLE t ADD COLUMN c DECIMAL(14,2) DEFAULT NULL") == [
+        "ALTER TABLE t ADD COLUMN c DECIMAL_2(14,2) DEFAULT NULL"
+    ]
+
+
+def test_decimal_and_datetime_round_trip(sqlite_db):
+    with db.transaction() as tx:
+        pid = tx.execute_insert(
+            "INSERT INTO product (model, price, cost_price, quantity) VALUES ('A', %s, %s, 0)",
+            (Decimal("0.1"), Decimal("19.99")),
+        )
+        # 浮点加减的误差在读出时按列的小数位数取整
+        tx.execute_update(
+            "UPDATE product SET price = price + %s, stock_value = stock_value + %s WHERE id = %s",
+            (Decimal("0.2"), Decimal("33.3333"), pid),
+        )
+    row = db.execute_one("SELECT price, cost_price, stock_value FROM product WHERE id = %s", (pid,))
+    assert (row["price"], row["cost_price"], row["stock_value"]) == (
+        Decimal("0.30"), Decimal("19.99"), Decimal("33.3333"),
+    )
+    at = datetime(2026, 10, 18, 9, 30, 15, 123456)
+    with db.transaction() as tx:
+        tx.execute_update("INSERT INTO replication_heartbeat (id, beat_at) VALUES (1, %s)", (at,))
+    assert db.execute_one("SELECT beat_at FROM replication_heartbeat")["beat_at"] == at
+
+
+def test_values_table_beyond_compound_select_limit(sqlite_db):
+    # SQLite 的复合 SELECT 最多 500 段，派生表要能放下更多行
+    n = 800
+    with db.transaction() as tx:
+        tx.execute_many(
+            "INSERT INTO product (model, price, cost_price, quantity) VALUES (%s, 0, 0, 1)",
+            [(f"M{i:04d}",) for i in range(n)],
+        )
+    ids = [r["id"] for r in db.execute_all("SELECT id FROM product ORDER BY id")]
+    table, args = db.values_table([(pid, 2) for pid in ids], ["id", "qty"])
+    with db.transaction() as tx:
+        updated = tx.execute_update(
+            db.update_join("product", "p", table, "p.id = d.id", [("quantity", "p.quantity + d.qty")]), args
+        )
+    assert updated == n
+    assert db.execute_one("SELECT MIN(quantity) AS lo, MAX(quantity) AS hi FROM product") == {"lo": 3, "hi": 3}
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""streamlit_app.delta_query / delta_merge：全进程共用的产品列表按 updated_at 水位增量刷新。"""
+import pandas as pd
+
+import cache
+import db
+import stock
+import streamlit_app as app
+from config import Config
+
+
+def _state():
+    with cache.frame_state("product_list") as state:
+        return dict(state)
+
+
+def _quantities(df):
+    return dict(zip(df["model"], df["quantity"]))
+
+
+def test_delta_picks_up_changes_and_advances_watermark(sqlite_db):
+    a = stock.add_product("洗衣机", "WM-1", 500, 300)
+    stock.add_product("洗衣机", "WM-2", 500, 300)
+    assert app.products_query()()[0] == "full"
+    df = app.load_products()
+    assert _quantities(df) == {"WM-1": 0, "WM-2": 0}
+    assert _state()["mark"] == df["updated_at"].max()
+
+    stock.stock_in(a, 3, 300)
+    stock.add_product("烘干机", "DR-1", 800, 500)
+    result = app.products_query()()
+    assert result[0] == "delta"
+    df = app.load_products(result)
+    assert _quantities(df) == {"WM-1": 3, "WM-2": 0, "DR-1": 0}
+    assert list(df["model"]) == ["WM-1", "WM-2", "DR-1"]  # 按品类、型号排序
+    assert _state()["mark"] == df["updated_at"].max()
+
+    # 没有写入、也没到轮询间隔时不查库
+    assert app.products_query()()[0] == "cached"
+    assert app.load_products() is df
+
+
+def test_deleted_rows_leave_on_full_resync(sqlite_db, monkeypatch):
+    stock.add_product("洗衣机", "WM-1", 500, 300)
+    b = stock.add_product("洗衣机", "WM-2", 500, 300)
+    app.load_products()
+    with db.transaction() as tx:
+        tx.execute_update("DELETE FROM product WHERE id = %s", (b,))
+    cache.bump("product")
+    # 增量只取改动过的行，删除看不到
+    assert list(app.load_products()["model"]) == ["WM-1", "WM-2"]
+    monkeypatch.setattr(Config, "DELTA_RESYNC_SECONDS", -1)
+    cache.bump("product")
+    assert app.products_query()()[0] == "full"
+    assert list(app.load_products()["model"]) == ["WM-1"]
+
+
+def test_out_of_order_results_do_not_roll_back(sqlite_db):
+    a = stock.add_product("洗衣机", "WM-1", 500, 300)
+    stale_full = app.products_query()()
+    stock.stock_in(a, 2, 300)
+    cache.bump("product")
+    fresh_full = app.products_query()()
+    app.load_products(fresh_full)
+    # 比现有全量早发起的全量直接丢掉
+    assert _quantities(app.load_products(stale_full)) == {"WM-1": 2}
+
+    # 增量里 updated_at 比已有行旧的版本忽略
+    old = fresh_full[1].copy()
+    old["quantity"] = pd.array([0], dtype="Int64")
+    old["updated_at"] = old["updated_at"] - pd.Timedelta(seconds=10)
+    assert _quantities(app.load_products(("delta", old, cache.version("product"), fresh_full[3]))) == {"WM-1": 2}
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""db.fetch_many：并发读取的结果和出错时的行为。"""
+import pytest
+
+import db
+from config import Config
+
+
+def test_fetch_many(sqlite_db, monkeypatch):
+    monkeypatch.setattr(Config, "DB_FETCH_WORKERS", 2)
+    result = db.fetch_many({
+        "one": "SELECT 1 AS v",
+        "two": ("SELECT %s AS v", (2,)),
+        "three": lambda: 3,
+        "four": lambda: 4,
+    })
+    assert result == {"one": [{"v": 1}], "two": [{"v": 2}], "three": 3, "four": 4}
+
+    def boom():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        db.fetch_many({"a": lambda: 1, "b": boom, "c": lambda: 3})
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""importer：整列校验和按块导入，某一块写库失败不影响其余块。"""
+import io
+import sqlite3
+
+import db
+import importer
+from config import Config
+
+
+def _csv(rows):
+    return io.StringIO("型号,品类,售价,进价,数量,备注\n" + "\n".join(rows) + "\n")
+
+
+def _errors(result):
+    return dict(zip(result["errors"]["行号"], result["errors"]["错误"]))
+
+
+def test_validate_reports_each_bad_row_once():
+    chunk = importer.pd.read_csv(_csv([
+        "WM-1,洗衣机,100,80,2,",
+        ",洗衣机,100,80,1,",
+        "WM-2,洗衣机,abc,80,1,",
+        "WM-3,洗衣机,100,80,1.5,",
+        "WM-4," + "品" * 65 + ",100,80,1,",
+        "WM-5,洗衣机,100,80,1," + "注" * 256,
+        "WM-6,洗衣机,10000000000,80,1,",
+        "WM-7,洗衣机,100,-1,1,",
+        "WM-8,洗衣机,100,80,3000000000,",
+    ]), dtype=str)
+    good, errors = importer.validate(chunk, 2)
+    assert list(good["model"]) == ["WM-1"]
+    assert {e["行号"]: e["错误"] for e in errors} == {
+        3: "型号为空",
+        4: "售价无效",
+        5: "数量必须是非负整数",
+        6: "品类超过 64 个字符",
+        7: "备注超过 255 个字符",
+        8: "售价超出范围",
+        9: "进价无效",
+        10: "数量超出范围",
+    }
+
+
+def test_import_file_creates_products_and_receipts(sqlite_db):
+    result = importer.import_file(_csv([
+        "WM-1,洗衣机,100,80,2,首批",
+        "WM-1,洗衣机,100,90,3,",
+        "DR-1,烘干机,200,150,0,",
+        "DR-2,烘干机,x,150,1,",
+    ]), filename="清单.csv")
+    assert (result["rows"], result["imported"], result["products_created"], result["stock_in_rows"]) == (4, 3, 2, 2)
+    assert _errors(result) == {5: "售价无效"}
+    rows = db.execute_all("SELECT model, quantity, stock_value FROM product ORDER BY model")
+    assert [(r["model"], r["quantity"], float(r["stock_value"])) for r in rows] == [
+        ("DR-1", 0, 0.0), ("WM-1", 5, 430.0),
+    ]
+    assert db.execute_one("SELECT value FROM stats_counter WHERE name = 'product_count'")["value"] == 2
+
+
+def test_failed_chunk_becomes_row_errors(sqlite_db):
+    # 第二块写入 stock_in 时数据库报错：该块回滚，前后两块照常导入
+    conn = sqlite3.connect(Config.SQLITE_PATH)
+    conn.execute(
+        "CREATE TRIGGER trg_reject BEFORE INSERT ON stock_in WHEN NEW.note = 'boom' "
+        "BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+    )
+    conn.commit()
+    conn.close()
+    result = importer.import_file(_csv([
+        "A-1,洗衣机,100,80,1,",
+        "A-2,洗衣机,100,80,1,",
+        "B-1,洗衣机,100,80,1,boom",
+        "B-2,洗衣机,100,80,1,",
+        "C-1,洗衣机,100,80,1,",
+    ]), chunk_size=2, filename="清单.csv")
+    assert (result["rows"], result["imported"], result["products_created"]) == (5, 3, 3)
+    errors = _errors(result)
+    assert sorted(errors) == [4, 5]
+    assert all("rejected" in message for message in errors.values())
+    models = [r["model"] for r in db.execute_all("SELECT model FROM product ORDER BY model")]
+    assert models == ["A-1", "A-2", "C-1"]
+
+
+def test_chunk_with_many_models_is_split_into_batches(sqlite_db, monkeypatch):
+    # 一块 1200 行、1200 个不同型号，其中一半已存在：派生表按 _VALUES_BATCH 分几条语句
+    monkeypatch.setattr(importer, "_VALUES_BATCH", 500)
+    importer.import_file(_csv([f"M-{i},洗衣机,100,80,1," for i in range(0, 1200, 2)]), filename="清单.csv")
+    result = importer.import_file(
+        _csv([f"M-{i},洗衣机,100,80,2," for i in range(1200)]), chunk_size=1200, filename="清单.csv",
+    )
+    assert (result["rows"], result["imported"], result["products_created"], result["stock_in_rows"]) == (
+        1200, 1200, 600, 1200,
+    )
+    assert result["errors"].empty
+    totals = db.execute_one("SELECT COUNT(*) AS n, SUM(quantity) AS qty FROM product")
+    assert (totals["n"], totals["qty"]) == (1200, 600 * 1 + 1200 * 2)
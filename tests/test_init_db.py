@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""init_db.migrate：只执行没执行过的迁移，改过的旧迁移拒绝执行，中途失败后可重跑。"""
+import shutil
+
+import pytest
+
+import db
+import init_db
+
+EXTRA = (
+    "ALTER TABLE customer ADD COLUMN wechat VARCHAR(64) NULL;\n"
+    "CREATE INDEX idx_customer_wechat ON customer (wechat);\n"
+)
+
+
+@pytest.fixture
+def migrations_dir(sqlite_db, tmp_path, monkeypatch):
+    """全部现有迁移的一份拷贝（已在 sqlite_db 里执行过），用例往里加文件或改文件。"""
+    path = tmp_path / "migrations"
+    shutil.copytree(init_db.MIGRATIONS_DIR, path)
+    monkeypatch.setattr(init_db, "MIGRATIONS_DIR", path)
+    return path
+
+
+def _applied():
+    return [r["version"] for r in db.execute_all("SELECT version FROM schema_migration ORDER BY version")]
+
+
+def test_applied_migrations_are_skipped(migrations_dir):
+    before = _applied()
+    assert before == [v for v, _, _, _ in init_db.load_migrations()]
+    assert init_db.migrate(verbose=False) == []
+    (migrations_dir / "9001_customer_wechat.sql").write_text(EXTRA, encoding="utf-8")
+    assert init_db.migrate(verbose=False) == ["9001"]
+    assert init_db.migrate(verbose=False) == []
+    assert _applied() == before + ["9001"]
+    db.execute_all("SELECT wechat FROM customer")
+
+
+def test_modified_migration_is_rejected(migrations_dir):
+    first = sorted(migrations_dir.glob("*.sql"))[0]
+    first.write_text(first.read_text(encoding="utf-8") + "\n-- 改过\n", encoding="utf-8")
+    (migrations_dir / "9001_customer_wechat.sql").write_text(EXTRA, encoding="utf-8")
+    with pytest.raises(init_db.MigrationError, match=first.name[:4]):
+        init_db.migrate(verbose=False)
+    # 一个都不执行
+    assert "9001" not in _applied()
+
+
+def test_rerun_after_partial_migration_tolerates_existing_ddl(migrations_dir):
+    # 上次执行到一半：列已经加上，索引和执行记录还没有
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            for s in db.translate_ddl("ALTER TABLE customer ADD COLUMN wechat VARCHAR(64) NULL"):
+                cur.execute(s)
+        conn.commit()
+    finally:
+        conn.close()
+    (migrations_dir / "9001_customer_wechat.sql").write_text(EXTRA, encoding="utf-8")
+    assert init_db.migrate(verbose=False) == ["9001"]
+    indexes = db.execute_all("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'customer'")
+    assert "idx_customer_wechat" in {r["name"] for r in indexes}
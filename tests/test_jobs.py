@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""jobs：排队、抢占领取、失败退避重试、租约过期重新排队。"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import db
+import jobs
+from config import Config
+
+
+def _enqueue(*refs, delay=0):
+    with db.transaction() as tx:
+        jobs.enqueue(tx, [("invoice", ref) for ref in refs], delay=delay)
+
+
+def _job(ref):
+    return db.execute_one("SELECT * FROM job WHERE kind = 'invoice' AND ref_id = %s", (ref,))
+
+
+def test_claim_takes_each_due_job_once(sqlite_db):
+    _enqueue(1, 2)
+    _enqueue(3, delay=3600)
+    first = jobs.claim("w1", 10)
+    assert [j["ref_id"] for j in first] == [1, 2]
+    assert all(j["attempts"] == 1 for j in first)
+    # 已领取的和还没到期的都不会再被领取
+    assert jobs.claim("w2", 10) == []
+    assert _job(1)["status"] == "running" and _job(1)["locked_by"] == "w1"
+    jobs.complete(first[0]["id"])
+    assert jobs.stats() == {"pending": 1, "running": 1, "done": 1, "failed": 0}
+
+
+def test_fail_backs_off_then_gives_up(sqlite_db, monkeypatch):
+    monkeypatch.setattr(Config, "JOB_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(Config, "JOB_RETRY_SECONDS", 60)
+    _enqueue(1)
+    [job] = jobs.claim("w1", 1)
+    jobs.fail(job, "打印机离线")
+    row = _job(1)
+    assert (row["status"], row["attempts"], row["last_error"]) == ("pending", 1, "打印机离线")
+    assert row["run_after"] > datetime.now() + timedelta(seconds=50)
+    assert jobs.claim("w1", 1) == []
+
+    db.execute_update("UPDATE job SET run_after = %s", (datetime.now(),))
+    [job] = jobs.claim("w1", 1)
+    assert job["attempts"] == 2
+    jobs.fail(job, "还是离线")
+    assert _job(1)["status"] == "failed"
+
+    assert jobs.retry_failed("invoice") == 1
+    row = _job(1)
+    assert (row["status"], row["attempts"]) == ("pending", 0)
+
+
+def test_expired_lease_and_release_requeue(sqlite_db, monkeypatch):
+    _enqueue(1, 2)
+    monkeypatch.setattr(Config, "JOB_LEASE_SECONDS", -1)
+    a, b = jobs.claim("w1", 2)
+    # worker 退出前归还的任务不计次数
+    jobs.release([b["id"]])
+    assert (_job(2)["status"], _job(2)["attempts"]) == ("pending", 0)
+    # 租约过期的任务重新排队
+    assert jobs.requeue_expired() == 1
+    assert _job(1)["status"] == "pending"
+    assert {j["ref_id"] for j in jobs.claim("w2", 2)} == {1, 2}
+
+
+def test_enqueue_rolls_back_with_business_transaction(sqlite_db):
+    with pytest.raises(RuntimeError):
+        with db.transaction() as tx:
+            jobs.enqueue(tx, [("invoice", 1)])
+            raise RuntimeError("出库失败")
+    assert jobs.stats()["pending"] == 0
+    # 重复排队把已完成的任务重置为待执行
+    _enqueue(1)
+    [job] = jobs.claim("w1", 1)
+    jobs.complete(job["id"])
+    _enqueue(1)
+    assert (_job(1)["status"], _job(1)["attempts"]) == ("pending", 0)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""metrics：db 的各条执行路径都记查询耗时、行数和错误。"""
+import sqlite3
+
+import pytest
+
+import db
+import metrics
+
+
+@pytest.fixture
+def samples(sqlite_db):
+    metrics.reset()
+
+    def get(sql):
+        return [s for s in metrics.slow_queries(limit=1000) if s["sql"] == sql]
+
+    yield get
+    metrics.reset()
+
+
+def test_iter_chunks_records_one_sample(samples):
+    with db.transaction() as tx:
+        tx.execute_many("INSERT INTO stats_counter (name, value) VALUES (%s, %s)", [(f"c{i}", i) for i in range(5)])
+    sql = "SELECT name, value FROM stats_counter ORDER BY name"
+    chunks = list(db.iter_chunks(sql, chunk_size=2))
+    assert [len(rows) for _, rows in chunks] == [2, 2, 1]
+    [sample] = samples(sql)
+    assert (sample["rows"], sample["error"]) == (5, None)
+
+
+def test_iter_chunks_records_error(samples):
+    sql = "SELECT * FROM no_such_table"
+    with pytest.raises(sqlite3.OperationalError):
+        list(db.iter_chunks(sql))
+    [sample] = samples(sql)
+    assert sample["error"] == "OperationalError"
+
+
+def test_execute_many_records_error(samples):
+    sql = "INSERT INTO stats_counter (name, value) VALUES (%s, %s)"
+    with pytest.raises(sqlite3.IntegrityError):
+        with db.transaction() as tx:
+            tx.execute_many(sql, [("a", 1), ("a", 2)])
+    [sample] = samples(sql)
+    assert sample["error"] == "IntegrityError"
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""numbering：按号段预留的单号分配。"""
+import threading
+from datetime import date, timedelta
+
+import db
+import numbering
+from config import Config
+
+
+def test_numbers_are_sequential_per_kind_and_day(sqlite_db, monkeypatch):
+    monkeypatch.setattr(Config, "NUMBER_BLOCK_SIZE", 3)
+    day = date(2026, 10, 18)
+    # 跨过号段边界仍然连续
+    assert [numbering.next_number("sale_order", day) for _ in range(5)] == [
+        f"SO20261018{n:06d}" for n in range(1, 6)
+    ]
+    assert numbering.next_number("invoice", day) == "INV20261018000001"
+    # 换一天从 1 开始
+    assert numbering.next_number("sale_order", date(2026, 10, 19)) == "SO20261019000001"
+
+
+def test_processes_get_disjoint_blocks(sqlite_db, monkeypatch):
+    monkeypatch.setattr(Config, "NUMBER_BLOCK_SIZE", 4)
+    day = date(2026, 10, 18)
+    first = [numbering.next_number("delivery_note", day) for _ in range(2)]
+    # 另一个进程：内存里没有号段，从库里重新预留
+    numbering._blocks.clear()
+    second = [numbering.next_number("delivery_note", day) for _ in range(2)]
+    assert first == ["DN20261018000001", "DN20261018000002"]
+    # 前一个进程没用完的号作废，不会重复
+    assert second == ["DN20261018000005", "DN20261018000006"]
+
+
+def test_default_day_follows_database_clock(sqlite_db, monkeypatch):
+    monkeypatch.setattr(Config, "NUMBER_BLOCK_SIZE", 10)
+    day = db.execute_one("SELECT CURDATE() AS d")["d"].replace("-", "")
+    assert numbering.next_number("invoice") == f"INV{day}000001"
+    assert numbering._db_offset is not None
+
+    # 同一天内号段没用完，不再访问数据库
+    def no_reserve(*args):
+        raise AssertionError("不应再预留号段")
+
+    monkeypatch.setattr(numbering, "_reserve", no_reserve)
+    assert numbering.next_number("invoice") == f"INV{day}000002"
+
+
+def test_suspected_day_change_rereads_database_day(sqlite_db, monkeypatch):
+    monkeypatch.setattr(Config, "NUMBER_BLOCK_SIZE", 10)
+    day = db.execute_one("SELECT CURDATE() AS d")["d"].replace("-", "")
+    assert numbering.next_number("invoice") == f"INV{day}000001"
+    # 按时差推算已经跨天：重新向数据库取日期和号段，日期以数据库为准，时差重新量过
+    numbering._db_offset = timedelta(days=1)
+    assert numbering.next_number("invoice") == f"INV{day}000011"
+    assert abs(numbering._db_offset) < timedelta(minutes=1)
+
+
+def test_concurrent_allocation_never_repeats(sqlite_db, monkeypatch):
+    monkeypatch.setattr(Config, "NUMBER_BLOCK_SIZE", 7)
+    day = date(2026, 10, 18)
+    got = {"sale_order": [], "invoice": []}
+
+    def worker(kind):
+        for _ in range(30):
+            got[kind].append(numbering.next_number(kind, day))
+
+    threads = [threading.Thread(target=worker, args=(kind,)) for kind in got for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(got["sale_order"]) == [f"SO20261018{n:06d}" for n in range(1, 91)]
+    assert sorted(got["invoice"]) == [f"INV20261018{n:06d}" for n in range(1, 91)]
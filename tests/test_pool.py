@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""db.ConnectionPool：名额、等待、过期、ping 和断线连接的丢弃。"""
+import sqlite3
+import threading
+import time
+
+import pymysql
+import pytest
+
+import db
+from config import Config
+
+
+class FakeConn:
+    def __init__(self):
+        self.closed = False
+        self.ping_delay = 0.0
+        self.alive = True
+
+    def ping(self, reconnect=False):
+        time.sleep(self.ping_delay)
+        if not self.alive:
+            raise OSError("连接已断开")
+
+    def close(self):
+        self.closed = True
+
+
+def test_pool_reuses_and_limits_connections():
+    pool = db.ConnectionPool(FakeConn, max_size=2, timeout=0.05)
+    a, b = pool.acquire(), pool.acquire()
+    with pytest.raises(db.PoolTimeout):
+        pool.acquire()
+    pool.release(a)
+    assert pool.acquire() is a
+    stats = pool.stats()
+    assert (stats["created"], stats["reused"], stats["timeouts"], stats["open"]) == (2, 1, 1, 2)
+    pool.release(a)
+    pool.release(b)
+    pool.close()
+    assert a.closed and b.closed
+
+
+def test_pool_waiter_gets_released_connection():
+    pool = db.ConnectionPool(FakeConn, max_size=1, timeout=2)
+    conn = pool.acquire()
+    got = []
+    t = threading.Thread(target=lambda: got.append(pool.acquire()))
+    t.start()
+    time.sleep(0.05)
+    pool.release(conn)
+    t.join(1)
+    assert got == [conn]
+    assert pool.stats()["waits"] == 1
+
+
+def test_pool_discards_expired_and_broken_connections():
+    pool = db.ConnectionPool(FakeConn, max_size=2, max_idle=0.05, ping_interval=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    time.sleep(0.1)
+    fresh = pool.acquire()
+    assert fresh is not conn and conn.closed
+    # 连接层错误的连接不放回池里
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection() as c:
+            raise sqlite3.OperationalError("disk I/O error")
+    assert c.closed and pool.stats()["open"] == 1
+
+
+@pytest.mark.parametrize("error", [
+    pymysql.err.OperationalError(2013, "Lost connection to MySQL server during query"),
+    pymysql.err.InterfaceError(0, ""),
+])
+def test_pool_discards_connection_after_mysql_connection_error(monkeypatch, error):
+    monkeypatch.setattr(Config, "DB_BACKEND", "mysql")
+    pool = db.ConnectionPool(FakeConn, max_size=1)
+    with pytest.raises(type(error)):
+        with pool.connection() as conn:
+            raise error
+    assert conn.closed and pool.stats()["open"] == 0
+
+
+@pytest.mark.parametrize("error", [
+    pymysql.err.OperationalError(1213, "Deadlock found when trying to get lock"),
+    pymysql.err.OperationalError(1205, "Lock wait timeout exceeded"),
+    pymysql.err.OperationalError(1054, "Unknown column 'x' in 'field list'"),
+    pymysql.err.OperationalError(3024, "maximum statement execution time exceeded"),
+])
+def test_mysql_statement_errors_are_not_connection_errors(monkeypatch, error):
+    monkeypatch.setattr(Config, "DB_BACKEND", "mysql")
+    assert not db.is_connection_error(error)
+    pool = db.ConnectionPool(FakeConn, max_size=1)
+    with pytest.raises(type(error)):
+        with pool.connection() as conn:
+            raise error
+    assert not conn.closed and pool.acquire() is conn
+
+
+def test_pool_keeps_connection_after_query_error():
+    pool = db.ConnectionPool(FakeConn, max_size=1)
+    with pytest.raises(sqlite3.IntegrityError):
+        with pool.connection() as conn:
+            raise sqlite3.IntegrityError("UNIQUE constraint failed")
+    assert not conn.closed
+    assert pool.acquire() is conn
+
+
+def test_pool_replaces_connection_that_fails_ping():
+    pool = db.ConnectionPool(FakeConn, max_size=2, ping_interval=0.01)
+    conn = pool.acquire()
+    conn.alive = False
+    pool.release(conn)
+    time.sleep(0.02)
+    fresh = pool.acquire()
+    assert fresh is not conn and conn.closed
+    assert pool.stats()["ping_failed"] == 1
+
+
+def test_pool_ping_does_not_hold_the_lock():
+    pool = db.ConnectionPool(FakeConn, max_size=3, timeout=2, ping_interval=0.01)
+    slow, other = pool.acquire(), pool.acquire()
+    pool.release(other)
+    slow.ping_delay = 0.5
+    pool.release(slow)  # 最后归还的先借出
+    time.sleep(0.02)
+    t = threading.Thread(target=pool.acquire)
+    t.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    assert pool.acquire() is other  # 另一个线程在 ping 时，这里不用等
+    assert time.monotonic() - started < 0.2
+    t.join()
+
+
+def test_pool_factory_failure_frees_slot():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("连不上")
+        return FakeConn()
+
+    pool = db.ConnectionPool(factory, max_size=1, timeout=0.05)
+    with pytest.raises(OSError):
+        pool.acquire()
+    assert pool.acquire() is not None
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""replenish：按日销量整列算补货点、可售天数和建议补货量。"""
+import math
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import cache
+import db
+import replenish
+from config import Config
+
+DAY = date(2026, 10, 18)
+
+
+@pytest.fixture
+def demand(sqlite_db, monkeypatch):
+    monkeypatch.setattr(Config, "REPLENISH_SAFETY_Z", 1.65)
+    monkeypatch.setattr(Config, "REPLENISH_LEAD_DAYS", 7)
+    monkeypatch.setattr(Config, "REPLENISH_ORDER_DAYS", 14)
+    monkeypatch.setattr(Config, "REPLENISH_WINDOW_DAYS", 4)
+    rows = [
+        # (日期, 产品, 客户, 数量)：产品 1 每天 2 件（含今天），产品 2 只有一天卖了 4 件（分两个客户）
+        ("2026-10-15", 1, 1, 2), ("2026-10-16", 1, 1, 2), ("2026-10-17", 1, 1, 2), ("2026-10-18", 1, 1, 2),
+        ("2026-10-16", 2, 1, 3), ("2026-10-16", 2, 2, 1),
+        ("2026-10-17", 4, 1, 4),
+        # 窗口之外
+        ("2026-10-14", 1, 1, 100),
+    ]
+    with db.transaction() as tx:
+        tx.execute_many(
+            "INSERT INTO sales_daily_rollup (stat_date, product_id, customer_id, quantity) VALUES (%s, %s, %s, %s)",
+            rows,
+        )
+    return pd.DataFrame({
+        "id": [1, 2, 3, 4],
+        "model": ["A", "B", "C", "D"],
+        "quantity": pd.array([12, 3, 0, 0], dtype="Int64"),
+        "lead_time_days": pd.array([5, None, 3, 2], dtype="Int64"),
+    })
+
+
+def test_plan_reorder_point_and_days_of_cover(demand):
+    result = replenish.plan(demand, DAY)
+    assert list(result["velocity"]) == [2.0, 1.0, 0.0, 1.0]
+    assert list(result["lead_time"]) == [5, 7, 3, 2]
+    # 产品 2：日销量 [0, 4, 0, 0]，标准差 √3，安全库存 1.65 × √3 × √7
+    safety = 1.65 * math.sqrt(3) * math.sqrt(7)
+    assert list(result["safety_stock"]) == [0, math.ceil(safety), 0, math.ceil(1.65 * math.sqrt(3) * math.sqrt(2))]
+    assert result.loc[1, "reorder_point"] == math.ceil(7 + safety)
+    assert result.loc[0, "reorder_point"] == 10
+    assert list(result["days_of_cover"]) == [6.0, 3.0, math.inf, 0.0]
+    assert list(result["status"]) == ["ok", "low", "ok", "out"]
+    assert result.loc[1, "suggested"] == math.ceil(7 + safety + 14 - 3)
+    assert result.loc[0, "suggested"] == 0
+
+
+def test_low_stock_and_counts(demand):
+    low = replenish.low_stock(demand, DAY)
+    assert list(low["model"]) == ["D", "B"]
+    assert replenish.counts(demand, DAY) == {"out": 1, "low": 1}
+
+
+def test_today_sales_are_not_cached(demand):
+    replenish.plan(demand, DAY)
+    with db.transaction() as tx:
+        tx.execute_update(
+            "UPDATE sales_daily_rollup SET quantity = 14 WHERE stat_date = '2026-10-18' AND product_id = 1"
+        )
+    # 历史部分走缓存，今天的销量现查
+    assert replenish.plan(demand, DAY).loc[0, "velocity"] == 5.0
+    cache.bump("replenish_history")
+    assert replenish.plan(demand, DAY).loc[0, "velocity"] == 5.0
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""db：副本延迟测量与读写分离（副本用主库文件的一份拷贝，拷贝后不再同步，相当于复制停住）。"""
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import db
+from config import Config
+
+_start_lag_monitor = db._start_lag_monitor
+
+
+@pytest.fixture
+def replica(sqlite_db, tmp_path, monkeypatch):
+    """make(beat_age)：主库心跳写成 beat_age 秒前，拷一份当副本，测一次延迟后返回 db.Replica。
+
+    不起后台测延迟的线程，用例里需要重测时直接调 db._refresh_lag()。
+    """
+    monkeypatch.setattr(db, "_start_lag_monitor", lambda: None)
+
+    def make(beat_age):
+        beat = datetime.now().replace(microsecond=0) - timedelta(seconds=beat_age)
+        with db.transaction() as tx:
+            tx.execute_update(
+                db.upsert_sql("replication_heartbeat", ["id", "beat_at"], ["id"], {"beat_at": "NEW(beat_at)"}),
+                (1, beat),
+            )
+        path = tmp_path / "replica.sqlite3"
+        src, dst = sqlite3.connect(Config.SQLITE_PATH), sqlite3.connect(path)
+        src.backup(dst)
+        dst.execute("PRAGMA journal_mode = DELETE")
+        src.close()
+        dst.close()
+        monkeypatch.setattr(Config, "DB_REPLICAS", [str(path)])
+        db._replicas = None
+        # 拷贝之后才写的行，只有主库上有
+        with db.transaction() as tx:
+            tx.execute_update("INSERT INTO stats_counter (name, value) VALUES ('marker', 1)")
+        db._process_session.clear()
+        db._refresh_lag()
+        return db.get_replicas()[0]
+
+    return make
+
+
+def _read_from_primary():
+    return db.execute_one("SELECT value FROM stats_counter WHERE name = 'marker'") is not None
+
+
+def test_frozen_replica_keeps_reporting_its_lag(replica):
+    r = replica(3600)
+    lags = []
+    for _ in range(3):
+        db._refresh_lag()
+        lags.append(r.lag)
+    # 主库每次检查都写新心跳，停住的副本延迟不能因此变小
+    assert all(lag >= 3600 for lag in lags)
+    assert _read_from_primary()
+
+
+def test_caught_up_replica_serves_reads_until_session_writes(replica, monkeypatch):
+    monkeypatch.setattr(Config, "DB_READ_YOUR_WRITES_SECONDS", 60)
+    r = replica(0)
+    state = {}
+    with db.session(state):
+        assert not _read_from_primary()
+        assert r.lag is not None and r.lag <= Config.DB_REPLICA_MAX_LAG
+        with db.transaction() as tx:
+            tx.execute_update("UPDATE stats_counter SET value = 2 WHERE name = 'marker'")
+        # 本会话刚写过：读己之写，走主库
+        assert _read_from_primary()
+    # 别的会话不受影响
+    with db.session({}):
+        assert not _read_from_primary()
+
+
+def test_lag_unknown_without_heartbeat(replica):
+    r = replica(0)
+    with db.transaction() as tx:
+        tx.execute_update("DELETE FROM replication_heartbeat")
+    db._refresh_lag()
+    assert r.lag is None
+    assert _read_from_primary()
+
+
+def test_replica_probe_error_skips_that_replica(replica):
+    r = replica(0)
+    conn = sqlite3.connect(r.target)
+    conn.execute("DROP TABLE replication_heartbeat")
+    conn.commit()
+    conn.close()
+    # 不是连接错误：不抛出，只是不读这个副本
+    db._refresh_lag()
+    assert _read_from_primary()
+    assert r.lag is None and r.down_until == 0.0
+
+
+def test_failed_heartbeat_write_does_not_fail_reads(replica, caplog):
+    r = replica(0)
+    conn = sqlite3.connect(Config.SQLITE_PATH)
+    conn.execute(
+        "CREATE TRIGGER trg_no_beat BEFORE UPDATE ON replication_heartbeat "
+        "BEGIN SELECT RAISE(ABORT, 'read only'); END"
+    )
+    conn.commit()
+    conn.close()
+    db._refresh_lag()
+    assert not _read_from_primary()
+    assert r.lag is not None
+    assert "写入复制心跳失败" in caplog.text
+
+
+def test_reads_only_use_the_measured_lag(replica, monkeypatch):
+    r = replica(0)
+
+    def no_probe():
+        raise AssertionError("读的路径上不应测延迟")
+
+    monkeypatch.setattr(db, "_refresh_lag", no_probe)
+    assert not _read_from_primary()
+    # 延迟未知（后台线程还没测到）：读走主库
+    r.lag = None
+    assert _read_from_primary()
+
+
+def test_background_monitor_measures_lag(replica, monkeypatch):
+    monkeypatch.setattr(Config, "DB_REPLICA_LAG_CHECK", 0.01)
+    r = replica(3600)
+    r.lag = None
+    _start_lag_monitor()
+    deadline = time.monotonic() + 5
+    while r.lag is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert r.lag is not None and r.lag >= 3600
+    db._stop_lag_monitor()
+    assert db._lag_thread is None
+
+
+def test_heartbeat_is_written_with_database_clock():
+    sql = db.upsert_sql("replication_heartbeat", ["id", "beat_at"], ["id"], {"beat_at": "NEW(beat_at)"},
+                        values={"beat_at": "NOW(6)"})
+    assert sql == (
+        "INSERT INTO replication_heartbeat (id, beat_at) VALUES (%s, NOW(6)) "
+        "ON CONFLICT (id) DO UPDATE SET beat_at = excluded.beat_at"
+    )
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""search：按姓名开头或电话里的数字查客户，以及 phone_digits 的回填。"""
+import crm
+import db
+import init_db
+import search
+from conftest import ROOT
+
+
+def _names(rows):
+    return [r["name"] for r in rows]
+
+
+def test_normalize_phone():
+    assert crm.normalize_phone("+86 (138) 0013-8000") == "8613800138000"
+    assert crm.normalize_phone("0755/8888.1234") == "075588881234"
+    assert crm.normalize_phone("１３８ 0013") == "0013"
+    assert crm.normalize_phone("无") is None
+    assert crm.normalize_phone(None) is None
+
+
+def test_customer_lookup_by_phone_and_name(sqlite_db):
+    crm.add_customer("张三", "138-0013-8000")
+    crm.add_customer("张三丰", "+86 139 1234 5678")
+    crm.add_customer("李四", "(021) 5555 0138")
+    crm.add_customer("王_五", None)
+
+    # 开头匹配
+    assert _names(search.search_customers("138")) == ["张三", "李四"]
+    assert _names(search.search_customers("1380013")) == ["张三"]
+    # 中间几位，开头匹配的排前面，其余按新到旧
+    assert _names(search.search_customers("0138")) == ["李四", "张三"]
+    assert _names(search.search_customers("1234 5678")) == ["张三丰"]
+    # 位数太少只按开头
+    assert _names(search.search_customers("13")) == ["张三"]
+    # 姓名开头，LIKE 通配符按字面匹配
+    assert _names(search.search_customers("张三")) == ["张三", "张三丰"]
+    assert _names(search.search_customers("王_")) == ["王_五"]
+    assert _names(search.search_customers("王%")) == []
+    # 不输入时列出最近添加的
+    assert _names(search.search_customers("", limit=2)) == ["王_五", "李四"]
+
+
+def test_phone_digits_backfill_matches_normalize_phone(sqlite_db):
+    phones = ["+86 (138) 0013-8000", "0755/8888.1234", "１３８ 0013", "无", "139 1234 5678"]
+    with db.transaction() as tx:
+        for i, phone in enumerate(phones):
+            tx.execute_insert("INSERT INTO customer (name, phone) VALUES (%s, %s)", (f"客户{i}", phone))
+    sql = (ROOT / "sql" / "migrations" / "0008_customer_phone_search.sql").read_text(encoding="utf-8")
+    [backfill] = [s for s in init_db._split_sql(sql) if "UPDATE customer" in s]
+    with db.transaction() as tx:
+        tx.execute_update(backfill)
+    rows = db.execute_all("SELECT phone, phone_digits FROM customer ORDER BY id")
+    assert [r["phone_digits"] for r in rows] == [crm.normalize_phone(p) for p in phones]
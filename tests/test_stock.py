@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""stock：入库 / 出库的单事务写入与回滚。"""
+import pytest
+
+import counters
+import crm
+import db
+import stock
+
+
+def _quantity(product_id):
+    return db.execute_one("SELECT quantity FROM product WHERE id = %s", (product_id,))["quantity"]
+
+
+def _count(table):
+    return db.execute_one(f"SELECT COUNT(*) AS n FROM {table}")["n"]
+
+
+def test_transaction_rolls_back_on_error(sqlite_db):
+    pid = stock.add_product("冰箱", "RF-1", 3000, 2000)
+    with pytest.raises(RuntimeError):
+        with db.transaction() as tx:
+            tx.execute_update("UPDATE product SET quantity = 5 WHERE id = %s", (pid,))
+            tx.execute_insert("INSERT INTO stock_in (product_id, quantity, cost_price) VALUES (%s, 5, 2000)", (pid,))
+            raise RuntimeError("中途失败")
+    assert _quantity(pid) == 0
+    assert _count("stock_in") == 0
+
+
+def test_stock_in_updates_record_and_quantity(sqlite_db):
+    pid = stock.add_product("冰箱", "RF-2", 3000, 2000)
+    stock.stock_in(pid, 3, 2000, "首批")
+    stock.stock_in(pid, 2, 2100)
+    assert _quantity(pid) == 5
+    assert _count("stock_in") == 2
+
+
+def test_sale_short_on_stock_rolls_back_whole_order(sqlite_db):
+    pid = stock.add_product("冰箱", "RF-3", 3000, 2000)
+    other = stock.add_product("冰箱", "RF-4", 3000, 2000)
+    cid = crm.add_customer("王五")
+    stock.stock_in(pid, 5, 2000)
+    stock.stock_in(other, 1, 2000)
+
+    with pytest.raises(stock.InsufficientStock) as exc:
+        stock.create_sale(cid, [(pid, 2, 3000), (other, 2, 3000)])
+    assert exc.value.product_ids == [other]
+    # 够数的那一行也没有扣减，销售单和明细都没写入
+    assert (_quantity(pid), _quantity(other)) == (5, 1)
+    assert (_count("sale_order"), _count("sale_order_item")) == (0, 0)
+
+
+def test_sale_of_unknown_product_is_rejected(sqlite_db):
+    cid = crm.add_customer("王五")
+    with pytest.raises(stock.InsufficientStock) as exc:
+        stock.create_sale(cid, [(999, 1, 100)])
+    assert exc.value.product_ids == [999]
+
+
+def test_multi_line_sale_writes_items_and_counters(sqlite_db):
+    a = stock.add_product("冰箱", "RF-5", 3000, 2000)
+    b = stock.add_product("冰箱", "RF-6", 1000, 600)
+    cid = crm.add_customer("赵六")
+    stock.stock_in(a, 5, 2000)
+    stock.stock_in(b, 5, 600)
+
+    order_id, order_no = stock.create_sale(cid, [(a, 1, 2900), (b, 2, 1000), (a, 1, 3000)])
+    stock.create_sale(cid, [(b, 1, 950)])
+
+    order = db.execute_one("SELECT order_no, total_amount FROM sale_order WHERE id = %s", (order_id,))
+    assert order["order_no"] == order_no and float(order["total_amount"]) == 7900
+    items = db.execute_all(
+        "SELECT product_id, quantity, unit_price FROM sale_order_item WHERE order_id = %s ORDER BY id", (order_id,)
+    )
+    assert [(r["product_id"], r["quantity"], float(r["unit_price"])) for r in items] == [
+        (a, 1, 2900), (b, 2, 1000), (a, 1, 3000),
+    ]
+    assert (_quantity(a), _quantity(b)) == (3, 2)
+    # 概览计数在同一事务里累加，与全量重建的结果一致
+    dashboard = counters.load_dashboard()
+    assert (dashboard["product_count"], dashboard["customer_count"], dashboard["order_count"]) == (2, 1, 2)
+    assert (dashboard["today_order_count"], float(dashboard["today_revenue"])) == (2, 8850)
+    counters.reconcile()
+    assert counters.load_dashboard() == dashboard
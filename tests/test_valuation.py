@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""valuation：移动加权平均成本和历史重放核对。"""
+from decimal import Decimal
+
+import crm
+import db
+import stock
+import valuation
+
+
+def test_receipt_value_and_issue_cost():
+    assert valuation.receipt_value(3, "10.005") == Decimal("30.0150")
+    assert valuation.issue_cost(4, Decimal("100"), 1) == Decimal("25.0000")
+    assert valuation.issue_cost(3, Decimal("100"), 1) == Decimal("33.3333")
+    # 库存不足按现有总成本全部转出，没有库存时成本为 0
+    assert valuation.issue_cost(2, Decimal("50"), 5) == Decimal("50.0000")
+    assert valuation.issue_cost(0, Decimal("50"), 1) == Decimal(0)
+
+
+def test_split_cost_keeps_total():
+    parts = valuation.split_cost(Decimal("100.0000"), [1, 1, 1])
+    assert parts == [Decimal("33.3333"), Decimal("33.3333"), Decimal("33.3334")]
+    assert sum(parts) == Decimal("100.0000")
+
+
+def _stock_value(product_id):
+    return Decimal(str(db.execute_one("SELECT stock_value FROM product WHERE id = %s", (product_id,))["stock_value"]))
+
+
+def test_moving_average_through_stock_in_and_sale(sqlite_db):
+    pid = stock.add_product("洗衣机", "WM-1", 500, 100)
+    cid = crm.add_customer("张三", "13800000000")
+    stock.stock_in(pid, 2, 100)
+    stock.stock_in(pid, 2, 200)
+    assert _stock_value(pid) == Decimal("600")
+
+    stock.create_sale(cid, [(pid, 1, 500), (pid, 2, 480)])
+    # 平均成本 150，3 件共 450，按数量分摊到两行明细
+    costs = [r["cost_amount"] for r in db.execute_all(
+        "SELECT cost_amount FROM sale_order_item WHERE product_id = %s ORDER BY id", (pid,)
+    )]
+    assert [Decimal(str(c)) for c in costs] == [Decimal("150"), Decimal("300")]
+    assert _stock_value(pid) == Decimal("150")
+
+    result = valuation.verify()
+    assert result["product_diffs"] == [] and result["item_diffs"] == 0
+
+
+def test_verify_reports_and_fixes_drift(sqlite_db):
+    pid = stock.add_product("洗衣机", "WM-2", 500, 100)
+    cid = crm.add_customer("李四")
+    stock.stock_in(pid, 4, 100)
+    stock.create_sale(cid, [(pid, 1, 500)])
+    with db.transaction() as tx:
+        tx.execute_update("UPDATE product SET stock_value = 999 WHERE id = %s", (pid,))
+        tx.execute_update("UPDATE sale_order_item SET cost_amount = NULL")
+
+    result = valuation.verify()
+    assert [d["expected_value"] for d in result["product_diffs"]] == [Decimal("300.0000")]
+    assert result["item_diffs"] == 1
+
+    valuation.verify(fix=True)
+    assert _stock_value(pid) == Decimal("300")
+    result = valuation.verify()
+    assert result["product_diffs"] == [] and result["item_diffs"] == 0
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""库存估价：移动加权平均成本。
+
+每个产品只存库存数量 quantity 和库存总成本 stock_value（product 表）：
+- 入库 q 件、进价 c：stock_value += q × c；
+- 出库 q 件：销售成本 = stock_value × q / quantity，从 stock_value 里减掉，并记在出库明细的 cost_amount。
+两步都在入库/出库事务里、产品行已加锁时完成，平均成本、库存金额、单笔销售成本都是直接读。
+
+审计：python valuation.py 按入库、出库历史从零重放，与库里的 stock_value / cost_amount 比对；
+加 --fix 用重放结果回填（上线估价前的历史出库明细没有销售成本，也由此补上），建议在非营业时间运行。
+重放按时间排序，同一秒内先入库后出库；已归档的出库明细（archive.py）一起重放。
+"""
+import argparse
+from decimal import ROUND_HALF_UP, Decimal
+
+import archive
+import db
+from config import Config
+
+_CENT = Decimal("0.0001")
+TOLERANCE = Decimal("0.01")
+
+_ISSUES_SQL = (
+    "SELECT i.product_id, o.created_at, 1 AS kind, i.id, i.quantity, i.cost_amount "
+    "FROM {sale_order_item} i JOIN {sale_order} o ON o.id = i.order_id"
+)
+_EVENTS_SQL = (
+    "SELECT product_id, created_at, 0 AS kind, id, quantity, cost_price FROM stock_in "
+    f"UNION ALL {archive.union(_ISSUES_SQL)[0]} "
+    "ORDER BY product_id, created_at, kind, id"
+)
+
+
+def _dec(v):
+    return v if isinstance(v, Decimal) else Decimal(str(v or 0))
+
+
+def _round(v):
+    return v.quantize(_CENT, rounding=ROUND_HALF_UP)
+
+
+def receipt_value(quantity, cost_price):
+    """入库 quantity 件、进价 cost_price 时库存总成本的增加额。"""
+    return _round(_dec(cost_price) * int(quantity))
+
+
+def issue_cost(quantity, stock_value, issue):
+    """当前库存 quantity 件、总成本 stock_value 时出库 issue 件的销售成本。
+
+    库存不足（只在历史数据里出现）时按现有总成本全部转出，库存为 0 或负数时成本记 0。
+    """
+    if quantity <= 0:
+        return Decimal(0)
+    if issue >= quantity:
+        return _round(_dec(stock_value))
+    return _round(_dec(stock_value) * issue / quantity)
+
+
+def split_cost(cost, quantities):
+    """把同一产品的销售成本按数量分摊到各明细行，尾差记在最后一行。"""
+    total = sum(quantities)
+    out = []
+    left = cost
+    for i, q in enumerate(quantities):
+        part = left if i == len(quantities) - 1 else _round(cost * q / total)
+        out.append(part)
+        left -= part
+    return out
+
+
+def replay():
+    """按入库/出库历史从零重放，返回 (states, items)。
+
+    states 为 {product_id: (quantity, stock_value)}；
+    items 为销售成本与重放结果不一致（或为空）的出库明细 {item_id: (库里的值, 重放值)}。
+    """
+    states = {}
+    items = {}
+    for _, rows in db.iter_chunks(_EVENTS_SQL, (), Config.EXPORT_CHUNK_SIZE):
+        for product_id, _, kind, row_id, quantity, cost in rows:
+            q, value = states.get(product_id, (0, Decimal(0)))
+            if int(kind) == 0:
+                q, value = q + quantity, value + receipt_value(quantity, cost)
+            else:
+                c = issue_cost(q, value, quantity)
+                q, value = q - quantity, value - c
+                if cost is None or abs(_dec(cost) - c) > TOLERANCE:
+                    items[row_id] = (cost, c)
+            states[product_id] = (q, value)
+    return states, items
+
+
+def verify(fix=False):
+    """重放并与库里的数据比对，返回 {"products", "product_diffs", "item_diffs"}。
+
+    数量对不上的产品（手工改过库存等）回填时按重放得到的平均成本乘以现有数量估值，
+    重放中没有库存的产品按当前进价估值。回填（fix）时全程读主库。
+    """
+    if fix:
+        with db.use_primary():
+            return _verify(fix)
+    return _verify(fix)
+
+
+def _verify(fix):
+    states, items = replay()
+    products = db.execute_all("SELECT id, model, quantity, stock_value, cost_price FROM product")
+    diffs = []
+    for p in products:
+        q, value = states.get(p["id"], (0, Decimal(0)))
+        stored = _dec(p["stock_value"])
+        if q == p["quantity"]:
+            expected = value
+        elif q > 0:
+            expected = _round(value * p["quantity"] / q)
+        else:
+            expected = receipt_value(max(p["quantity"], 0), p["cost_price"])
+        if q != p["quantity"] or abs(stored - expected) > TOLERANCE:
+            diffs.append({
+                "product_id": p["id"],
+                "model": p["model"],
+                "quantity": p["quantity"],
+                "replayed_quantity": q,
+                "stock_value": stored,
+                "expected_value": expected,
+            })
+    if fix:
+        _apply(diffs, items)
+    return {"products": len(products), "product_diffs": diffs, "item_diffs": len(items)}
+
+
+def _apply(diffs, items):
+    changed = [(d["expected_value"], d["product_id"]) for d in diffs if d["expected_value"] != d["stock_value"]]
+    if changed:
+        with db.transaction() as tx:
+            tx.execute_many("UPDATE product SET stock_value = %s WHERE id = %s", changed)
+    rows = [(cost, item_id) for item_id, (_, cost) in items.items()]
+    size = Config.IMPORT_CHUNK_SIZE
+    for start in range(0, len(rows), size):
+        with db.transaction() as tx:
+            # 明细 id 在热表和归档表之间不重复，两张表各更新一次，不在的那边影响 0 行
+            for table in ("sale_order_item", archive.ARCHIVE_TABLES["sale_order_item"]):
+                tx.execute_many(f"UPDATE {table} SET cost_amount = %s WHERE id = %s", rows[start:start + size])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按入库/出库历史重放，核对库存估价与销售成本")
+    parser.add_argument("--fix", action="store_true", help="用重放结果回填库存总成本和销售成本")
+    opts = parser.parse_args()
+    result = verify(fix=opts.fix)
+    diffs = result["product_diffs"]
+    print(f"产品 {result['products']} 个，估价不一致 {len(diffs)} 个，销售成本不一致的明细 {result['item_diffs']} 行")
+    for d in diffs[:20]:
+        print(
+            f"  {d['model']}：数量 {d['quantity']}（重放 {d['replayed_quantity']}），"
+            f"库存金额 {d['stock_value']}（应为 {d['expected_value']}）"
+        )
+    if opts.fix and (diffs or result["item_diffs"]):
+        print("已回填；销售分析的成本请再运行 python analytics.py 重建")
+
+
+if __name__ == "__main__":
+    main()
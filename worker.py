@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""后台任务 worker：从 job 表领取任务，交给本机进程池执行（发票、送货单渲染，见 documents.py）。
+
+  python worker.py                        # 常驻运行，JOB_WORKERS 个子进程
+  python worker.py --once                 # 把当前到期的任务跑完就退出（适合定时任务）
+  python worker.py --backfill 2026-01-01  # 先给该日起没有单据的销售单补排任务
+
+主进程只负责领取任务、记录结果；子进程用 spawn 启动，各自建数据库连接，不继承主进程的连接池。
+可以在多台机器上各跑一个，任务靠 job 表上的条件 UPDATE 分配，不会重复执行。
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+
+import documents
+import jobs
+from config import Config
+
+# 任务类型 -> 子进程里执行的函数 f(ref_id)
+HANDLERS = {
+    "invoice": lambda ref_id: documents.generate("invoice", ref_id),
+    "delivery_note": lambda ref_id: documents.generate("delivery_note", ref_id),
+}
+
+
+def _run(kind, ref_id):
+    handler = HANDLERS.get(kind)
+    if handler is None:
+        raise ValueError(f"未知的任务类型：{kind}")
+    return handler(ref_id)
+
+
+def _new_pool(processes):
+    return ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn"))
+
+
+def run(processes=None, once=False):
+    """领取并执行任务，返回 (成功数, 失败数)。once 为真时队列里没有到期任务就返回。"""
+    processes = processes or Config.JOB_WORKERS
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    inflight = {}
+    done_count = failed_count = 0
+    next_reap = 0.0
+    pool = _new_pool(processes)
+    try:
+        while True:
+            if time.monotonic() >= next_reap:
+                jobs.requeue_expired()
+                next_reap = time.monotonic() + Config.JOB_LEASE_SECONDS / 2
+            # 多领一倍，子进程做完一个马上有下一个
+            free = processes * 2 - len(inflight)
+            if free > 0:
+                for job in jobs.claim(worker_id, free):
+                    inflight[pool.submit(_run, job["kind"], job["ref_id"])] = job
+            if not inflight:
+                if once:
+                    break
+                time.sleep(Config.JOB_POLL_SECONDS)
+                continue
+            finished, _ = wait(inflight, timeout=Config.JOB_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in finished:
+                job = inflight.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    # 子进程崩溃（内存不足等）后整个进程池不可用，记失败后换一个新的
+                    broken = broken or isinstance(e, BrokenProcessPool)
+                    jobs.fail(job, e)
+                    failed_count += 1
+                    print(f"任务失败：{job['kind']} #{job['ref_id']}（第 {job['attempts']} 次）：{e}")
+                else:
+                    jobs.complete(job["id"])
+                    done_count += 1
+            if broken:
+                pool.shutdown(cancel_futures=True)
+                pool = _new_pool(processes)
+    finally:
+        # 被中断时没做完的任务放回队列，不必等租约过期
+        jobs.release([job["id"] for job in inflight.values()])
+        pool.shutdown(cancel_futures=True)
+    return done_count, failed_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="后台任务 worker（发票、送货单生成）")
+    parser.add_argument("--processes", type=int, default=None, help="子进程数，默认 JOB_WORKERS")
+    parser.add_argument("--once", action="store_true", help="跑完当前到期的任务就退出")
+    parser.add_argument("--backfill", type=date.fromisoformat, default=None,
+                        help="先给该日（YYYY-MM-DD）起没有单据的销售单补排任务")
+    opts = parser.parse_args()
+    if opts.backfill:
+        print(f"已补排 {documents.enqueue_missing(opts.backfill)} 个任务")
+    try:
+        ok, failed = run(opts.processes, once=opts.once)
+    except KeyboardInterrupt:
+        print("已停止")
+        return
+    print(f"完成 {ok} 个任务，失败 {failed} 个")
+
+
+if __name__ == "__main__":
+    main()